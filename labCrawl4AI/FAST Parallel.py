@@ -2,47 +2,47 @@ import os
 import psutil
 import asyncio
 import requests
-from xml.etree import ElementTree
-from typing import List
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-
-def get_pydantic_ai_docs_urls():
-    """
-    Récupère toutes les URLs de la documentation Pydantic AI.
-    Utilise le sitemap (https://ai.pydantic.dev/sitemap.xml) pour obtenir ces URLs.
-    """
-    sitemap_url = "https://ai.pydantic.dev/sitemap.xml"
-    try:
-        response = requests.get(sitemap_url)
-        response.raise_for_status()
-
-        # Analyse le XML
-        root = ElementTree.fromstring(response.content)
-
-        # Extrait toutes les URLs du sitemap
-        namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        urls = [loc.text for loc in root.findall('.//ns:loc', namespace)]
-
-        return urls
-    except Exception as e:
-        print(f"Erreur lors de la récupération du sitemap: {e}")
-        return []
-
-async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: str = "output"):
+from typing import AsyncIterable, Dict, List, Optional, Union
+from crawl4ai import BrowserConfig, CrawlerRunConfig, CacheMode
+from scheduler import SlidingWindowScheduler
+from incremental import CrawlManifest
+from sitemap_stream import stream_sitemap_urls
+from output_writer import AsyncOutputWriter
+from naming import url_to_path
+from adaptive import AdaptiveConcurrencyController, process_tree_rss
+from politeness import PolitenessPolicy
+from http_fetch import TieredFetcher
+from telemetry import NULL_TELEMETRY, Telemetry, profile_crawl
+from neardup import NearDuplicateIndex
+
+async def crawl_parallel(urls: Union[List[str], AsyncIterable[str]], max_concurrent: int = 3, output_dir: str = "output",
+                         per_host_limit: Optional[int] = None, incremental: bool = False,
+                         lastmods: Optional[Dict[str, Optional[str]]] = None,
+                         output_mode: str = "files", fsync: str = "batch",
+                         adaptive: bool = False, max_concurrent_limit: int = 20,
+                         memory_budget_mb: int = 4096, latency_budget: float = 15.0,
+                         politeness: Optional[PolitenessPolicy] = None, tiered_fetch: bool = False,
+                         browser_patterns: Optional[List[str]] = None, max_pages_per_session: int = 50,
+                         telemetry: Optional[Telemetry] = None, near_duplicates: bool = False):
     print("\n=== Extraction parallèle avec réutilisation de navigateur + Suivi mémoire ===")
 
     # Création du dossier de sortie s'il n'existe pas
     os.makedirs(output_dir, exist_ok=True)
 
+    # Télémétrie: spans par URL et par étape, compteurs et histogrammes (inactive par défaut)
+    telemetry = telemetry or NULL_TELEMETRY
+
     # Suivi de l'utilisation maximale de mémoire
     peak_memory = 0
     process = psutil.Process(os.getpid())
 
     def log_memory(prefix: str = ""):
         nonlocal peak_memory
-        current_mem = process.memory_info().rss  # en octets
+        current_mem = process_tree_rss(process)  # en octets, processus enfants (Chromium) compris
         if current_mem > peak_memory:
             peak_memory = current_mem
+        telemetry.gauge("process_tree_rss_bytes", current_mem)
+        telemetry.gauge("process_tree_rss_peak_bytes", peak_memory)
         print(f"{prefix} Mémoire actuelle: {current_mem // (1024 * 1024)} MB, Max: {peak_memory // (1024 * 1024)} MB")
 
     # Configuration minimale du navigateur
@@ -53,56 +53,142 @@ async def crawl_parallel(urls: List[str], max_concurrent: int = 3, output_dir: s
     )
     crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
 
-    # Création de l'instance du crawler
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
+    # Récupération à deux niveaux: client HTTP d'abord, navigateur (démarré à la demande) si nécessaire
+    # Pool de sessions réutilisables (autant que de pages simultanées possibles), recyclées après
+    # 'max_pages_per_session' pages ou quand la mémoire dépasse le budget
+    fetcher = TieredFetcher(browser_config, crawl_config, http_first=tiered_fetch,
+                            browser_patterns=browser_patterns or (),
+                            session_pool_size=max(max_concurrent, max_concurrent_limit if adaptive else 0),
+                            max_pages_per_session=max_pages_per_session,
+                            session_rss_threshold_mb=memory_budget_mb, telemetry=telemetry)
+
+    # Ordonnanceur à fenêtre glissante: 'max_concurrent' pages toujours en cours
+    # La politesse (robots.txt, Crawl-delay, débit par hôte) est consultée avant chaque envoi
+    if politeness is None:
+        politeness = PolitenessPolicy()
+    scheduler = SlidingWindowScheduler(max_concurrent=max_concurrent, per_host_limit=per_host_limit,
+                                       politeness=politeness, telemetry=telemetry)
+
+    # Mode incrémental: manifeste lastmod/ETag/Last-Modified/empreinte par URL
+    manifest = CrawlManifest(os.path.join(output_dir, "manifest.json")) if incremental else None
+    http_session = requests.Session() if incremental else None
+    if lastmods is None:
+        lastmods = {}
+
+    async def fetch(url: str):
+        # Retourne None si la page n'a pas changé depuis la dernière extraction
+        if manifest:
+            if manifest.is_unchanged_in_sitemap(url, lastmods.get(url)):
+                return None
+            if await asyncio.to_thread(manifest.is_not_modified, url, http_session):
+                manifest.update(url, lastmod=lastmods.get(url))
+                return None
+        # La session du navigateur est louée au pool seulement si la page doit être rendue
+        return await fetcher.fetch(url)
+
+    async def recycle_sessions():
+        # Recycle les sessions (pages/contextes) pour libérer la mémoire du navigateur
+        await fetcher.session_pool.recycle_all()
+
+    # Contrôleur adaptatif: augmente la concurrence tant que mémoire et latence restent sous les budgets
+    controller = None
+    if adaptive:
+        controller = AdaptiveConcurrencyController(
+            scheduler,
+            min_concurrent=1,
+            max_concurrent=max_concurrent_limit,
+            memory_budget_mb=memory_budget_mb,
+            latency_budget=latency_budget,
+            on_backoff=recycle_sessions,
+        )
+        controller.start()
+
+    identical_count = 0
+
+    def on_saved(saved):
+        # Résultat de l'écrivain asynchrone, traité dans la boucle d'événements
+        nonlocal identical_count
+        if manifest:
+            manifest.update(saved.url, lastmod=lastmods.get(saved.url), headers=saved.metadata.get("headers"),
+                            digest=saved.digest, file_path=saved.path)
+        if saved.near_duplicate_of:
+            identical_count += 1
+            print(f"Quasi-doublon de {saved.near_duplicate_of}, non sauvegardé: {saved.url}")
+        elif saved.written:
+            print(f"Contenu sauvegardé dans {saved.path}")
+        elif saved.deduplicated:
+            identical_count += 1
+            print(f"Contenu identique à {saved.path}: {saved.url}")
+        else:
+            identical_count += 1
+            print(f"Contenu inchangé: {saved.path}")
+
+    # Écrivain asynchrone par lots (fichiers .md ou archives JSONL/tar), hors de la boucle d'événements
+    # Avec 'near_duplicates', une page quasi identique à une page déjà stockée n'est pas écrite
+    near_duplicate_index = NearDuplicateIndex() if near_duplicates else None
+    writer = AsyncOutputWriter(output_dir, mode=output_mode, fsync=fsync, on_written=on_saved, telemetry=telemetry,
+                               near_duplicates=near_duplicate_index)
+    writer.start()
 
     try:
-        # Traitement des URLs par lots de 'max_concurrent'
         success_count = 0
         fail_count = 0
-        for i in range(0, len(urls), max_concurrent):
-            batch = urls[i : i + max_concurrent]
-            tasks = []
-
-            for j, url in enumerate(batch):
-                # ID de session unique par sous-tâche concurrente
-                session_id = f"parallel_session_{i + j}"
-                task = crawler.arun(url=url, config=crawl_config, session_id=session_id)
-                tasks.append(task)
-
-            # Vérification de l'utilisation de mémoire avant le lancement des tâches
-            log_memory(prefix=f"Avant lot {i//max_concurrent + 1}: ")
-
-            # Récupération des résultats
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Vérification de l'utilisation de mémoire après l'exécution des tâches
-            log_memory(prefix=f"Après lot {i//max_concurrent + 1}: ")
-
-            # Évaluation des résultats
-            for url, result in zip(batch, results):
-                if isinstance(result, Exception):
-                    print(f"Erreur d'extraction {url}: {result}")
-                    fail_count += 1
-                elif result.success:
-                    success_count += 1
-                    # Sauvegarde du contenu extrait (optionnel)
-                    file_name = url.split('/')[-1] if url.split('/')[-1] else "index"
-                    file_path = os.path.join(output_dir, f"{file_name}.md")
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(result.markdown.raw_markdown)
-                    print(f"Contenu sauvegardé dans {file_path}")
-                else:
-                    fail_count += 1
+        unchanged_count = 0
+        log_memory(prefix="Avant extraction: ")
+
+        # Évaluation des résultats au fil de l'eau
+        async for url, result in scheduler.run(urls, fetch):
+            if isinstance(result, Exception):
+                print(f"Erreur d'extraction {url}: {result}")
+                fail_count += 1
+                telemetry.counter("crawl_pages_total", outcome="error")
+            elif result is None:
+                unchanged_count += 1
+                telemetry.counter("crawl_pages_total", outcome="unchanged")
+            elif result.success:
+                success_count += 1
+                telemetry.counter("crawl_pages_total", outcome="success")
+                # Sauvegarde du contenu extrait sous un nom déterministe et sans collision
+                # (un fichier dont le contenu n'a pas changé n'est pas réécrit)
+                previous_hash = manifest.get(url).get("content_hash") if manifest else None
+                await writer.write(url, url_to_path(url), result.markdown.raw_markdown, previous_hash,
+                                   headers=result.response_headers)
+            else:
+                fail_count += 1
+                telemetry.counter("crawl_pages_total", outcome="failure")
+
+            # Vérification de l'utilisation de mémoire toutes les 'max_concurrent' pages
+            done = success_count + fail_count + unchanged_count
+            if done % max_concurrent == 0:
+                log_memory(prefix=f"Après {done} pages: ")
+
+        # Attend la fin des écritures en cours avant le résumé
+        await writer.close()
 
         print(f"\nRésumé:")
         print(f"  - Extraction réussie: {success_count}")
         print(f"  - Échecs: {fail_count}")
+        if manifest:
+            print(f"  - Inchangées (non ré-extraites): {unchanged_count}")
+            print(f"  - Contenu identique ou quasi identique (fichier non réécrit): {identical_count}")
+        scheduler.stats.print_summary()
+        fetcher.print_summary()
+        if near_duplicate_index:
+            near_duplicate_index.print_summary()
+        telemetry.print_summary()
+        if controller:
+            print(f"  - Concurrence finale (adaptative): {scheduler.max_concurrent}")
 
     finally:
+        if controller:
+            await controller.stop()
         print("\nFermeture du crawler...")
-        await crawler.close()
+        await fetcher.close()
+        await writer.close()
+        await politeness.close()
+        if manifest:
+            manifest.save()
+            http_session.close()
         # Log final de mémoire
         log_memory(prefix="Final: ")
         print(f"\nUtilisation maximale de mémoire (MB): {peak_memory // (1024 * 1024)}")
@@ -117,12 +203,29 @@ async def main():
         subprocess.check_call(["pip", "install", "psutil"])
         import psutil
     
-    urls = get_pydantic_ai_docs_urls()
-    if urls:
-        print(f"Trouvé {len(urls)} URLs à extraire")
-        await crawl_parallel(urls, max_concurrent=5, output_dir="output_docs")
-    else:
-        print("Aucune URL trouvée à extraire")
+    # Lecture du sitemap en flux: l'extraction démarre avant la fin du téléchargement
+    lastmods = {}
+    urls = stream_sitemap_urls("https://ai.pydantic.dev/sitemap.xml", lastmods=lastmods)
+    # Mode incrémental: seules les pages modifiées depuis la dernière exécution sont ré-extraites
+    # Concurrence adaptative: démarre à 5 et s'ajuste selon la mémoire (navigateur compris) et la latence
+    # Télémétrie: spans dans output_docs/telemetry.jsonl, métriques Prometheus dans output_docs/metrics.prom
+    os.makedirs("output_docs", exist_ok=True)
+    telemetry = Telemetry(jsonl_path="output_docs/telemetry.jsonl")
+    crawl = crawl_parallel(urls, max_concurrent=5, output_dir="output_docs",
+                           incremental=True, lastmods=lastmods,
+                           adaptive=True, max_concurrent_limit=20, memory_budget_mb=4096,
+                           tiered_fetch=True, telemetry=telemetry)
+    try:
+        # CRAWL_PROFILE=cprofile ou pyinstrument: profile l'extraction complète
+        profiler = os.environ.get("CRAWL_PROFILE")
+        if profiler:
+            extension = "prof" if profiler == "cprofile" else "html"
+            await profile_crawl(crawl, profiler=profiler, output_path=f"output_docs/profile.{extension}")
+        else:
+            await crawl
+    finally:
+        telemetry.write_prometheus("output_docs/metrics.prom")
+        telemetry.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
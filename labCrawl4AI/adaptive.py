@@ -0,0 +1,94 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, Optional
+
+import psutil
+
+from scheduler import SlidingWindowScheduler, percentile
+
+
+def process_tree_rss(process: Optional[psutil.Process] = None) -> int:
+    """Mémoire résidente (octets) du processus Python et de tous ses enfants (navigateur Chromium)"""
+    process = process or psutil.Process(os.getpid())
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return total
+
+
+class AdaptiveConcurrencyController:
+    """
+    Ajuste la concurrence d'un SlidingWindowScheduler selon la mémoire et la latence (AIMD):
+    +1 tâche tant que la mémoire (processus + enfants) et la latence p95 récente restent sous leurs budgets
+    et que l'ordonnanceur est saturé (toutes les places occupées par des téléchargements, pas par des
+    attentes de politesse); division par deux (et appel de 'on_backoff') dès qu'un budget est dépassé.
+    """
+
+    def __init__(self, scheduler: SlidingWindowScheduler, min_concurrent: int = 1, max_concurrent: int = 32,
+                 memory_budget_mb: int = 4096, latency_budget: float = 15.0, interval: float = 2.0,
+                 on_backoff: Optional[Callable[[], Awaitable[None]]] = None):
+        self.scheduler = scheduler
+        self.min_concurrent = min_concurrent
+        self.max_concurrent = max_concurrent
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.latency_budget = latency_budget
+        self.interval = interval
+        self.on_backoff = on_backoff
+        self.process = psutil.Process(os.getpid())
+        self.peak_rss = 0
+        self._latency_cursor = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _recent_p95(self) -> Optional[float]:
+        """Latence p95 des pages terminées depuis le dernier échantillon"""
+        latencies = self.scheduler.stats.latencies
+        recent = sorted(latencies[self._latency_cursor:])
+        self._latency_cursor = len(latencies)
+        if not recent:
+            return None
+        return percentile(recent, 95)
+
+    async def step(self):
+        """Un échantillon: mesure, décision et redimensionnement de l'ordonnanceur"""
+        rss = await asyncio.to_thread(process_tree_rss, self.process)
+        self.peak_rss = max(self.peak_rss, rss)
+        p95 = self._recent_p95()
+        current = self.scheduler.max_concurrent
+
+        over_memory = rss > self.memory_budget
+        over_latency = p95 is not None and p95 > self.latency_budget
+        if over_memory or over_latency:
+            target = max(self.min_concurrent, current // 2)
+            reason = "mémoire" if over_memory else "latence"
+            print(f"Concurrence réduite ({reason}): {current} -> {target}, "
+                  f"RSS {rss // (1024 * 1024)} MB, p95 {p95 or 0:.2f}s")
+            await self.scheduler.resize(target)
+            if self.on_backoff:
+                await self.on_backoff()
+        elif (rss < 0.8 * self.memory_budget
+              and (p95 is None or p95 < 0.8 * self.latency_budget)
+              and self.scheduler.fetching >= current
+              and current < self.max_concurrent):
+            await self.scheduler.resize(current + 1)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.step()
+            except psutil.Error as e:
+                print(f"Erreur de mesure mémoire: {e}")
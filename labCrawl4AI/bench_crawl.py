@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import psutil
+
+from scheduler import percentile
+
+STRATEGIES = ["parallel", "sequential", "website", "sharded"]
+# Seule la stratégie 'website' suit les liens; les autres ne connaissent que les URLs du sitemap
+LINK_FOLLOWING_STRATEGIES = {"website"}
+
+
+class SyntheticSite:
+    """
+    Site HTTP local généré à la volée: 'pages' pages de ~'page_kb' KB, 'fanout' liens internes par page,
+    latence de réponse tirée d'une distribution, robots.txt et sitemap.xml optionnel.
+    Une fraction 'js_fraction' des pages est une application JavaScript vide (force le navigateur).
+    """
+
+    def __init__(self, pages: int = 200, page_kb: int = 20, fanout: int = 10, latency_ms: float = 50.0,
+                 latency_distribution: str = "exponential", js_fraction: float = 0.0, sitemap: bool = True,
+                 seed: int = 0):
+        self.pages = pages
+        self.page_kb = page_kb
+        self.fanout = fanout
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.js_fraction = js_fraction
+        self.sitemap = sitemap
+        self.seed = seed
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def config(self) -> dict:
+        return {
+            "pages": self.pages,
+            "page_kb": self.page_kb,
+            "fanout": self.fanout,
+            "latency_ms": self.latency_ms,
+            "latency_distribution": self.latency_distribution,
+            "js_fraction": self.js_fraction,
+            "sitemap": self.sitemap,
+            "seed": self.seed,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.served_pages = 0
+            self.service_times: List[float] = []
+
+    def _delay(self, rng: random.Random) -> float:
+        mean = self.latency_ms / 1000
+        if self.latency_distribution == "fixed":
+            return mean
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if self.latency_distribution == "lognormal":
+            # Moyenne 'mean' avec une longue traîne (sigma = 1)
+            return rng.lognormvariate(0, 1.0) * mean / 1.6487
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+
+    def page_html(self, index: int) -> str:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        if rng.random() < self.js_fraction:
+            return (f"<html><head><title>Page {index}</title><script src=\"/app.js\"></script></head>"
+                    f"<body><div id=\"root\"></div></body></html>")
+        links = "".join(
+            f'<li><a href="/docs/page-{rng.randrange(self.pages)}/">Page liée {j}</a></li>'
+            for j in range(self.fanout)
+        )
+        paragraph = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8 + "</p>"
+        paragraphs = paragraph * max(1, self.page_kb * 1024 // len(paragraph))
+        return (f"<html><head><title>Page {index}</title></head><body><nav><ul>{links}</ul></nav>"
+                f"<main><h1>Page {index}</h1>{paragraphs}</main></body></html>")
+
+    def sitemap_xml(self) -> str:
+        entries = "".join(
+            f"<url><loc>{self.base_url}/docs/page-{i}/</loc><lastmod>2024-01-01</lastmod></url>"
+            for i in range(self.pages)
+        )
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>')
+
+    def robots_txt(self) -> str:
+        lines = ["User-agent: *", "Allow: /"]
+        if self.sitemap:
+            lines.append(f"Sitemap: {self.base_url}/sitemap.xml")
+        return "\n".join(lines) + "\n"
+
+    def _make_handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                start = time.perf_counter()
+                path = self.path.split("?", 1)[0].split("#", 1)[0]
+                status, content_type, body, is_page = 404, "text/plain", "introuvable", False
+                if path == "/robots.txt":
+                    status, content_type, body = 200, "text/plain", site.robots_txt()
+                elif path == "/sitemap.xml" and site.sitemap:
+                    status, content_type, body = 200, "application/xml", site.sitemap_xml()
+                elif path in ("/", "/docs/", "/docs"):
+                    status, content_type, body, is_page = 200, "text/html; charset=utf-8", site.page_html(0), True
+                elif path.startswith("/docs/page-"):
+                    try:
+                        index = int(path[len("/docs/page-"):].strip("/"))
+                    except ValueError:
+                        index = -1
+                    if 0 <= index < site.pages:
+                        status, content_type, body, is_page = (200, "text/html; charset=utf-8",
+                                                               site.page_html(index), True)
+                if is_page:
+                    time.sleep(site._delay(random.Random()))
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                if is_page:
+                    with site._lock:
+                        site.served_pages += 1
+                        site.service_times.append(time.perf_counter() - start)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """p50/p90/p95/p99 (rang le plus proche) en millisecondes"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {f"p{p}": round(percentile(ordered, p) * 1000, 2) for p in (50, 90, 95, 99)}
+
+
+def _load_fast_parallel():
+    # Le nom du fichier contient un espace: import par chemin
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "FAST Parallel.py")
+    spec = importlib.util.spec_from_file_location("fast_parallel", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def _run_strategy(name: str, base_url: str, pages: int, max_concurrent: int, workers: int, output_dir: str):
+    from politeness import PolitenessPolicy
+
+    # Site local: pas de limitation de débit par hôte (elle mesurerait la politesse, pas le crawler)
+    politeness = PolitenessPolicy(requests_per_second=10_000, burst=10_000)
+    sitemap_url = f"{base_url}/sitemap.xml"
+    if name == "parallel":
+        from sitemap_stream import stream_sitemap_urls
+
+        await _load_fast_parallel().crawl_parallel(stream_sitemap_urls(sitemap_url), max_concurrent=max_concurrent,
+                                                   output_dir=output_dir, politeness=politeness, tiered_fetch=True)
+    elif name == "sequential":
+        from incremental import fetch_sitemap_entries
+        from sitemap import crawl_sequential
+
+        urls = [url for url, _ in await asyncio.to_thread(fetch_sitemap_entries, sitemap_url)]
+        await crawl_sequential(urls, tiered_fetch=True)
+    elif name == "website":
+        from exemple import WebsiteCrawler
+
+        crawler = WebsiteCrawler(f"{base_url}/", output_dir=output_dir, politeness=politeness, tiered_fetch=True)
+        await crawler.seed_from_sitemaps(await crawler.get_robots_txt_rules())
+        await crawler.crawl_site(max_pages=pages, max_concurrent=max_concurrent)
+    elif name == "sharded":
+        from sitemap_stream import stream_sitemap_urls
+        from sharded import crawl_sharded
+
+        await crawl_sharded(stream_sitemap_urls(sitemap_url), workers=workers,
+                            db_path=os.path.join(output_dir, "queue.db"), output_dir=output_dir,
+                            max_concurrent=max_concurrent)
+    else:
+        raise ValueError(f"Stratégie inconnue: {name}")
+
+
+def _strategy_process(name: str, base_url: str, pages: int, max_concurrent: int, workers: int, output_dir: str,
+                      quiet: bool, results):
+    """Processus enfant: exécute une stratégie et mesure la latence de chaque récupération de page"""
+    if quiet:
+        sys.stdout = open(os.devnull, "w")
+    import http_fetch
+
+    latencies: List[float] = []
+    original_fetch = http_fetch.TieredFetcher.fetch
+
+    async def timed_fetch(self, url, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await original_fetch(self, url, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    http_fetch.TieredFetcher.fetch = timed_fetch
+    start = time.perf_counter()
+    error = None
+    try:
+        asyncio.run(_run_strategy(name, base_url, pages, max_concurrent, workers, output_dir))
+    except Exception as e:
+        error = repr(e)
+    results.put({"wall_time": time.perf_counter() - start, "fetch_latencies": latencies, "error": error})
+
+
+def _sample_tree(process: psutil.Process, cpu_by_pid: Dict[int, float]) -> int:
+    """RSS total de l'arbre de processus; met à jour le temps CPU cumulé vu pour chaque processus"""
+    rss = 0
+    for p in [process] + process.children(recursive=True):
+        try:
+            rss += p.memory_info().rss
+            times = p.cpu_times()
+            cpu_by_pid[p.pid] = times.user + times.system
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return rss
+
+
+def run_benchmark(site: SyntheticSite, name: str, max_concurrent: int, workers: int, quiet: bool = True,
+                  sample_interval: float = 0.1) -> dict:
+    """Exécute une stratégie dans un processus séparé et mesure débit, latences, pic de RSS et CPU"""
+    site.reset_stats()
+    output_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    child = context.Process(target=_strategy_process,
+                            args=(name, site.base_url, site.pages, max_concurrent, workers, output_dir, quiet, results))
+    child.start()
+    process = psutil.Process(child.pid)
+    cpu_by_pid: Dict[int, float] = {}
+    peak_rss = 0
+    while child.is_alive() and results.empty():
+        try:
+            peak_rss = max(peak_rss, _sample_tree(process, cpu_by_pid))
+        except psutil.NoSuchProcess:
+            break
+        time.sleep(sample_interval)
+    try:
+        outcome = results.get(timeout=30)
+    except queue.Empty:
+        outcome = {"wall_time": 0.0, "fetch_latencies": [], "error": f"code de sortie {child.exitcode}"}
+    child.join()
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    wall_time = outcome["wall_time"]
+    cpu_seconds = sum(cpu_by_pid.values())
+    with site._lock:
+        pages = site.served_pages
+        service_times = list(site.service_times)
+    return {
+        "pages": pages,
+        "wall_time_s": round(wall_time, 3),
+        "pages_per_second": round(pages / wall_time, 2) if wall_time > 0 else 0.0,
+        # Latence vue par le crawler (None si les pages sont récupérées dans des processus petits-enfants)
+        "fetch_latency_ms": percentiles(outcome["fetch_latencies"]),
+        "server_latency_ms": percentiles(service_times),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "cpu_seconds": round(cpu_seconds, 2),
+        "cpu_percent": round(100 * cpu_seconds / wall_time, 1) if wall_time > 0 else 0.0,
+        "error": outcome["error"],
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, previous_path: str):
+    """Affiche l'évolution par rapport à un rapport précédent"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparaison avec {previous_path} (révision {previous.get('revision')}):")
+    for name, current in report["results"].items():
+        before = previous.get("results", {}).get(name)
+        if not before:
+            continue
+        for key in ("pages_per_second", "peak_rss_mb", "cpu_seconds"):
+            if before.get(key):
+                change = 100 * (current[key] - before[key]) / before[key]
+                print(f"  {name:>10} {key}: {before[key]} -> {current[key]} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des stratégies d'extraction sur un site local synthétique")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES), help=f"Parmi: {', '.join(STRATEGIES)}")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-kb", type=int, default=20)
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-distribution", default="exponential",
+                        choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--js-fraction", type=float, default=0.0, help="Part des pages nécessitant le navigateur")
+    parser.add_argument("--no-sitemap", action="store_true",
+                        help="Site sans sitemap.xml (uniquement pour les stratégies qui suivent les liens)")
+    parser.add_argument("--max-concurrent", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2, help="Processus pour la stratégie 'sharded'")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fichier JSON de résultats (défaut: bench_results/crawl-<date>.json)")
+    parser.add_argument("--compare", help="Rapport JSON précédent à comparer")
+    parser.add_argument("--verbose", action="store_true", help="Affiche la sortie des crawlers")
+    args = parser.parse_args()
+    strategies = [name.strip() for name in args.strategies.split(",") if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        parser.error(f"Stratégie(s) inconnue(s): {', '.join(unknown)}")
+    if args.no_sitemap:
+        without_seeds = [name for name in strategies if name not in LINK_FOLLOWING_STRATEGIES]
+        if without_seeds:
+            parser.error(f"--no-sitemap laisserait sans URL de départ: {', '.join(without_seeds)} "
+                         f"(seules les stratégies {', '.join(sorted(LINK_FOLLOWING_STRATEGIES))} suivent les liens)")
+
+    site = SyntheticSite(pages=args.pages, page_kb=args.page_kb, fanout=args.fanout, latency_ms=args.latency_ms,
+                         latency_distribution=args.latency_distribution, js_fraction=args.js_fraction,
+                         sitemap=not args.no_sitemap, seed=args.seed)
+    base_url = site.start()
+    print(f"Site synthétique: {base_url} ({args.pages} pages de ~{args.page_kb} KB, {args.fanout} liens/page)")
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "site": site.config(),
+        "max_concurrent": args.max_concurrent,
+        "workers": args.workers,
+        "results": {},
+    }
+    try:
+        for name in strategies:
+            print(f"\n=== {name} ===")
+            result = run_benchmark(site, name, args.max_concurrent, args.workers, quiet=not args.verbose)
+            report["results"][name] = result
+            if result["error"]:
+                print(f"  Erreur: {result['error']}")
+            latency = result["fetch_latency_ms"] or result["server_latency_ms"] or {}
+            print(f"  {result['pages']} pages en {result['wall_time_s']}s: {result['pages_per_second']} pages/s, "
+                  f"p50 {latency.get('p50')} ms, p99 {latency.get('p99')} ms, "
+                  f"pic RSS {result['peak_rss_mb']} MB, CPU {result['cpu_seconds']}s ({result['cpu_percent']}%)")
+    finally:
+        site.stop()
+
+    output = args.output or os.path.join(
+        "bench_results", f"crawl-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nRésultats enregistrés dans {output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
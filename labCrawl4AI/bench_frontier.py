@@ -0,0 +1,80 @@
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from frontier import CrawlFrontier
+
+
+def build_link_graph(page_count: int, fan_out: int, seed: int = 0) -> Dict[str, List[str]]:
+    """Génère un graphe de liens synthétique (local) de 'page_count' pages"""
+    rng = random.Random(seed)
+    base = "https://bench.local"
+    graph = {}
+    for i in range(page_count):
+        links = []
+        for _ in range(fan_out):
+            target = rng.randrange(page_count)
+            # Variantes d'une même URL: fragment et slash final
+            suffix = rng.choice(["", "/", "#section", "/#top"])
+            links.append(f"{base}/page/{target}{suffix}")
+        graph[f"{base}/page/{i}"] = links
+    return graph
+
+
+def crawl_with_list(graph: Dict[str, List[str]], start: str) -> int:
+    """Ancienne approche: liste + pop(0) + 'not in' sur la liste"""
+    visited = set()
+    urls_to_visit = [start]
+    while urls_to_visit:
+        url = urls_to_visit.pop(0)
+        visited.add(url)
+        for link in graph.get(url, []):
+            link = link.split("#")[0].rstrip("/")
+            if link not in visited and link not in urls_to_visit:
+                urls_to_visit.append(link)
+    return len(visited)
+
+
+def crawl_with_frontier(graph: Dict[str, List[str]], start: str) -> int:
+    """Nouvelle approche: CrawlFrontier (deque + index d'empreintes)"""
+    frontier = CrawlFrontier([start])
+    visited = 0
+    while frontier:
+        url = frontier.pop()
+        visited += 1
+        for link in graph.get(url, []):
+            frontier.add(link)
+    return visited
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la frontière d'extraction")
+    parser.add_argument("--pages", type=int, default=100_000)
+    parser.add_argument("--fan-out", type=int, default=10)
+    parser.add_argument("--legacy-max", type=int, default=20_000,
+                        help="Taille maximale testée avec l'ancienne approche (quadratique)")
+    args = parser.parse_args()
+
+    sizes = sorted({min(args.pages, n) for n in (1_000, 10_000, args.pages)})
+    for size in sizes:
+        graph = build_link_graph(size, args.fan_out)
+        start = "https://bench.local/page/0"
+
+        t0 = time.perf_counter()
+        count = crawl_with_frontier(graph, start)
+        frontier_time = time.perf_counter() - t0
+        print(f"{size:>8} pages - frontière: {count} visitées en {frontier_time:.3f}s")
+
+        if size <= args.legacy_max:
+            t0 = time.perf_counter()
+            count = crawl_with_list(graph, start)
+            list_time = time.perf_counter() - t0
+            print(f"{size:>8} pages - liste:     {count} visitées en {list_time:.3f}s "
+                  f"(x{list_time / frontier_time:.1f})")
+        else:
+            print(f"{size:>8} pages - liste:     ignorée (> --legacy-max)")
+
+
+if __name__ == "__main__":
+    main()
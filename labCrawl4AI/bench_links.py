@@ -0,0 +1,72 @@
+import argparse
+import glob
+import os
+import random
+import time
+from typing import List, Tuple
+
+import link_extractor
+from link_extractor import extract_hrefs
+
+
+def synthetic_corpus(page_count: int, links_per_page: int = 150, seed: int = 0) -> List[Tuple[str, str]]:
+    """Pages HTML synthétiques (navigation + contenu) si aucun corpus n'est fourni"""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(page_count):
+        links = "".join(
+            f'<li><a href="/docs/page-{rng.randrange(1000)}/#s{j}" class="nav">Lien {j}</a></li>'
+            for j in range(links_per_page)
+        )
+        paragraphs = "".join(f"<p>Paragraphe {j} " + "texte " * 60 + "</p>" for j in range(40))
+        html = (f"<html><head><title>Page {i}</title><script>var a = '<a href=\"/x\">';</script></head>"
+                f"<body><nav><ul>{links}</ul></nav><main>{paragraphs}"
+                f'<a href="https://ailleurs.example/" rel="nofollow">externe</a></main></body></html>')
+        pages.append((f"https://bench.local/docs/page-{i}/", html))
+    return pages
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, str]]:
+    """Charge des pages sauvegardées (*.html); l'URL de base est dérivée du nom de fichier"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            pages.append((f"https://corpus.local/{os.path.basename(path)}", f.read()))
+    return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de l'extraction de liens")
+    parser.add_argument("--corpus", help="Dossier de pages HTML sauvegardées (*.html)")
+    parser.add_argument("--pages", type=int, default=200, help="Taille du corpus synthétique")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.pages)
+    total_bytes = sum(len(html) for _, html in pages)
+    print(f"Corpus: {len(pages)} pages, {total_bytes // 1024} KB")
+
+    backends = ["regex", "bs4"]
+    if link_extractor.lxml is not None:
+        backends.insert(0, "lxml")
+
+    reference = None
+    for backend in backends:
+        try:
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                links = [extract_hrefs(html, url, backend=backend) for url, html in pages]
+                best = min(best, time.perf_counter() - t0)
+        except ImportError as e:
+            print(f"{backend:>6}: indisponible ({e})")
+            continue
+        count = sum(len(page_links) for page_links in links)
+        if reference is None:
+            reference = links
+        same = "identique" if links == reference else "différent"
+        print(f"{backend:>6}: {best * 1000:.1f} ms ({len(pages) / best:.0f} pages/s, {count} liens, {same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import sqlite3
+import time
+from typing import List, Set, Tuple
+
+from frontier import normalize_url
+
+
+class CrawlState:
+    """
+    Point de reprise persistant d'une extraction (SQLite en mode WAL).
+    Conserve la frontière (URLs en attente, dans l'ordre d'ajout) et les URLs visitées.
+    Les URLs sont gardées telles que découvertes (ce sont elles qui sont extraites à la reprise);
+    leur forme normalisée ne sert que de clé d'unicité.
+    Les écritures sont regroupées en transactions pour ne pas ralentir l'extraction.
+    """
+
+    def __init__(self, db_path: str, flush_every: int = 500, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        # Couples (URL découverte, URL normalisée) en attente d'écriture
+        self._pending_enqueued: List[Tuple[str, str]] = []
+        self._pending_visited: List[Tuple[str, str]] = []
+        self._last_flush = time.monotonic()
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # En mode WAL, NORMAL reste sûr en cas d'arrêt brutal du processus
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(urls)")]
+        if columns and "normalized" not in columns:
+            # Ancien format (URL normalisée seule): migration, les URLs existantes servent de clé
+            self.conn.execute("ALTER TABLE urls RENAME TO urls_v1")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL,"
+            " normalized TEXT NOT NULL UNIQUE,"
+            " visited INTEGER NOT NULL DEFAULT 0)"
+        )
+        if columns and "normalized" not in columns:
+            self.conn.execute(
+                "INSERT INTO urls (id, url, normalized, visited) SELECT id, url, url, visited FROM urls_v1"
+            )
+            self.conn.execute("DROP TABLE urls_v1")
+        self.conn.commit()
+
+    def has_data(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is not None
+
+    def reset(self):
+        """Efface le point de reprise (nouvelle extraction complète)"""
+        self._pending_enqueued.clear()
+        self._pending_visited.clear()
+        with self.conn:
+            self.conn.execute("DELETE FROM urls")
+
+    def load(self) -> Tuple[Set[str], List[str]]:
+        """Retourne (URLs visitées, URLs en attente dans l'ordre de la frontière)"""
+        self.flush()
+        visited: Set[str] = set()
+        pending: List[str] = []
+        for url, is_visited in self.conn.execute("SELECT url, visited FROM urls ORDER BY id"):
+            if is_visited:
+                visited.add(url)
+            else:
+                pending.append(url)
+        return visited, pending
+
+    def enqueue(self, url: str):
+        self._pending_enqueued.append((url, normalize_url(url)))
+        self._maybe_flush()
+
+    def mark_visited(self, url: str):
+        self._pending_visited.append((url, normalize_url(url)))
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = len(self._pending_enqueued) + len(self._pending_visited)
+        if pending >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Écrit toutes les opérations en attente dans une seule transaction"""
+        if self._pending_enqueued or self._pending_visited:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO urls (url, normalized) VALUES (?, ?)", self._pending_enqueued
+                )
+                self.conn.executemany(
+                    "INSERT INTO urls (url, normalized, visited) VALUES (?, ?, 1)"
+                    " ON CONFLICT(normalized) DO UPDATE SET visited = 1",
+                    self._pending_visited,
+                )
+            self._pending_enqueued.clear()
+            self._pending_visited.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
@@ -1,80 +1,182 @@
 import os
 import asyncio
-import re
-from typing import List, Set
-from urllib.parse import urljoin, urlparse
-import requests
-from bs4 import BeautifulSoup
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+import argparse
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+from crawl4ai import BrowserConfig, CrawlerRunConfig
+from frontier import CrawlFrontier
+from crawl_state import CrawlState
+from link_extractor import same_domain_links, url_netloc
+from politeness import PolitenessPolicy
+from sitemap_stream import stream_sitemap_urls
+from http_fetch import TieredFetcher
+from postprocess import PostProcessingStage
+from output_writer import AsyncOutputWriter
+from naming import url_to_path
+from telemetry import NULL_TELEMETRY, Telemetry
+from neardup import NearDuplicateIndex
 
 class WebsiteCrawler:
-    def __init__(self, base_url: str, output_dir: str = "crawled_data"):
+    def __init__(self, base_url: str, output_dir: str = "crawled_data", state_path: Optional[str] = None,
+                 postprocess_executor: str = "process", postprocess_workers: Optional[int] = None,
+                 output_mode: str = "files", fsync: str = "batch",
+                 politeness: Optional[PolitenessPolicy] = None, tiered_fetch: bool = False,
+                 telemetry: Optional[Telemetry] = None, near_duplicates: bool = True, fresh: bool = False):
         self.base_url = base_url
         self.domain = urlparse(base_url).netloc
         self.visited_urls: Set[str] = set()
-        self.urls_to_visit: List[str] = [base_url]
+        # Quasi-doublons (SimHash + LSH): non sauvegardés, et les motifs d'URL qui en produisent
+        # surtout (pagination, versions, vues d'impression) passent en fin de frontière
+        self.near_duplicates = NearDuplicateIndex() if near_duplicates else None
+        # Frontière en O(1): file + index des URLs déjà vues (normalisées)
+        self.urls_to_visit = CrawlFrontier(
+            deprioritize=self.near_duplicates.is_deprioritized if self.near_duplicates else None
+        )
         self.output_dir = output_dir
         
         # Création du dossier de sortie
         os.makedirs(output_dir, exist_ok=True)
         
+        # Point de reprise persistant (optionnel): reprend là où une extraction précédente s'est arrêtée,
+        # sauf avec 'fresh' (le point de reprise est effacé et l'extraction repart de zéro)
+        self.state = CrawlState(state_path) if state_path else None
+        if self.state and fresh:
+            self.state.reset()
+        if self.state and self.state.has_data():
+            self.visited_urls, pending_urls = self.state.load()
+            for url in self.visited_urls:
+                self.urls_to_visit.mark_seen(url)
+            for url in pending_urls:
+                self.urls_to_visit.add(url)
+            print(f"Reprise de l'extraction: {len(self.visited_urls)} pages visitées, {len(pending_urls)} en attente")
+        else:
+            self.add_url(base_url)
+        
         # Configuration du crawler
         self.browser_config = BrowserConfig(
             headless=True,
             extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"],
         )
-        self.crawler = None
+        # Client HTTP d'abord si 'tiered_fetch', navigateur seulement pour les pages qui en ont besoin
+        self.tiered_fetch = tiered_fetch
+        self.fetcher = None
+        
+        # Politesse: robots.txt en cache, Crawl-delay et débit limité par hôte
+        self.politeness = politeness or PolitenessPolicy()
+        
+        # Télémétrie: spans par URL et par étape (inactive par défaut)
+        self.telemetry = telemetry or NULL_TELEMETRY
+        
+        # Étage de post-traitement (pool de processus ou de threads), créé au démarrage de l'extraction
+        self.postprocess_executor = postprocess_executor
+        self.postprocess_workers = postprocess_workers
+        self.postprocessor = None
+        
+        # Écrivain asynchrone par lots pour le Markdown
+        self.output_mode = output_mode
+        self.fsync = fsync
+        self.writer = None
+        # Étapes restantes (écriture + liens) avant de marquer une page comme visitée
+        self._pending_steps: Dict[str, int] = {}
     
-    def get_robots_txt_rules(self):
-        """Récupère les règles de robots.txt"""
-        robots_url = urljoin(self.base_url, "/robots.txt")
-        try:
-            response = requests.get(robots_url)
-            if response.status_code == 200:
-                print(f"Règles robots.txt trouvées: {robots_url}")
-                print(response.text[:500] + "..." if len(response.text) > 500 else response.text)
-            else:
-                print(f"Pas de robots.txt trouvé à {robots_url}")
-        except Exception as e:
-            print(f"Erreur lors de la récupération de robots.txt: {e}")
+    def add_url(self, url: str):
+        """Ajoute une URL à la frontière (et au point de reprise) si elle n'a jamais été vue"""
+        if self.urls_to_visit.add(url) and self.state:
+            self.state.enqueue(url)
+    
+    async def get_robots_txt_rules(self) -> List[str]:
+        """Charge les règles robots.txt du site (mises en cache) et retourne ses entrées Sitemap"""
+        robots = await self.politeness.robots(self.base_url)
+        if robots.allow_all:
+            print(f"Pas de robots.txt exploitable pour {self.base_url}: tout est autorisé")
+        elif robots.disallow_all:
+            print(f"robots.txt inaccessible (401/403) pour {self.base_url}: rien n'est autorisé")
+        else:
+            print(f"Règles robots.txt trouvées: {robots.url}")
+        delay = await self.politeness.crawl_delay(self.base_url)
+        if delay:
+            print(f"Crawl-delay appliqué: {delay}s")
+        sitemaps = await self.politeness.sitemaps(self.base_url)
+        for sitemap in sitemaps:
+            print(f"Sitemap déclaré: {sitemap}")
+        return sitemaps
+    
+    async def seed_from_sitemaps(self, sitemaps: List[str]):
+        """Ajoute à la frontière les URLs du domaine listées dans les sitemaps"""
+        for sitemap in sitemaps:
+            async for url in stream_sitemap_urls(sitemap):
+                if url_netloc(url) == self.domain:
+                    self.add_url(url)
     
     def extract_links(self, url: str, html_content: str) -> List[str]:
-        """Extrait les liens d'une page HTML"""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        links = []
-        
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            # Convertit les URLs relatives en URLs absolues
-            full_url = urljoin(url, href)
-            
-            # Vérifie si l'URL est dans le même domaine
-            if urlparse(full_url).netloc == self.domain:
-                links.append(full_url)
-        
-        return links
+        """Extrait les liens d'une page HTML (respecte <base href> et rel=nofollow)"""
+        # Extracteur dédié (lxml ou tokeniseur) et vérification du domaine avec urlparse mis en cache
+        return same_domain_links(html_content, url, self.domain)
+    
+    def _on_page_processed(self, result):
+        """Reçoit le résultat du post-traitement d'une page (dans la boucle d'événements)"""
+        url, new_links = result
+        # Ajoute les nouveaux liens jamais vus à la frontière (déduplication en O(1))
+        for link in new_links:
+            self.add_url(link)
+        self._complete_step(url)
+    
+    def _on_page_written(self, saved):
+        """Reçoit la confirmation d'écriture d'une page par l'écrivain asynchrone"""
+        if saved.near_duplicate_of:
+            print(f"Quasi-doublon de {saved.near_duplicate_of}, non sauvegardé: {saved.url}")
+        self._complete_step(saved.url)
+    
+    def _complete_step(self, url: str):
+        # La page n'est marquée visitée qu'une fois écrite et ses liens enregistrés
+        remaining = self._pending_steps.pop(url, 1) - 1
+        if remaining > 0:
+            self._pending_steps[url] = remaining
+        elif self.state:
+            self.state.mark_visited(url)
     
     async def crawl_site(self, max_pages: int = 10, max_concurrent: int = 3):
         """Parcourt le site en extrayant le contenu et en suivant les liens"""
         try:
-            # Démarre le crawler
-            self.crawler = AsyncWebCrawler(config=self.browser_config)
-            await self.crawler.start()
+            # Prépare le crawler (le navigateur démarre à la première page qui en a besoin)
+            # Pool de 'max_concurrent' sessions réutilisées (une par page en cours), recyclées régulièrement
+            self.fetcher = TieredFetcher(self.browser_config, http_first=self.tiered_fetch,
+                                         session_pool_size=max_concurrent, telemetry=self.telemetry)
+            
+            # Démarre l'étage de post-traitement
+            self.postprocessor = PostProcessingStage(
+                postprocess_page,
+                on_result=self._on_page_processed,
+                executor=self.postprocess_executor,
+                workers=self.postprocess_workers,
+                telemetry=self.telemetry,
+                stage="link_extraction",
+            )
+            self.postprocessor.start()
+            self.writer = AsyncOutputWriter(self.output_dir, mode=self.output_mode, fsync=self.fsync,
+                                            on_written=self._on_page_written, telemetry=self.telemetry,
+                                            near_duplicates=self.near_duplicates)
+            self.writer.start()
             
             page_count = 0
             
-            while self.urls_to_visit and page_count < max_pages:
+            while page_count < max_pages:
+                if not self.urls_to_visit:
+                    # Les liens des dernières pages sont peut-être encore en cours d'analyse
+                    await self.postprocessor.join()
+                    if not self.urls_to_visit:
+                        break
+                
                 # Prend un lot d'URLs à traiter
                 batch_size = min(max_concurrent, max_pages - page_count, len(self.urls_to_visit))
-                batch_urls = [self.urls_to_visit.pop(0) for _ in range(batch_size)]
+                batch_urls = [self.urls_to_visit.pop() for _ in range(batch_size)]
                 tasks = []
                 
                 for url in batch_urls:
                     # Marque l'URL comme visitée
                     self.visited_urls.add(url)
-                    # Crée une tâche pour extraire la page
-                    session_id = f"session_{page_count}"
-                    task = self.process_page(url, session_id)
+                    # Crée une tâche pour extraire la page (session louée au pool si nécessaire)
+                    task = self.process_page(url)
                     tasks.append(task)
                 
                 # Exécute les tâches en parallèle
@@ -82,48 +184,70 @@ class WebsiteCrawler:
                 
                 # Analyse les résultats et collecte de nouveaux liens
                 for url, result in zip(batch_urls, batch_results):
-                    if isinstance(result, Exception):
-                        print(f"Erreur lors du traitement de {url}: {result}")
-                    elif result:
+                    if result is True:
                         print(f"Traité avec succès: {url}")
                         page_count += 1
+                        continue
+                    if isinstance(result, Exception):
+                        print(f"Erreur lors du traitement de {url}: {result}")
+                    # Une page en échec est tout de même considérée comme visitée
+                    if self.state:
+                        self.state.mark_visited(url)
+                
+                # Enregistre le lot (pages visitées + nouveaux liens) dans une seule transaction
+                if self.state:
+                    self.state.flush()
                 
                 print(f"Pages traitées: {page_count}/{max_pages}")
             
             print(f"\nTerminé! {page_count} pages ont été extraites et sauvegardées dans {self.output_dir}")
+            self.fetcher.print_summary()
+            if self.near_duplicates:
+                self.near_duplicates.print_summary()
+            self.telemetry.print_summary()
         
         finally:
             # Ferme le crawler à la fin
-            if self.crawler:
-                await self.crawler.close()
+            if self.fetcher:
+                await self.fetcher.close()
+            # Termine les post-traitements et écritures en attente
+            if self.postprocessor:
+                await self.postprocessor.close()
+            if self.writer:
+                await self.writer.close()
+            await self.politeness.close()
+            if self.state:
+                self.state.close()
     
-    async def process_page(self, url: str, session_id: str) -> bool:
+    async def process_page(self, url: str, session_id: Optional[str] = None) -> bool:
         """Traite une page web individuelle"""
         try:
+            # Consulte robots.txt et attend le tour de l'hôte avant l'envoi
+            with self.telemetry.span(url, "politeness") as span:
+                span["allowed"] = await self.politeness.allowed(url)
+                if span["allowed"]:
+                    await self.politeness.wait_turn(url)
+            if not span["allowed"]:
+                print(f"Interdit par robots.txt: {url}")
+                return False
+            
             # Extraction de la page
-            result = await self.crawler.arun(
-                url=url,
+            result = await self.fetcher.fetch(
+                url,
                 session_id=session_id
             )
             
             if not result.success:
                 print(f"Échec de l'extraction: {url} - {result.error_message}")
+                self.telemetry.counter("crawl_pages_total", outcome="failure")
                 return False
+            self.telemetry.counter("crawl_pages_total", outcome="success")
             
-            # Sauvegarde du contenu Markdown
-            file_name = self.url_to_filename(url)
-            file_path = os.path.join(self.output_dir, file_name)
-            
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(result.markdown.raw_markdown)
-            
-            # Extraction des nouveaux liens
-            new_links = self.extract_links(url, result.raw_html)
-            
-            # Ajoute les nouveaux liens non visités à la liste à visiter
-            for link in new_links:
-                if link not in self.visited_urls and link not in self.urls_to_visit:
-                    self.urls_to_visit.append(link)
+            # Sauvegarde du Markdown (écrivain asynchrone) et extraction des liens (pool),
+            # chacune attend si sa file est pleine
+            self._pending_steps[url] = 2
+            await self.writer.write(url, self.url_to_filename(url), result.markdown.raw_markdown)
+            await self.postprocessor.submit(url, result.raw_html, self.domain)
             
             return True
         
@@ -131,31 +255,23 @@ class WebsiteCrawler:
             print(f"Erreur lors du traitement de {url}: {e}")
             return False
     
-    def url_to_filename(self, url: str) -> str:
-        """Convertit une URL en nom de fichier valide"""
-        # Supprime le protocole et le domaine
-        path = urlparse(url).path
-        
-        # Traite les cas spéciaux
-        if path == "" or path == "/":
-            return "index.md"
-        
-        # Remplace les caractères non valides pour les noms de fichiers
-        filename = re.sub(r'[\\/*?:"<>|]', "_", path)
-        
-        # Supprime les slashes de début et de fin
-        filename = filename.strip("/")
-        
-        # Remplace les slashes restants par des underscores
-        filename = filename.replace("/", "_")
-        
-        # Ajoute l'extension .md si nécessaire
-        if not filename.endswith(".md"):
-            filename += ".md"
-        
-        return filename
+    @staticmethod
+    def url_to_filename(url: str) -> str:
+        """Convertit une URL en nom de fichier valide, déterministe et sans collision (requête comprise)"""
+        return url_to_path(url)
+
+def postprocess_page(url: str, html_content: str, domain: str):
+    """Post-traitement d'une page (exécuté dans le pool): extraction des liens du même domaine"""
+    return url, same_domain_links(html_content, url, domain)
 
 async def main():
+    parser = argparse.ArgumentParser(description="Extraction d'un site complet")
+    parser.add_argument("--state", default="site_content/crawl_state.db",
+                        help="Point de reprise (chaîne vide: pas de reprise)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Ignore le point de reprise et recommence l'extraction depuis le début")
+    args = parser.parse_args()
+
     # URL du site à extraire
     site_url = "https://ai.pydantic.dev/"  # Remplacez par le site de votre choix
     
@@ -168,14 +284,24 @@ async def main():
         subprocess.check_call(["pip", "install", "beautifulsoup4"])
     
     # Création du crawler
-    crawler = WebsiteCrawler(site_url, output_dir="site_content")
+    # Télémétrie: spans dans site_content/telemetry.jsonl, métriques Prometheus dans site_content/metrics.prom
+    os.makedirs("site_content", exist_ok=True)
+    telemetry = Telemetry(jsonl_path="site_content/telemetry.jsonl")
+    crawler = WebsiteCrawler(site_url, output_dir="site_content", state_path=args.state or None,
+                             tiered_fetch=True, telemetry=telemetry, fresh=args.fresh)
     
     # Vérification des règles robots.txt
-    crawler.get_robots_txt_rules()
+    sitemaps = await crawler.get_robots_txt_rules()
+    # Les sitemaps déclarés dans robots.txt complètent la frontière
+    await crawler.seed_from_sitemaps(sitemaps)
     
     # Lancement de l'extraction
     print(f"Démarrage de l'extraction du site: {site_url}")
-    await crawler.crawl_site(max_pages=20, max_concurrent=5)
+    try:
+        await crawler.crawl_site(max_pages=20, max_concurrent=5)
+    finally:
+        telemetry.write_prometheus("site_content/metrics.prom")
+        telemetry.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
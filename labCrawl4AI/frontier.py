@@ -0,0 +1,88 @@
+import hashlib
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Deque, Iterable, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+@lru_cache(maxsize=65536)
+def normalize_url(url: str) -> str:
+    """
+    Normalise une URL pour la déduplication:
+    schéma et hôte en minuscules, port par défaut retiré, fragment supprimé,
+    paramètres de requête triés et slash final retiré.
+    """
+    parsed = urlsplit(url.strip())
+    scheme = parsed.scheme.lower()
+    host = parsed.netloc.lower()
+    if ":" in host and not host.endswith("]"):
+        hostname, _, port = host.rpartition(":")
+        if port.isdigit() and int(port) == DEFAULT_PORTS.get(scheme):
+            host = hostname
+
+    path = parsed.path or "/"
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True))) if parsed.query else ""
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+def url_fingerprint(url: str) -> int:
+    """Empreinte compacte (64 bits) d'une URL déjà normalisée"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class CrawlFrontier:
+    """
+    Frontière d'extraction en O(1): file FIFO (deque) + index des empreintes déjà vues.
+    Une URL n'est mise en file qu'une seule fois, qu'elle soit en attente ou déjà visitée.
+    Avec 'deprioritize', les URLs pour lesquelles la fonction retourne True au moment du retrait
+    (ex: motif produisant surtout des doublons) passent après toutes les autres.
+    """
+
+    def __init__(self, urls: Iterable[str] = (), deprioritize: Optional[Callable[[str], bool]] = None):
+        self._queue: Deque[str] = deque()
+        self._deferred: Deque[str] = deque()
+        self.deprioritize = deprioritize
+        self._seen: Set[int] = set()
+        for url in urls:
+            self.add(url)
+
+    def add(self, url: str) -> bool:
+        """
+        Ajoute l'URL si sa forme normalisée n'a jamais été vue; retourne True si ajoutée.
+        L'URL découverte est mise en file telle quelle (la forme normalisée ne sert qu'à l'empreinte).
+        """
+        fingerprint = url_fingerprint(normalize_url(url))
+        if fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+        self._queue.append(url)
+        return True
+
+    def mark_seen(self, url: str):
+        """Enregistre une URL comme déjà vue sans la mettre en file (ex: reprise d'une extraction)"""
+        self._seen.add(url_fingerprint(normalize_url(url)))
+
+    def pop(self) -> str:
+        """Retire la prochaine URL à visiter"""
+        if self.deprioritize is not None:
+            while self._queue:
+                url = self._queue.popleft()
+                if not self.deprioritize(url):
+                    return url
+                self._deferred.append(url)
+            return self._deferred.popleft()
+        return self._queue.popleft()
+
+    def seen(self, url: str) -> bool:
+        return url_fingerprint(normalize_url(url)) in self._seen
+
+    def __len__(self) -> int:
+        return len(self._queue) + len(self._deferred)
+
+    def __bool__(self) -> bool:
+        return bool(self._queue) or bool(self._deferred)
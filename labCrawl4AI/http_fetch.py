@@ -0,0 +1,180 @@
+import asyncio
+import re
+from typing import Dict, Iterable, Optional
+
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig  # type: ignore
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator  # type: ignore
+
+from session_pool import SessionPool
+from telemetry import NULL_TELEMETRY, Telemetry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (active HTTP/2 dans httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Point de montage vide d'une application JavaScript (React, Vue, Next, Nuxt...)
+EMPTY_APP_ROOT = re.compile(
+    r"""<div[^>]+id=["'](?:root|app|__next|__nuxt)["'][^>]*>\s*</div>""", re.IGNORECASE
+)
+NOSCRIPT_WARNING = re.compile(r"<noscript[^>]*>[^<]*(?:enable|activer)[^<]*javascript", re.IGNORECASE)
+INVISIBLE = re.compile(r"<script\b.*?</script\s*>|<style\b.*?</style\s*>|<[^>]+>", re.IGNORECASE | re.DOTALL)
+
+
+def needs_javascript(html: str, min_text_chars: int = 200) -> bool:
+    """Heuristique: la page a-t-elle besoin d'un navigateur pour afficher son contenu?"""
+    if EMPTY_APP_ROOT.search(html) or NOSCRIPT_WARNING.search(html):
+        return True
+    visible_text = " ".join(INVISIBLE.sub(" ", html).split())
+    return len(visible_text) < min_text_chars
+
+
+class HttpCrawlResult:
+    """Résultat d'une page récupérée sans navigateur, compatible avec les champs utilisés de CrawlResult"""
+
+    def __init__(self, url: str, html: str, markdown, status_code: int, response_headers: Dict[str, str]):
+        self.url = url
+        self.success = True
+        self.error_message = None
+        self.raw_html = html
+        self.markdown = markdown
+        self.status_code = status_code
+        self.response_headers = response_headers
+
+
+class TieredFetcher:
+    """
+    Récupération à deux niveaux:
+    1. client HTTP asynchrone mutualisé (keep-alive, HTTP/2 si 'h2' est installé,
+       compression gzip/deflate négociée par httpx, br/zstd si brotli/zstandard sont installés),
+       puis conversion du HTML en Markdown;
+    2. navigateur (AsyncWebCrawler), démarré seulement si une page en a besoin
+       (heuristique JavaScript, erreur HTTP, contenu non HTML ou motif d'URL dans 'browser_patterns').
+    Avec http_first=False, toutes les pages passent par le navigateur (comportement d'origine).
+    Avec 'session_pool_size', les pages rendues sans session explicite louent une session d'un SessionPool.
+    Avec une 'telemetry', chaque étape (fetch_http, markdown, render) est enregistrée comme span.
+    """
+
+    def __init__(self, browser_config: BrowserConfig, crawl_config: Optional[CrawlerRunConfig] = None,
+                 http_first: bool = True, browser_patterns: Iterable[str] = (), http_patterns: Iterable[str] = (),
+                 min_text_chars: int = 200, max_connections: int = 32, timeout: float = 20.0,
+                 session_pool_size: Optional[int] = None, max_pages_per_session: int = 50,
+                 session_rss_threshold_mb: Optional[int] = None, telemetry: Optional[Telemetry] = None):
+        self.browser_config = browser_config
+        self.crawl_config = crawl_config
+        self.http_first = http_first and httpx is not None
+        if http_first and httpx is None:
+            print("httpx n'est pas installé: toutes les pages passent par le navigateur")
+        self.browser_patterns = [re.compile(p) for p in browser_patterns]
+        self.http_patterns = [re.compile(p) for p in http_patterns]
+        self.min_text_chars = min_text_chars
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.markdown_generator = DefaultMarkdownGenerator()
+        self.crawler: Optional[AsyncWebCrawler] = None
+        self.client = None
+        self.counts = {"http": 0, "browser": 0}
+        self.telemetry = telemetry or NULL_TELEMETRY
+        self._browser_lock = asyncio.Lock()
+        self.session_pool = None
+        if session_pool_size:
+            self.session_pool = SessionPool(self.kill_session, size=session_pool_size,
+                                            max_pages_per_session=max_pages_per_session,
+                                            rss_threshold_mb=session_rss_threshold_mb)
+
+    async def browser(self) -> AsyncWebCrawler:
+        """Démarre le navigateur à la première page qui en a besoin"""
+        async with self._browser_lock:
+            if self.crawler is None:
+                self.crawler = AsyncWebCrawler(config=self.browser_config)
+                await self.crawler.start()
+        return self.crawler
+
+    def _http_client(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                follow_redirects=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self.client
+
+    async def fetch(self, url: str, session_id: Optional[str] = None):
+        """Récupère une page par HTTP si possible, sinon via le navigateur"""
+        forced_browser = any(p.search(url) for p in self.browser_patterns)
+        if self.http_first and not forced_browser:
+            result = await self.fetch_http(url, force=any(p.search(url) for p in self.http_patterns))
+            if result is not None:
+                self.counts["http"] += 1
+                self.telemetry.counter("crawl_fetch_total", tier="http")
+                return result
+        return await self.fetch_browser(url, session_id)
+
+    async def fetch_http(self, url: str, force: bool = False) -> Optional[HttpCrawlResult]:
+        """Retourne None si la page doit être rendue par le navigateur"""
+        with self.telemetry.span(url, "fetch_http") as span:
+            try:
+                response = await self._http_client().get(url)
+            except httpx.HTTPError as e:
+                span["error"] = type(e).__name__
+                return None
+            span["status"] = response.status_code
+            if response.status_code != 200 or "html" not in response.headers.get("content-type", ""):
+                span["fallback"] = True
+                return None
+            html = response.text
+            if not force and needs_javascript(html, self.min_text_chars):
+                span["fallback"] = True
+                return None
+        # Conversion HTML -> Markdown hors de la boucle d'événements (HTML en premier argument:
+        # son nom varie selon la version de crawl4ai); en cas d'échec, la page passe par le navigateur
+        with self.telemetry.span(url, "markdown") as span:
+            try:
+                markdown = await asyncio.to_thread(
+                    self.markdown_generator.generate_markdown, html, base_url=str(response.url)
+                )
+            except Exception as e:
+                print(f"Erreur de conversion Markdown ({url}): {e}")
+                span["error"] = type(e).__name__
+                return None
+        return HttpCrawlResult(url, html, markdown, response.status_code, dict(response.headers))
+
+    async def fetch_browser(self, url: str, session_id: Optional[str] = None):
+        if session_id is None and self.session_pool is not None:
+            async with self.session_pool.lease() as leased_id:
+                return await self.fetch_browser(url, leased_id)
+        crawler = await self.browser()
+        self.counts["browser"] += 1
+        self.telemetry.counter("crawl_fetch_total", tier="browser")
+        # Rendu et génération du Markdown par crawl4ai (une seule étape vue d'ici)
+        with self.telemetry.span(url, "render", session=session_id) as span:
+            if self.crawl_config is not None:
+                result = await crawler.arun(url=url, config=self.crawl_config, session_id=session_id)
+            else:
+                result = await crawler.arun(url=url, session_id=session_id)
+            span["success"] = result.success
+        return result
+
+    async def kill_session(self, session_id: str):
+        """Ferme une session du navigateur (sans effet si le navigateur n'a pas été démarré)"""
+        if self.crawler is not None:
+            await self.crawler.crawler_strategy.kill_session(session_id)
+
+    def print_summary(self):
+        print(f"  - Pages récupérées par HTTP: {self.counts['http']}, par le navigateur: {self.counts['browser']}")
+        if self.session_pool is not None:
+            self.session_pool.print_summary()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        if self.crawler is not None:
+            await self.crawler.close()
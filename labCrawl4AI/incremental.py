@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import requests
+
+SITEMAP_NAMESPACE = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
+
+
+def fetch_sitemap_entries(sitemap_url: str) -> List[Tuple[str, Optional[str]]]:
+    """Récupère les couples (URL, lastmod) d'un sitemap; lastmod vaut None s'il est absent"""
+    response = requests.get(sitemap_url)
+    response.raise_for_status()
+
+    root = ElementTree.fromstring(response.content)
+    entries = []
+    for url_tag in root.findall('.//ns:url', SITEMAP_NAMESPACE):
+        loc = url_tag.findtext('ns:loc', namespaces=SITEMAP_NAMESPACE)
+        lastmod = url_tag.findtext('ns:lastmod', namespaces=SITEMAP_NAMESPACE)
+        if loc:
+            entries.append((loc.strip(), lastmod.strip() if lastmod else None))
+    return entries
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CrawlManifest:
+    """
+    Manifeste d'extraction incrémentale (JSON).
+    Conserve pour chaque URL: lastmod du sitemap, ETag, Last-Modified, empreinte du contenu et fichier produit.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Optional[str]]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, url: str) -> Dict[str, Optional[str]]:
+        return self.entries.get(url, {})
+
+    def is_unchanged_in_sitemap(self, url: str, lastmod: Optional[str]) -> bool:
+        """Vrai si le lastmod du sitemap n'a pas changé et que le fichier produit existe toujours"""
+        entry = self.get(url)
+        if not lastmod or entry.get("lastmod") != lastmod:
+            return False
+        file_path = entry.get("file")
+        return file_path is None or os.path.exists(file_path)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """En-têtes HTTP conditionnels (If-None-Match / If-Modified-Since) issus de la dernière extraction"""
+        entry = self.get(url)
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_not_modified(self, url: str, session: Optional[requests.Session] = None) -> bool:
+        """Envoie une requête HEAD conditionnelle; vrai si le serveur répond 304 Not Modified"""
+        headers = self.conditional_headers(url)
+        if not headers:
+            return False
+        try:
+            response = (session or requests).head(url, headers=headers, allow_redirects=True, timeout=10)
+            return response.status_code == 304
+        except requests.RequestException:
+            return False
+
+    def update(self, url: str, *, lastmod: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+               markdown: Optional[str] = None, file_path: Optional[str] = None,
+               digest: Optional[str] = None) -> bool:
+        """
+        Met à jour l'entrée d'une URL.
+        Retourne True si le contenu a changé (ou est nouveau), False si l'empreinte est identique.
+        'digest' permet de fournir une empreinte déjà calculée à la place du Markdown.
+        """
+        entry = dict(self.get(url))
+        if lastmod:
+            entry["lastmod"] = lastmod
+        if headers:
+            lowered = {k.lower(): v for k, v in headers.items()}
+            entry["etag"] = lowered.get("etag", entry.get("etag"))
+            entry["last_modified"] = lowered.get("last-modified", entry.get("last_modified"))
+        changed = True
+        if markdown is not None or digest is not None:
+            new_hash = digest or content_hash(markdown)
+            changed = entry.get("content_hash") != new_hash
+            entry["content_hash"] = new_hash
+        if file_path:
+            if entry.get("file") != file_path:
+                changed = True
+            entry["file"] = file_path
+        self.entries[url] = entry
+        return changed
+
+    def save(self):
+        """Écriture atomique du manifeste (fichier temporaire puis remplacement)"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
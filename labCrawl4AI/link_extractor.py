@@ -0,0 +1,105 @@
+import html
+import re
+from functools import lru_cache
+from typing import List, Optional
+from urllib.parse import urljoin, urlparse
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# Balises <a>/<base> uniquement; les commentaires et scripts sont reconnus pour être ignorés
+TAG_PATTERN = re.compile(
+    r"<!--.*?-->|<script\b.*?</script\s*>|<(a|base)\b([^>]*)>",
+    re.IGNORECASE | re.DOTALL,
+)
+ATTR_PATTERN = re.compile(r"""([^\s=/>]+)\s*(?:=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+
+
+@lru_cache(maxsize=65536)
+def url_netloc(url: str) -> str:
+    """Hôte d'une URL, avec cache (la vérification de domaine est faite pour chaque lien)"""
+    return urlparse(url).netloc
+
+
+def _is_nofollow(rel: Optional[str]) -> bool:
+    return bool(rel) and "nofollow" in rel.lower().split()
+
+
+def _extract_regex(html_content: str, page_url: str) -> List[str]:
+    """Tokeniseur minimal: ne lit que les attributs des balises <a> et <base>"""
+    base_url = page_url
+    base_seen = False
+    hrefs = []
+    for match in TAG_PATTERN.finditer(html_content):
+        tag = match.group(1)
+        if tag is None:
+            continue
+        attrs = {}
+        for name, double, single, bare in ATTR_PATTERN.findall(match.group(2)):
+            attrs.setdefault(name.lower(), double or single or bare)
+        href = attrs.get("href")
+        if not href:
+            continue
+        href = html.unescape(href.strip())
+        if tag.lower() == "base":
+            # Seule la première balise <base href> compte
+            if not base_seen:
+                base_url = urljoin(page_url, href)
+                base_seen = True
+        elif not _is_nofollow(attrs.get("rel")):
+            hrefs.append(href)
+    return [urljoin(base_url, href) for href in hrefs]
+
+
+def _extract_lxml(html_content: str, page_url: str) -> List[str]:
+    doc = lxml.html.fromstring(html_content)
+    base_url = page_url
+    base = doc.find(".//base[@href]")
+    if base is not None:
+        base_url = urljoin(page_url, base.get("href").strip())
+    return [
+        urljoin(base_url, a.get("href").strip())
+        for a in doc.iter("a")
+        if a.get("href") and not _is_nofollow(a.get("rel"))
+    ]
+
+
+def _extract_bs4(html_content: str, page_url: str) -> List[str]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+    base_url = page_url
+    base = soup.find('base', href=True)
+    if base is not None:
+        base_url = urljoin(page_url, base['href'].strip())
+    links = []
+    for a_tag in soup.find_all('a', href=True):
+        rel = a_tag.get('rel')
+        if isinstance(rel, list):
+            rel = " ".join(rel)
+        if not _is_nofollow(rel):
+            links.append(urljoin(base_url, a_tag['href'].strip()))
+    return links
+
+
+def extract_hrefs(html_content: str, page_url: str, backend: str = "auto") -> List[str]:
+    """
+    Extrait les liens absolus (<a href>) d'une page en respectant <base href> et rel=nofollow.
+    backend: "auto" (lxml si installé, sinon tokeniseur regex), "lxml", "regex" ou "bs4".
+    En cas d'échec de lxml, BeautifulSoup est utilisé en repli.
+    """
+    if backend == "bs4":
+        return _extract_bs4(html_content, page_url)
+    if backend == "regex" or (backend == "auto" and lxml is None):
+        return _extract_regex(html_content, page_url)
+    try:
+        return _extract_lxml(html_content, page_url)
+    except Exception:
+        return _extract_bs4(html_content, page_url)
+
+
+def same_domain_links(html_content: str, page_url: str, domain: str) -> List[str]:
+    """Liens absolus de la page appartenant au domaine 'domain'"""
+    return [link for link in extract_hrefs(html_content, page_url) if url_netloc(link) == domain]
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from frontier import normalize_url
+
+INVALID_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def url_to_path(url: str, extension: str = ".md") -> str:
+    """
+    Chemin relatif déterministe et sans collision pour une URL:
+    '<hôte>/<chemin lisible>-<empreinte de l'URL normalisée>.md'.
+    Deux URLs distinctes (y compris par leur requête) donnent deux chemins distincts.
+    """
+    normalized = normalize_url(url)
+    parsed = urlsplit(normalized)
+    host = INVALID_CHARS.sub("_", parsed.netloc) or "local"
+
+    slug = INVALID_CHARS.sub("_", parsed.path.strip("/")).strip("_") or "index"
+    if slug.endswith(extension):
+        slug = slug[: -len(extension)]
+    slug = slug[:80]
+
+    suffix = hashlib.blake2b(normalized.encode("utf-8"), digest_size=6).hexdigest()
+    return f"{host}/{slug}-{suffix}{extension}"
+
+
+class PageIndex:
+    """
+    Index des pages écrites (JSONL en ajout seul, la dernière entrée d'une URL fait foi).
+    Chaque entrée associe une URL à son chemin (relatif au dossier de sortie), son empreinte et sa taille,
+    ce qui permet de retrouver une page sans parcourir le dossier et de ne stocker qu'une fois un contenu identique.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.by_url: Dict[str, Dict[str, Any]] = {}
+        # Entrée ayant effectivement stocké chaque contenu
+        self.stored_by_digest: Dict[str, Dict[str, Any]] = {}
+        self._digest_by_path: Dict[Tuple[str, Optional[str]], str] = {}
+        self._path_refs: Counter = Counter()
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self._apply(json.loads(line))
+        self._file = open(path, "a", encoding="utf-8")
+
+    def lookup(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.by_url.get(normalize_url(url))
+
+    def stored(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Entrée où le contenu d'empreinte 'digest' est déjà stocké (ou None)"""
+        return self.stored_by_digest.get(digest)
+
+    def is_shared(self, path: str, url: str) -> bool:
+        """Vrai si d'autres URLs que 'url' pointent vers ce fichier (il ne doit pas être réécrit)"""
+        refs = self._path_refs[path]
+        own = self.by_url.get(normalize_url(url))
+        if own and own["path"] == path:
+            refs -= 1
+        return refs > 0
+
+    def record(self, url: str, path: str, digest: str, size: int, **extra: Any) -> Dict[str, Any]:
+        entry = {"url": normalize_url(url), "path": path, "sha256": digest, "size": size, **extra}
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._apply(entry)
+        return entry
+
+    def _apply(self, entry: Dict[str, Any]):
+        previous = self.by_url.get(entry["url"])
+        if previous:
+            self._path_refs[previous["path"]] -= 1
+        self.by_url[entry["url"]] = entry
+        self._path_refs[entry["path"]] += 1
+
+        # Les archives ne sont jamais réécrites: seule une entrée de fichier peut invalider un contenu stocké
+        location = (entry["path"], entry.get("member"))
+        old_digest = self._digest_by_path.get(location)
+        if old_digest and old_digest != entry["sha256"]:
+            stored = self.stored_by_digest.get(old_digest)
+            if stored and (stored["path"], stored.get("member")) == location:
+                del self.stored_by_digest[old_digest]
+        self._digest_by_path[location] = entry["sha256"]
+        self.stored_by_digest.setdefault(entry["sha256"], entry)
+
+    def flush(self, fsync: bool = False):
+        self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
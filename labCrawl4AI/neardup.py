@@ -0,0 +1,180 @@
+import hashlib
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from frontier import normalize_url
+
+WORD = re.compile(r"\w+")
+NUMBER = re.compile(r"^\d+$")
+VERSION = re.compile(r"^v?\d+(?:\.\d+|\.x)+$|^v\d+$|^(?:latest|stable|dev)$", re.IGNORECASE)
+
+
+def shingle_digests(text: str, size: int = 3) -> Counter:
+    """Empreintes (8 octets) des n-grammes de mots du texte, avec leur nombre d'occurrences"""
+    words = WORD.findall(text.lower())
+    if not words:
+        return Counter()
+    return Counter(
+        hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=8).digest()
+        for i in range(max(1, len(words) - size + 1))
+    )
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    SimHash 64 bits du texte (Charikar): deux textes proches ont des empreintes
+    à faible distance de Hamming. Les poids sont cumulés par octet puis répartis par bit.
+    """
+    weights = shingle_digests(text, shingle_size)
+    if not weights:
+        return 0
+    # acc[position][valeur de l'octet] = poids cumulé: 8 additions par n-gramme au lieu de 64
+    acc = [[0] * 256 for _ in range(8)]
+    for digest, weight in weights.items():
+        for position, byte in enumerate(digest):
+            acc[position][byte] += weight
+    total = sum(weights.values())
+    fingerprint = 0
+    for position in range(8):
+        counts = acc[position]
+        for bit in range(8):
+            mask = 1 << bit
+            ones = sum(count for value, count in enumerate(counts) if value & mask)
+            if 2 * ones > total:
+                fingerprint |= 1 << (63 - position * 8 - (7 - bit))
+    return fingerprint
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def url_pattern(url: str) -> str:
+    """
+    Motif d'une URL: segments numériques -> {n}, segments de version -> {v},
+    paramètres de requête sans leurs valeurs (ex: 'docs.site/{v}/guide/page/{n}?print').
+    """
+    parts = urlsplit(normalize_url(url))
+    segments = []
+    for segment in parts.path.split("/"):
+        if NUMBER.match(segment):
+            segments.append("{n}")
+        elif VERSION.match(segment):
+            segments.append("{v}")
+        else:
+            segments.append(segment)
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    return parts.netloc + "/".join(segments) + ("?" + "&".join(keys) if keys else "")
+
+
+class NearDuplicateIndex:
+    """
+    Index LSH en mémoire des SimHash des pages stockées.
+    Les 64 bits sont découpés en 'max_distance' + 1 bandes: deux empreintes à distance <= 'max_distance'
+    ont au moins une bande identique (principe des tiroirs), seules ces candidates sont comparées.
+    Suit aussi, par motif d'URL, la proportion de pages en double: un motif qui produit surtout
+    des doublons est dépriorisé dans la frontière (voir is_deprioritized).
+    """
+
+    def __init__(self, max_distance: int = 3, shingle_size: int = 3, min_words: int = 50,
+                 min_samples: int = 5, deprioritize_ratio: float = 0.5):
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.min_samples = min_samples
+        self.deprioritize_ratio = deprioritize_ratio
+        self.bands = max_distance + 1
+        self._band_bits = [64 // self.bands + (1 if i < 64 % self.bands else 0) for i in range(self.bands)]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        self._entries: List[Tuple[int, str]] = []
+        # Motif d'URL -> [pages, doublons]
+        self.pattern_stats: Dict[str, List[int]] = {}
+        self.near_duplicates = 0
+        # Les pages sont vérifiées dans le thread de l'écrivain, la frontière lit depuis la boucle
+        self._lock = threading.Lock()
+
+    def _band_keys(self, fingerprint: int) -> Iterable[Tuple[int, int]]:
+        shift = 64
+        for band, bits in enumerate(self._band_bits):
+            shift -= bits
+            yield band, (fingerprint >> shift) & ((1 << bits) - 1)
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        """SimHash du texte, ou None s'il est trop court pour être comparé de façon fiable"""
+        if len(WORD.findall(text)) < self.min_words:
+            return None
+        return simhash(text, self.shingle_size)
+
+    def add(self, url: str, fingerprint: int):
+        with self._lock:
+            self._add(normalize_url(url), fingerprint)
+
+    def _add(self, url: str, fingerprint: int):
+        entry_id = len(self._entries)
+        self._entries.append((fingerprint, url))
+        for band, key in self._band_keys(fingerprint):
+            self._tables[band].setdefault(key, []).append(entry_id)
+
+    def find(self, fingerprint: int, exclude_url: Optional[str] = None) -> Optional[str]:
+        """URL d'une page déjà indexée proche de l'empreinte (autre que 'exclude_url'), ou None"""
+        with self._lock:
+            return self._find(fingerprint, normalize_url(exclude_url) if exclude_url else None)
+
+    def _find(self, fingerprint: int, exclude_url: Optional[str]) -> Optional[str]:
+        checked = set()
+        for band, key in self._band_keys(fingerprint):
+            for entry_id in self._tables[band].get(key, ()):
+                if entry_id in checked:
+                    continue
+                checked.add(entry_id)
+                candidate, url = self._entries[entry_id]
+                if url != exclude_url and hamming(candidate, fingerprint) <= self.max_distance:
+                    return url
+        return None
+
+    def check(self, url: str, text: str) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Calcule l'empreinte de la page et cherche une page proche déjà indexée.
+        Retourne (empreinte, URL d'origine ou None); une page originale est ajoutée à l'index.
+        """
+        fingerprint = self.fingerprint(text)
+        if fingerprint is None:
+            self.observe(url, duplicate=False)
+            return None, None
+        normalized = normalize_url(url)
+        with self._lock:
+            original = self._find(fingerprint, normalized)
+            if original is None:
+                self._add(normalized, fingerprint)
+            else:
+                self.near_duplicates += 1
+        self.observe(url, duplicate=original is not None)
+        return fingerprint, original
+
+    def observe(self, url: str, duplicate: bool):
+        """Comptabilise une page (doublon exact ou proche, ou non) pour le motif de son URL"""
+        pattern = url_pattern(url)
+        with self._lock:
+            stats = self.pattern_stats.setdefault(pattern, [0, 0])
+            stats[0] += 1
+            if duplicate:
+                stats[1] += 1
+
+    def is_deprioritized(self, url: str) -> bool:
+        """Vrai si le motif de l'URL a produit assez de pages, majoritairement en double"""
+        stats = self.pattern_stats.get(url_pattern(url))
+        return bool(stats) and stats[0] >= self.min_samples and stats[1] / stats[0] >= self.deprioritize_ratio
+
+    def print_summary(self):
+        noisy = sorted(
+            (p for p, (pages, dups) in self.pattern_stats.items()
+             if pages >= self.min_samples and dups / pages >= self.deprioritize_ratio),
+            key=lambda p: -self.pattern_stats[p][1],
+        )
+        print(f"  - Quasi-doublons ignorés: {self.near_duplicates}, motifs d'URL dépriorisés: {len(noisy)}")
+        for pattern in noisy[:5]:
+            pages, dups = self.pattern_stats[pattern]
+            print(f"      {pattern} ({dups}/{pages} doublons)")
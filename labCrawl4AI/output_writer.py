@@ -0,0 +1,378 @@
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import tarfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from frontier import normalize_url
+from naming import PageIndex
+from neardup import NearDuplicateIndex
+from telemetry import NULL_TELEMETRY, Telemetry
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OUTPUT_MODES = ("files", "jsonl", "tar")
+FSYNC_POLICIES = ("never", "batch", "always")
+
+
+class WriteResult(NamedTuple):
+    url: str
+    path: str
+    digest: str
+    size: int
+    written: bool
+    metadata: Dict[str, Any]
+    deduplicated: bool = False
+    near_duplicate_of: Optional[str] = None
+
+
+def _fsync_path(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AsyncOutputWriter:
+    """
+    Écrivain asynchrone du Markdown extrait.
+    Les pages passent par une file bornée et sont écrites par lots dans un thread dédié,
+    sans bloquer la boucle d'événements.
+
+    mode: "files" (un fichier .md par page), "jsonl" (archives JSONL, compressées en zstd ou gzip
+    si 'compression' est fourni) ou "tar" (archives tar), avec 'shard_size' pages par archive.
+    fsync: "never", "batch" (une synchronisation par lot) ou "always" (après chaque page).
+    Avec 'use_index', un index JSONL (URL -> chemin, empreinte, taille) est tenu dans le dossier de sortie
+    et un contenu identique à une page déjà stockée n'est pas écrit une seconde fois.
+    Avec un index 'near_duplicates' (SimHash + LSH), une page quasi identique à une page déjà stockée
+    n'est pas écrite (near_duplicate_of indique la page d'origine).
+    Avec une 'telemetry', le délai entre write() et l'écriture effective est enregistré par page (span "write").
+    Un lot dont l'écriture échoue (disque plein, droits...) est ignoré: ses pages sont listées dans
+    'failed' (URL, erreur) et l'écrivain continue, pour ne jamais bloquer les producteurs sur write().
+    """
+
+    def __init__(self, output_dir: str, mode: str = "files", batch_size: int = 64, flush_interval: float = 0.5,
+                 fsync: str = "batch", shard_size: int = 10_000, compression: Optional[str] = None,
+                 queue_size: int = 256, on_written: Optional[Callable[[WriteResult], None]] = None,
+                 use_index: bool = True, telemetry: Optional[Telemetry] = None,
+                 near_duplicates: Optional[NearDuplicateIndex] = None):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Mode de sortie inconnu: {mode} (attendu: {', '.join(OUTPUT_MODES)})")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Politique fsync inconnue: {fsync} (attendu: {', '.join(FSYNC_POLICIES)})")
+        if compression == "zstd" and zstandard is None:
+            print("zstandard n'est pas installé, compression gzip utilisée à la place")
+            compression = "gzip"
+
+        self.output_dir = output_dir
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.shard_size = shard_size
+        self.compression = compression
+        self.on_written = on_written
+        self.telemetry = telemetry or NULL_TELEMETRY
+        self._enqueued_at: Dict[str, float] = {}
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.failed: List[Tuple[str, str]] = []
+
+        # Archive en cours (modes jsonl et tar)
+        self._shard_index = 0
+        self._shard_records = 0
+        self._shard_path: Optional[str] = None
+        self._raw = None
+        self._stream = None
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.index = PageIndex(os.path.join(output_dir, "index.jsonl")) if use_index else None
+        self.near_duplicates = near_duplicates
+        if near_duplicates is not None and self.index:
+            # Empreintes des pages stockées lors des exécutions précédentes
+            for entry in self.index.by_url.values():
+                if entry.get("simhash"):
+                    near_duplicates.add(entry["url"], int(entry["simhash"], 16))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def write(self, url: str, name: str, content: str, previous_hash: Optional[str] = None, **metadata: Any):
+        """
+        Ajoute une page à écrire (attend si la file est pleine).
+        En mode "files", la page n'est pas réécrite si son empreinte vaut 'previous_hash'.
+        """
+        if self.telemetry.enabled:
+            self._enqueued_at[url] = time.perf_counter()
+        await self.queue.put((url, name, content, previous_hash, metadata))
+
+    async def close(self):
+        """Écrit les pages en attente et ferme l'archive en cours"""
+        if self._closed:
+            return
+        self._closed = True
+        await self.queue.put(None)
+        if self._task:
+            await self._task
+        if self.failed:
+            print(f"{len(self.failed)} pages n'ont pas pu être écrites (voir 'failed')")
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        try:
+            while not closing:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                # Regroupe jusqu'à 'batch_size' pages ou 'flush_interval' secondes
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+
+                batch_start = time.perf_counter()
+                try:
+                    results = await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    print(f"Erreur lors de l'écriture de {len(batch)} pages: {e}")
+                    for item in batch:
+                        self.failed.append((item[0], str(e)))
+                        self._enqueued_at.pop(item[0], None)
+                    self.telemetry.counter("crawl_pages_stored_total", len(batch), outcome="error")
+                    continue
+                if self.telemetry.enabled:
+                    self._record(results, batch_start)
+                if self.on_written:
+                    for result in results:
+                        self.on_written(result)
+        finally:
+            await asyncio.to_thread(self._close_shard)
+            if self.index:
+                self.index.close()
+
+    def _record(self, results: List[WriteResult], batch_start: float):
+        now = time.perf_counter()
+        self.telemetry.observe("writer_batch_seconds", now - batch_start)
+        for result in results:
+            if result.near_duplicate_of:
+                outcome = "near_duplicate"
+            else:
+                outcome = "written" if result.written else "deduplicated" if result.deduplicated else "unchanged"
+            self.telemetry.record_span(result.url, "write", now - self._enqueued_at.pop(result.url, batch_start),
+                                       outcome=outcome, size=result.size)
+            self.telemetry.counter("crawl_pages_stored_total", outcome=outcome)
+            if result.written:
+                self.telemetry.counter("crawl_bytes_written_total", result.size)
+
+    def _write_batch(self, batch: List[tuple]) -> List[WriteResult]:
+        if self.mode == "files":
+            results = self._write_files(batch)
+        else:
+            results = self._write_archive(batch)
+        if self.index:
+            self.index.flush(fsync=self.fsync != "never")
+        return results
+
+    @staticmethod
+    def _extra_of(stored: Dict[str, Any]) -> Dict[str, Any]:
+        # Une entrée qui pointe vers un contenu déjà stocké en reprend l'empreinte SimHash
+        return {"simhash": stored["simhash"]} if stored.get("simhash") else {}
+
+    def _find_stored(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Entrée d'index d'un contenu identique déjà stocké (et toujours présent sur disque)"""
+        if not self.index:
+            return None
+        stored = self.index.stored(digest)
+        if stored and os.path.exists(os.path.join(self.output_dir, stored["path"])):
+            return stored
+        return None
+
+    def _check_near_duplicate(self, url: str, content: str, digest: str, size: int,
+                              metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[WriteResult]]:
+        """Extra d'index (SimHash) de la page, et le résultat à retourner si c'est un quasi-doublon"""
+        if self.near_duplicates is None:
+            return {}, None
+        fingerprint, original = self.near_duplicates.check(url, content)
+        if original is not None:
+            stored = self.index.lookup(original) if self.index else None
+            path = os.path.join(self.output_dir, stored["path"]) if stored else ""
+            return {}, WriteResult(url, path, digest, size, False, metadata, near_duplicate_of=original)
+        return ({"simhash": f"{fingerprint:016x}"} if fingerprint is not None else {}), None
+
+    def _observe_exact(self, url: str, deduplicated: bool):
+        if self.near_duplicates is not None:
+            self.near_duplicates.observe(url, duplicate=deduplicated)
+
+    def _write_files(self, batch: List[tuple]) -> List[WriteResult]:
+        results = []
+        written_paths = []
+        for url, name, content, previous_hash, metadata in batch:
+            data = content.encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+
+            # Contenu déjà stocké (même page inchangée ou page identique): rien à écrire
+            stored = self._find_stored(digest)
+            if stored:
+                path = os.path.join(self.output_dir, stored["path"])
+                deduplicated = stored["url"] != normalize_url(url)
+                self.index.record(url, stored["path"], digest, len(data), **self._extra_of(stored))
+                self._observe_exact(url, deduplicated)
+                results.append(WriteResult(url, path, digest, len(data), False, metadata, deduplicated=deduplicated))
+                continue
+
+            # Page quasi identique à une page déjà stockée: non écrite
+            extra, near_duplicate = self._check_near_duplicate(url, content, digest, len(data), metadata)
+            if near_duplicate:
+                results.append(near_duplicate)
+                continue
+
+            # Un fichier partagé par d'autres URLs n'est jamais écrasé
+            if self.index and self.index.is_shared(name, url):
+                stem, extension = os.path.splitext(name)
+                name = f"{stem}-{digest[:8]}{extension}"
+            path = os.path.join(self.output_dir, name)
+
+            # Un fichier dont le contenu n'a pas changé n'est pas réécrit
+            written = digest != previous_hash or not os.path.exists(path)
+            if self.index:
+                self.index.record(url, name, digest, len(data), **extra)
+            if written:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                    if self.fsync == "always":
+                        f.flush()
+                        os.fsync(f.fileno())
+                written_paths.append(path)
+            results.append(WriteResult(url, path, digest, len(data), written, metadata))
+
+        if self.fsync == "batch" and written_paths:
+            for path in written_paths:
+                _fsync_path(path)
+        if self.fsync != "never" and written_paths and os.name == "posix":
+            # Rend durables les nouvelles entrées du dossier
+            _fsync_path(self.output_dir)
+        return results
+
+    def _write_archive(self, batch: List[tuple]) -> List[WriteResult]:
+        results = []
+        for url, name, content, _, metadata in batch:
+            data = content.encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+
+            # Contenu identique déjà archivé: seule l'entrée d'index est ajoutée
+            stored = self._find_stored(digest)
+            if stored:
+                deduplicated = stored["url"] != normalize_url(url)
+                self.index.record(url, stored["path"], digest, len(data), member=stored.get("member"),
+                                  **self._extra_of(stored))
+                self._observe_exact(url, deduplicated)
+                results.append(WriteResult(url, os.path.join(self.output_dir, stored["path"]), digest,
+                                           len(data), False, metadata, deduplicated=deduplicated))
+                continue
+
+            extra, near_duplicate = self._check_near_duplicate(url, content, digest, len(data), metadata)
+            if near_duplicate:
+                results.append(near_duplicate)
+                continue
+
+            if self._stream is None or self._shard_records >= self.shard_size:
+                self._open_next_shard()
+            if self.index:
+                self.index.record(url, os.path.basename(self._shard_path), digest, len(data), member=name, **extra)
+            if self.mode == "jsonl":
+                record = {"url": url, "name": name, "sha256": digest, "content": content, **metadata}
+                self._stream.write(json.dumps(record, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            else:
+                info = tarfile.TarInfo(name=name)
+                info.size = len(data)
+                info.mtime = int(time.time())
+                self._stream.addfile(info, io.BytesIO(data))
+            self._shard_records += 1
+            if self.fsync == "always":
+                self._sync_shard()
+            results.append(WriteResult(url, self._shard_path, digest, len(data), True, metadata))
+
+        if self.fsync == "batch":
+            self._sync_shard()
+        else:
+            self._flush_shard()
+        return results
+
+    def _open_next_shard(self):
+        self._close_shard()
+        extension = ".jsonl" if self.mode == "jsonl" else ".tar"
+        if self.mode == "jsonl" and self.compression:
+            extension += ".zst" if self.compression == "zstd" else ".gz"
+        # Ne réécrit jamais une archive existante (reprise d'une extraction précédente)
+        while True:
+            self._shard_path = os.path.join(self.output_dir, f"pages-{self._shard_index:05d}{extension}")
+            self._shard_index += 1
+            if not os.path.exists(self._shard_path):
+                break
+        self._shard_records = 0
+        self._raw = open(self._shard_path, "wb")
+        if self.mode == "tar":
+            self._stream = tarfile.open(fileobj=self._raw, mode="w")
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=3).stream_writer(self._raw, closefd=False)
+        elif self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        else:
+            self._stream = self._raw
+
+    def _flush_shard(self):
+        if self._stream is None:
+            return
+        if self.mode == "tar":
+            self._raw.flush()
+        elif self.compression == "zstd":
+            self._stream.flush(zstandard.FLUSH_BLOCK)
+        else:
+            self._stream.flush()
+        self._raw.flush()
+
+    def _sync_shard(self):
+        if self._stream is None:
+            return
+        self._flush_shard()
+        os.fsync(self._raw.fileno())
+
+    def _close_shard(self):
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.flush()
+        if self.fsync != "never":
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        self._stream = None
+        self._raw = None
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+
+class DisallowedByRobots(Exception):
+    """URL interdite par le robots.txt de son hôte"""
+
+
+class TokenBucket:
+    """Seau à jetons: 'rate' requêtes par seconde en moyenne, rafales de 'capacity' requêtes au plus"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # Les demandes d'un même hôte sont servies dans l'ordre d'arrivée
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def wait_time(self, queued: int = 0) -> float:
+        """Secondes avant qu'une requête puisse passer, derrière 'queued' requêtes déjà en attente"""
+        tokens = min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+        return max(0.0, (queued + 1 - tokens) / self.rate)
+
+
+def origin_of(url: str) -> str:
+    """'https://hote:port' d'une URL (clé du cache robots.txt et des seaux par hôte)"""
+    parsed = urlsplit(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+class PolitenessPolicy:
+    """
+    Politesse par hôte: règles robots.txt analysées et mises en cache (une seule requête par hôte),
+    Crawl-delay appliqué et limitation de débit par seau à jetons.
+    Permet d'augmenter la concurrence globale sur plusieurs domaines sans surcharger un hôte.
+    """
+
+    def __init__(self, user_agent: str = "*", requests_per_second: float = 2.0, burst: float = 2.0,
+                 respect_crawl_delay: bool = True, session: Optional[aiohttp.ClientSession] = None):
+        self.user_agent = user_agent
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.respect_crawl_delay = respect_crawl_delay
+        self._session = session
+        self._own_session = session is None
+        self._robots: Dict[str, asyncio.Task] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def _fetch_robots(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            if self._session is None:
+                self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+            async with self._session.get(f"{origin}/robots.txt") as response:
+                if response.status in (401, 403):
+                    parser.disallow_all = True
+                elif response.status >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse((await response.text(errors="replace")).splitlines())
+        except Exception as e:
+            print(f"Erreur lors de la récupération de robots.txt ({origin}): {e}")
+            parser.allow_all = True
+        return parser
+
+    async def robots(self, url: str) -> RobotFileParser:
+        """Règles robots.txt de l'hôte de l'URL (téléchargées une seule fois par hôte)"""
+        origin = origin_of(url)
+        if origin not in self._robots:
+            self._robots[origin] = asyncio.ensure_future(self._fetch_robots(origin))
+        return await self._robots[origin]
+
+    async def allowed(self, url: str) -> bool:
+        return (await self.robots(url)).can_fetch(self.user_agent, url)
+
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        delay = (await self.robots(url)).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    async def sitemaps(self, url: str) -> List[str]:
+        """Entrées 'Sitemap:' du robots.txt de l'hôte"""
+        return (await self.robots(url)).site_maps() or []
+
+    async def wait_turn(self, url: str):
+        """Attend que l'hôte de l'URL puisse recevoir une nouvelle requête"""
+        origin = origin_of(url)
+        bucket = self._buckets.get(origin)
+        if bucket is None:
+            rate = self.requests_per_second
+            delay = await self.crawl_delay(url) if self.respect_crawl_delay else None
+            if delay:
+                rate = min(rate, 1.0 / delay)
+            # Un Crawl-delay impose des requêtes espacées: pas de rafale
+            bucket = self._buckets.setdefault(origin, TokenBucket(rate, 1.0 if delay else self.burst))
+        await bucket.acquire()
+
+    def ready_in(self, url: str, queued: int = 0) -> Optional[float]:
+        """
+        Secondes avant que l'hôte de l'URL puisse recevoir une requête (sans attendre),
+        derrière 'queued' requêtes déjà en attente de leur tour. None si le débit de l'hôte
+        n'est pas encore connu (robots.txt en cours de lecture) alors que des requêtes attendent.
+        """
+        bucket = self._buckets.get(origin_of(url))
+        if bucket is None:
+            return 0.0 if queued == 0 else None
+        return bucket.wait_time(queued)
+
+    async def check(self, url: str):
+        """Vérifie robots.txt puis attend le tour de l'hôte; lève DisallowedByRobots si l'URL est interdite"""
+        if not await self.allowed(url):
+            raise DisallowedByRobots(f"Interdit par robots.txt: {url}")
+        await self.wait_turn(url)
+
+    async def close(self):
+        if self._own_session and self._session is not None:
+            await self._session.close()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from telemetry import NULL_TELEMETRY, Telemetry
+
+
+def _timed_call(func: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    # Exécuté dans le worker: mesure le travail seul, sans l'attente dans la file
+    start = time.perf_counter()
+    return func(*args), time.perf_counter() - start
+
+
+class PostProcessingStage:
+    """
+    Étage de post-traitement (analyse des liens, nommage, écriture) exécuté hors de la boucle d'événements.
+    Les travaux passent par une file bornée: l'étage d'extraction attend quand elle est pleine (contre-pression).
+    'executor' vaut "process" (travail CPU, plusieurs cœurs) ou "thread" (travail surtout en E/S).
+    Avec une 'telemetry', la durée de chaque travail est enregistrée comme span 'stage'
+    (le premier argument soumis, l'URL, identifie le span).
+    """
+
+    def __init__(self, func: Callable[..., Any], on_result: Optional[Callable[[Any], None]] = None,
+                 executor: str = "process", workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 telemetry: Optional[Telemetry] = None, stage: str = "postprocess"):
+        self.func = func
+        self.on_result = on_result
+        self.workers = workers or os.cpu_count() or 1
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or self.workers * 2)
+        self.executor: Executor = (
+            ProcessPoolExecutor(max_workers=self.workers) if executor == "process"
+            else ThreadPoolExecutor(max_workers=self.workers)
+        )
+        self.errors = 0
+        self.telemetry = telemetry or NULL_TELEMETRY
+        self.stage = stage
+        self._consumers: List[asyncio.Task] = []
+
+    def start(self):
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def submit(self, *args: Any):
+        """Ajoute un travail; attend si la file est pleine"""
+        await self.queue.put(args)
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            args = await self.queue.get()
+            try:
+                result, duration = await loop.run_in_executor(self.executor, _timed_call, self.func, *args)
+                self.telemetry.record_span(str(args[0]) if args else "", self.stage, duration)
+                if self.on_result:
+                    self.on_result(result)
+            except Exception as e:
+                self.errors += 1
+                print(f"Erreur de post-traitement: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def join(self):
+        """Attend la fin de tous les travaux soumis"""
+        await self.queue.join()
+
+    async def close(self):
+        await self.join()
+        for task in self._consumers:
+            task.cancel()
+        # Arrêt du pool hors de la boucle d'événements (attend la fin des travaux en cours)
+        await asyncio.to_thread(self.executor.shutdown, True)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
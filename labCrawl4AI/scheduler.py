@@ -0,0 +1,239 @@
+import asyncio
+import math
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+from politeness import PolitenessPolicy
+from telemetry import NULL_TELEMETRY, Telemetry
+
+
+def host_of(url: str) -> str:
+    """Retourne l'hôte (netloc) d'une URL"""
+    return urlparse(url).netloc
+
+
+async def iterate_urls(urls: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    """Parcourt indifféremment une liste d'URLs ou un générateur asynchrone"""
+    if hasattr(urls, "__aiter__"):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Percentile p (rang le plus proche) d'une liste déjà triée"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered) / 100) - 1))]
+
+
+class CrawlStats:
+    """Statistiques de débit et de latence par page d'une extraction"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.start_time = time.perf_counter()
+        self.end_time: Optional[float] = None
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def stop(self):
+        self.end_time = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    @property
+    def pages_per_second(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def percentile(self, p: float) -> float:
+        """Percentile (rang le plus proche) des latences enregistrées, en secondes"""
+        return percentile(sorted(self.latencies), p)
+
+    def print_summary(self):
+        print(f"  - Débit: {self.pages_per_second:.2f} pages/s ({len(self.latencies)} pages en {self.elapsed:.1f}s)")
+        print(f"  - Latence par page: p50 {self.percentile(50):.2f}s, p95 {self.percentile(95):.2f}s")
+
+
+class SlidingWindowScheduler:
+    """
+    Ordonnanceur à fenêtre glissante.
+    Garde en permanence 'max_concurrent' tâches en cours (au lieu de lots synchrones)
+    et limite éventuellement le nombre de tâches simultanées par hôte.
+    Avec une 'politeness', chaque URL est vérifiée dans robots.txt et attend le débit autorisé
+    de son hôte avant l'envoi. Une URL dont l'hôte n'a pas encore de jeton disponible est mise en attente
+    hors des places (comme pour 'per_host_limit'): un hôte lent n'occupe pas les places des autres.
+    Avec une 'telemetry', l'attente de chaque URL (file et politesse) est enregistrée comme span.
+    """
+
+    def __init__(self, max_concurrent: int = 3, per_host_limit: Optional[int] = None,
+                 politeness: Optional[PolitenessPolicy] = None, telemetry: Optional[Telemetry] = None):
+        self.max_concurrent = max_concurrent
+        self.per_host_limit = per_host_limit
+        self.politeness = politeness
+        self.telemetry = telemetry or NULL_TELEMETRY
+        self.stats = CrawlStats()
+        self._in_flight = 0
+        # Tâches dont le handler est en cours (hors attente de la politesse et du consommateur)
+        self._fetching = 0
+        self._host_in_flight: Dict[str, int] = defaultdict(int)
+        # URLs (et instant de réception) mises en attente: hôte à sa limite ou sans jeton disponible
+        self._parked: Dict[str, Deque[Tuple[str, float]]] = defaultdict(deque)
+        self._parked_total = 0
+        # Tâches lancées qui attendent encore leur jeton de politesse, et réveils programmés par hôte
+        self._host_waiting: Dict[str, int] = defaultdict(int)
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._condition = asyncio.Condition()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def fetching(self) -> int:
+        return self._fetching
+
+    async def resize(self, max_concurrent: int):
+        """Modifie le nombre de tâches simultanées pendant l'exécution (contrôleur adaptatif)"""
+        async with self._condition:
+            self.max_concurrent = max(1, max_concurrent)
+            self._condition.notify_all()
+
+    def _host_full(self, host: str) -> bool:
+        return self.per_host_limit is not None and self._host_in_flight[host] >= self.per_host_limit
+
+    def _host_ready(self, host: str, url: str, wake: Callable[[str], None]) -> bool:
+        """L'hôte peut recevoir une requête maintenant; sinon un réveil est programmé à l'instant prévu"""
+        if self.politeness is None:
+            return True
+        delay = self.politeness.ready_in(url, self._host_waiting[host])
+        if delay is None:
+            # Débit encore inconnu: nouvel essai à la fin d'une tâche de cet hôte
+            return False
+        if delay > 0:
+            if host not in self._timers:
+                self._timers[host] = asyncio.get_running_loop().call_later(delay, wake, host)
+            return False
+        return True
+
+    async def run(
+        self,
+        urls: Union[Iterable[str], AsyncIterable[str]],
+        handler: Callable[[str], Awaitable[Any]],
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Exécute 'handler' sur chaque URL et produit les couples (url, résultat) dans l'ordre d'achèvement.
+        Les exceptions du handler sont renvoyées comme résultat (comme gather(return_exceptions=True)).
+        """
+        results: asyncio.Queue = asyncio.Queue(maxsize=max(1, self.max_concurrent))
+        tasks = set()
+        done_marker = object()
+
+        async def execute(url: str, host: str, queued_at: float):
+            start = None
+            self.telemetry.record_span(url, "queue_wait", time.perf_counter() - queued_at)
+            try:
+                if self.politeness:
+                    try:
+                        with self.telemetry.span(url, "politeness"):
+                            await self.politeness.check(url)
+                    finally:
+                        self._host_waiting[host] -= 1
+                start = time.perf_counter()
+                self._fetching += 1
+                try:
+                    result = await handler(url)
+                finally:
+                    self._fetching -= 1
+            except Exception as e:
+                result = e
+            if start is not None:
+                self.stats.record(time.perf_counter() - start)
+            self.telemetry.counter("crawl_tasks_total", outcome="error" if isinstance(result, Exception) else "done")
+            # La place n'est libérée qu'une fois le résultat consommé (contre-pression)
+            await results.put((url, result))
+            async with self._condition:
+                self._in_flight -= 1
+                self._host_in_flight[host] -= 1
+                self.telemetry.gauge("crawl_in_flight", self._in_flight)
+                # Relance en priorité les URLs en attente dont l'hôte a de nouveau de la place
+                drain_parked()
+                self._condition.notify_all()
+
+        def drain_parked():
+            for parked_host, queue in self._parked.items():
+                while (queue and self._in_flight < self.max_concurrent and not self._host_full(parked_host)
+                       and self._host_ready(parked_host, queue[0][0], wake)):
+                    self._parked_total -= 1
+                    launch(*queue.popleft(), parked_host)
+
+        async def wake_parked():
+            async with self._condition:
+                drain_parked()
+                self._condition.notify_all()
+
+        def wake(host: str):
+            # Le seau de l'hôte a de nouveau un jeton: relance de ses URLs en attente
+            self._timers.pop(host, None)
+            task = asyncio.create_task(wake_parked())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def launch(url: str, queued_at: float, host: str):
+            self._in_flight += 1
+            self._host_in_flight[host] += 1
+            if self.politeness:
+                self._host_waiting[host] += 1
+            self.telemetry.gauge("crawl_in_flight", self._in_flight)
+            task = asyncio.create_task(execute(url, host, queued_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def dispatch():
+            max_parked = max(1, self.max_concurrent) * 4
+            try:
+                async for url in iterate_urls(urls):
+                    host = host_of(url)
+                    queued_at = time.perf_counter()
+                    async with self._condition:
+                        await self._condition.wait_for(
+                            lambda: self._in_flight < self.max_concurrent and self._parked_total < max_parked
+                        )
+                        # Derrière les URLs déjà en attente du même hôte (ordre conservé)
+                        if self._parked[host] or self._host_full(host) or not self._host_ready(host, url, wake):
+                            self._parked[host].append((url, queued_at))
+                            self._parked_total += 1
+                        else:
+                            launch(url, queued_at, host)
+                # Attend la fin des tâches en cours et des URLs en attente
+                async with self._condition:
+                    await self._condition.wait_for(lambda: self._in_flight == 0 and self._parked_total == 0)
+            except Exception:
+                await results.put(done_marker)
+                raise
+            await results.put(done_marker)
+
+        dispatcher = asyncio.create_task(dispatch())
+        try:
+            while True:
+                item = await results.get()
+                if item is done_marker:
+                    break
+                yield item
+            await dispatcher
+        finally:
+            dispatcher.cancel()
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            for task in list(tasks):
+                task.cancel()
+            self.stats.stop()
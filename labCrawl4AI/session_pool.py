@@ -0,0 +1,129 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from adaptive import process_tree_rss
+
+
+class _Session:
+    def __init__(self, index: int):
+        self.index = index
+        self.generation = 0
+        self.pages = 0
+        self.recycle_requested = False
+
+    @property
+    def session_id(self) -> str:
+        return f"pool_session_{self.index}_{self.generation}"
+
+
+class SessionPool:
+    """
+    Pool de 'size' sessions de navigateur réutilisables, louées pour une page puis rendues.
+    Une session est recyclée (fermée puis remplacée) après 'max_pages_per_session' pages,
+    ou quand la mémoire du processus et du navigateur dépasse 'rss_threshold_mb'.
+    """
+
+    def __init__(self, kill_session: Callable[[str], Awaitable[None]], size: int = 5,
+                 max_pages_per_session: int = 50, rss_threshold_mb: Optional[int] = None,
+                 rss_check_interval: float = 1.0):
+        self.kill_session = kill_session
+        self.size = size
+        self.max_pages_per_session = max_pages_per_session
+        self.rss_threshold = rss_threshold_mb * 1024 * 1024 if rss_threshold_mb else None
+        self.rss_check_interval = rss_check_interval
+        self._free: asyncio.Queue = asyncio.Queue()
+        for index in range(size):
+            self._free.put_nowait(_Session(index))
+        self._leased: Dict[str, _Session] = {}
+        self._last_rss_check = 0.0
+        self._over_rss = False
+
+        # Métriques d'utilisation
+        self.leases = 0
+        self.recycles = 0
+        self.total_wait = 0.0
+        self._busy_area = 0.0
+        self._start = time.monotonic()
+        self._last_change = self._start
+
+    def _account(self):
+        now = time.monotonic()
+        self._busy_area += len(self._leased) * (now - self._last_change)
+        self._last_change = now
+
+    async def acquire(self) -> str:
+        """Loue une session libre (attend si toutes sont occupées)"""
+        start = time.monotonic()
+        session = await self._free.get()
+        self.total_wait += time.monotonic() - start
+        self._account()
+        self._leased[session.session_id] = session
+        self.leases += 1
+        return session.session_id
+
+    async def release(self, session_id: str):
+        """Rend une session au pool, en la recyclant si nécessaire"""
+        self._account()
+        session = self._leased.pop(session_id)
+        session.pages += 1
+        if session.recycle_requested or session.pages >= self.max_pages_per_session or self._rss_exceeded():
+            await self._recycle(session)
+        self._free.put_nowait(session)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[str]:
+        session_id = await self.acquire()
+        try:
+            yield session_id
+        finally:
+            await self.release(session_id)
+
+    def _rss_exceeded(self) -> bool:
+        if self.rss_threshold is None:
+            return False
+        now = time.monotonic()
+        if now - self._last_rss_check >= self.rss_check_interval:
+            self._last_rss_check = now
+            self._over_rss = process_tree_rss() > self.rss_threshold
+        return self._over_rss
+
+    async def _recycle(self, session: _Session):
+        try:
+            await self.kill_session(session.session_id)
+        except Exception as e:
+            print(f"Erreur lors du recyclage de la session {session.session_id}: {e}")
+        session.generation += 1
+        session.pages = 0
+        session.recycle_requested = False
+        self.recycles += 1
+
+    async def recycle_all(self):
+        """Recycle immédiatement les sessions libres et, à leur retour, les sessions louées"""
+        for session in self._leased.values():
+            session.recycle_requested = True
+        free = []
+        while not self._free.empty():
+            free.append(self._free.get_nowait())
+        for session in free:
+            if session.pages:
+                await self._recycle(session)
+            self._free.put_nowait(session)
+
+    def metrics(self) -> Dict[str, float]:
+        self._account()
+        elapsed = max(self._last_change - self._start, 1e-9)
+        return {
+            "size": self.size,
+            "in_use": len(self._leased),
+            "utilisation": self._busy_area / (self.size * elapsed),
+            "leases": self.leases,
+            "recycles": self.recycles,
+            "avg_wait": self.total_wait / self.leases if self.leases else 0.0,
+        }
+
+    def print_summary(self):
+        m = self.metrics()
+        print(f"  - Pool de sessions: {m['size']} sessions, utilisation {m['utilisation']:.0%}, "
+              f"{m['leases']} locations, {m['recycles']} recyclages, attente moyenne {m['avg_wait']:.2f}s")
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from typing import AsyncIterable, Iterable, List, Optional, Sequence, Union
+
+from crawl4ai import BrowserConfig, CrawlerRunConfig, CacheMode  # type: ignore
+
+from frontier import normalize_url
+from scheduler import SlidingWindowScheduler, host_of, iterate_urls
+
+PENDING, LEASED, DONE, FAILED = 0, 1, 2, 3
+
+
+def shard_for(url: str, shards: int) -> int:
+    """Partition par empreinte de l'hôte: toutes les pages d'un hôte vont au même worker"""
+    digest = hashlib.blake2b(host_of(url).lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+class ShardedQueue:
+    """
+    File d'extraction partagée (SQLite en mode WAL) découpée en partitions par hôte.
+    Chaque worker loue des URLs de ses partitions; une location expirée (worker arrêté)
+    est reprise par un autre worker de la même partition.
+    Le mode WAL repose sur une mémoire partagée entre processus: la base doit rester sur un disque local,
+    tous les workers sur la même machine (pas de volume réseau, NFS ou SMB).
+    """
+
+    def __init__(self, db_path: str, shards: int, lease_timeout: float = 600.0):
+        self.db_path = db_path
+        self.shards = shards
+        self.lease_timeout = lease_timeout
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(tasks)")]
+        if columns and "normalized" not in columns:
+            # Ancien format (URL normalisée seule): migration, les URLs existantes servent de clé
+            self.conn.execute("ALTER TABLE tasks RENAME TO tasks_v1")
+            self.conn.execute("DROP INDEX IF EXISTS tasks_shard_status")
+        # URL telle que découverte (c'est elle qui est extraite); la forme normalisée sert de clé d'unicité
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL,"
+            " normalized TEXT NOT NULL UNIQUE,"
+            " shard INTEGER NOT NULL,"
+            " status INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " leased_at REAL)"
+        )
+        if columns and "normalized" not in columns:
+            self.conn.execute(
+                "INSERT INTO tasks (id, url, normalized, shard, status, worker, leased_at)"
+                " SELECT id, url, url, shard, status, worker, leased_at FROM tasks_v1"
+            )
+            self.conn.execute("DROP TABLE tasks_v1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tasks_shard_status ON tasks (shard, status, id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def enqueue_many(self, urls: Iterable[str]) -> int:
+        """Ajoute des URLs (sans doublon après normalisation); retourne le nombre d'URLs nouvelles"""
+        rows = [(url, normalize_url(url), shard_for(url, self.shards)) for url in urls]
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("INSERT OR IGNORE INTO tasks (url, normalized, shard) VALUES (?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+
+    def lease(self, shards: Sequence[int], worker_id: str, limit: int) -> List[str]:
+        """Loue au plus 'limit' URLs en attente (ou dont la location a expiré) dans les partitions données"""
+        now = time.time()
+        placeholders = ",".join("?" for _ in shards)
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute(
+                    f"SELECT id, url FROM tasks WHERE shard IN ({placeholders})"
+                    " AND (status = ? OR (status = ? AND leased_at < ?)) ORDER BY id LIMIT ?",
+                    (*shards, PENDING, LEASED, now - self.lease_timeout, limit),
+                ).fetchall()
+                self.conn.executemany(
+                    "UPDATE tasks SET status = ?, worker = ?, leased_at = ? WHERE id = ?",
+                    [(LEASED, worker_id, now, task_id) for task_id, _ in rows],
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [url for _, url in rows]
+
+    def complete_many(self, results: Iterable[tuple]):
+        """Enregistre en une transaction les couples (url, succès)"""
+        rows = [(DONE if ok else FAILED, url) for url, ok in results]
+        if not rows:
+            return
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("UPDATE tasks SET status = ?, leased_at = NULL WHERE url = ?", rows)
+            self.conn.execute("COMMIT")
+
+    def set_producer_done(self, done: bool = True):
+        """Indique si toutes les URLs de départ ont été ajoutées (les workers s'arrêtent seulement après)"""
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('producer_done', ?)", ("1" if done else "0",))
+
+    def producer_done(self) -> bool:
+        # Sans indicateur (file remplie par un autre moyen), l'ajout est considéré comme terminé
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'producer_done'").fetchone()
+        return row is None or row[0] == "1"
+
+    def is_finished(self) -> bool:
+        """Vrai quand le producteur a terminé et que la file est vide"""
+        return self.producer_done() and self.is_drained()
+
+    def is_drained(self) -> bool:
+        """Vrai quand plus aucune URL n'est en attente ni en cours, toutes partitions confondues"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM tasks WHERE status IN (?, ?) LIMIT 1", (PENDING, LEASED)
+            ).fetchone()
+        return row is None
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+        names = {PENDING: "en attente", LEASED: "en cours", DONE: "terminées", FAILED: "échecs"}
+        return {names[status]: count for status, count in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+async def _worker_main(db_path: str, shards: int, owned_shards: List[int], worker_id: str, output_dir: str,
+                       max_concurrent: int, tiered_fetch: bool, follow_links: bool, poll_interval: float):
+    # Imports locaux: chaque processus worker ouvre son propre navigateur
+    from http_fetch import TieredFetcher
+    from link_extractor import same_domain_links
+    from naming import url_to_path
+    from neardup import NearDuplicateIndex
+    from output_writer import AsyncOutputWriter
+    from politeness import PolitenessPolicy
+    from telemetry import Telemetry
+
+    queue = ShardedQueue(db_path, shards)
+    # Un dossier de sortie (index et télémétrie compris) par worker: aucun fichier partagé entre processus
+    worker_dir = os.path.join(output_dir, f"worker-{worker_id}")
+    os.makedirs(worker_dir, exist_ok=True)
+    telemetry = Telemetry(jsonl_path=os.path.join(worker_dir, "telemetry.jsonl"))
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=False,
+        extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"],
+    )
+    fetcher = TieredFetcher(browser_config, CrawlerRunConfig(cache_mode=CacheMode.BYPASS),
+                            http_first=tiered_fetch, session_pool_size=max_concurrent, telemetry=telemetry)
+    # Les variantes d'un même site sont dans la même partition: quasi-doublons détectés par worker
+    writer = AsyncOutputWriter(worker_dir, telemetry=telemetry, near_duplicates=NearDuplicateIndex())
+    writer.start()
+    # Un hôte n'appartient qu'à une partition: robots.txt et débit par hôte restent cohérents entre workers
+    politeness = PolitenessPolicy()
+    scheduler = SlidingWindowScheduler(max_concurrent=max_concurrent, politeness=politeness, telemetry=telemetry)
+    finished: List[tuple] = []
+
+    async def flush_finished():
+        if finished:
+            batch = finished[:]
+            finished.clear()
+            await asyncio.to_thread(queue.complete_many, batch)
+
+    async def leased_urls():
+        while True:
+            await flush_finished()
+            urls = await asyncio.to_thread(queue.lease, owned_shards, worker_id, max_concurrent * 2)
+            if urls:
+                for url in urls:
+                    yield url
+                continue
+            # File vide mais producteur encore actif: d'autres URLs peuvent arriver
+            if await asyncio.to_thread(queue.is_finished):
+                return
+            await asyncio.sleep(poll_interval)
+
+    success_count = fail_count = 0
+    try:
+        async for url, result in scheduler.run(leased_urls(), fetcher.fetch):
+            ok = not isinstance(result, Exception) and result.success
+            if ok:
+                success_count += 1
+                await writer.write(url, url_to_path(url), result.markdown.raw_markdown)
+                if follow_links and result.raw_html:
+                    with telemetry.span(url, "link_extraction"):
+                        links = await asyncio.to_thread(same_domain_links, result.raw_html, url, host_of(url))
+                    # Les liens rejoignent la partition de leur hôte (éventuellement celle d'un autre worker)
+                    await asyncio.to_thread(queue.enqueue_many, links)
+            else:
+                fail_count += 1
+                print(f"[worker {worker_id}] Échec: {url} - {result if isinstance(result, Exception) else result.error_message}")
+            finished.append((url, ok))
+            if len(finished) >= 50:
+                await flush_finished()
+        await flush_finished()
+    finally:
+        await writer.close()
+        await fetcher.close()
+        await politeness.close()
+        queue.close()
+        telemetry.write_prometheus(os.path.join(worker_dir, "metrics.prom"))
+        telemetry.close()
+    print(f"[worker {worker_id}] Terminé: {success_count} pages extraites, {fail_count} échecs")
+    scheduler.stats.print_summary()
+    telemetry.print_summary()
+
+
+def run_worker(db_path: str, shards: int, owned_shards: List[int], worker_id: str, output_dir: str,
+               max_concurrent: int = 5, tiered_fetch: bool = True, follow_links: bool = False,
+               poll_interval: float = 1.0):
+    """Point d'entrée d'un processus worker (sur la même machine que la file SQLite)"""
+    asyncio.run(_worker_main(db_path, shards, owned_shards, worker_id, output_dir,
+                             max_concurrent, tiered_fetch, follow_links, poll_interval))
+
+
+async def crawl_sharded(urls: Union[Iterable[str], AsyncIterable[str]], workers: Optional[int] = None,
+                        db_path: str = "crawl_queue.db", output_dir: str = "output_sharded",
+                        max_concurrent: int = 5, tiered_fetch: bool = True, follow_links: bool = False):
+    """
+    Extraction répartie sur plusieurs processus, chacun avec son navigateur et sa boucle d'événements.
+    Les URLs sont partitionnées par hôte dans une file SQLite partagée; les workers démarrent
+    pendant que les URLs sont encore ajoutées (ex: sitemap lu en flux).
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    queue = ShardedQueue(db_path, shards=workers)
+    # Les workers attendent de nouvelles URLs tant que l'indicateur n'est pas levé
+    queue.set_producer_done(False)
+
+    # Ajout d'un premier lot avant le démarrage des workers
+    source = iterate_urls(urls)
+    first_batch = [url async for url in _take(source, 500)]
+    queue.enqueue_many(first_batch)
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(db_path, workers, [index], str(index), output_dir, max_concurrent, tiered_fetch, follow_links),
+            name=f"crawl-worker-{index}",
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Ajout du reste des URLs par lots
+    try:
+        batch = []
+        async for url in source:
+            batch.append(url)
+            if len(batch) >= 500:
+                await asyncio.to_thread(queue.enqueue_many, batch)
+                batch = []
+        await asyncio.to_thread(queue.enqueue_many, batch)
+    finally:
+        # Même en cas d'erreur de la source: les workers terminent les URLs déjà en file
+        await asyncio.to_thread(queue.set_producer_done)
+
+    for process in processes:
+        await asyncio.to_thread(process.join)
+    print(f"\nRésumé de l'extraction répartie ({workers} workers): {queue.counts()}")
+    queue.close()
+
+
+async def _take(source, count: int):
+    taken = 0
+    async for item in source:
+        yield item
+        taken += 1
+        if taken >= count:
+            return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extraction répartie par hôte sur plusieurs processus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = subparsers.add_parser("run", help="Remplit la file (sitemap ou URLs de départ) et lance les workers locaux")
+    coordinator.add_argument("--sitemap", default="https://ai.pydantic.dev/sitemap.xml")
+    coordinator.add_argument("--seed", nargs="*", help="URLs de départ (au lieu du sitemap), avec --follow-links")
+    coordinator.add_argument("--workers", type=int, default=os.cpu_count())
+    coordinator.add_argument("--db", default="crawl_queue.db")
+    coordinator.add_argument("--output", default="output_sharded")
+    coordinator.add_argument("--max-concurrent", type=int, default=5)
+    coordinator.add_argument("--follow-links", action="store_true")
+
+    worker = subparsers.add_parser("worker", help="Lance un worker supplémentaire sur une file existante (même machine)")
+    worker.add_argument("--db", required=True)
+    worker.add_argument("--shards", type=int, required=True, help="Nombre total de partitions de la file")
+    worker.add_argument("--owned", required=True, help="Partitions traitées par ce worker, ex: 0,3")
+    worker.add_argument("--worker-id", required=True)
+    worker.add_argument("--output", default="output_sharded")
+    worker.add_argument("--max-concurrent", type=int, default=5)
+    worker.add_argument("--follow-links", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        from sitemap_stream import stream_sitemap_urls
+
+        urls = args.seed if args.seed else stream_sitemap_urls(args.sitemap)
+        asyncio.run(crawl_sharded(urls, workers=args.workers, db_path=args.db,
+                                  output_dir=args.output, max_concurrent=args.max_concurrent,
+                                  follow_links=args.follow_links))
+    else:
+        run_worker(args.db, args.shards, [int(s) for s in args.owned.split(",")], args.worker_id, args.output,
+                   max_concurrent=args.max_concurrent, follow_links=args.follow_links)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,16 @@
 import asyncio
-from typing import List
-import requests
-from xml.etree import ElementTree
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig # type: ignore
+from typing import AsyncIterable, Dict, List, Optional, Union
+from crawl4ai import BrowserConfig, CrawlerRunConfig # type: ignore
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator # type: ignore
+from incremental import CrawlManifest
+from http_fetch import TieredFetcher
+from scheduler import iterate_urls
+from sitemap_stream import stream_sitemap_urls
+from telemetry import NULL_TELEMETRY, Telemetry
 
-def get_pydantic_ai_docs_urls():
-    """
-    Récupère toutes les URLs de la documentation Pydantic AI.
-    Utilise le sitemap (https://ai.pydantic.dev/sitemap.xml) pour obtenir ces URLs.
-    """
-    sitemap_url = "https://ai.pydantic.dev/sitemap.xml"
-    try:
-        response = requests.get(sitemap_url)
-        response.raise_for_status()
-
-        # Analyse le XML
-        root = ElementTree.fromstring(response.content)
-
-        # Extrait toutes les URLs du sitemap
-        namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        urls = [loc.text for loc in root.findall('.//ns:loc', namespace)]
-
-        return urls
-    except Exception as e:
-        print(f"Erreur lors de la récupération du sitemap: {e}")
-        return []
-
-async def crawl_sequential(urls: List[str]):
+async def crawl_sequential(urls: Union[List[str], AsyncIterable[str]], manifest: Optional[CrawlManifest] = None,
+                           lastmods: Optional[Dict[str, Optional[str]]] = None, tiered_fetch: bool = False,
+                           telemetry: Optional[Telemetry] = None):
     print("\n=== Extraction séquentielle avec réutilisation de session ===")
 
     browser_config = BrowserConfig(
@@ -40,21 +23,31 @@ async def crawl_sequential(urls: List[str]):
         markdown_generator=DefaultMarkdownGenerator()
     )
 
-    # Crée le crawler (ouvre le navigateur)
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
+    # Crée le crawler: client HTTP d'abord si 'tiered_fetch', navigateur ouvert seulement si nécessaire
+    telemetry = telemetry or NULL_TELEMETRY
+    crawler = TieredFetcher(browser_config, crawl_config, http_first=tiered_fetch, telemetry=telemetry)
 
     try:
         session_id = "session1"  # Réutilise la même session pour toutes les URLs
-        for url in urls:
-            result = await crawler.arun(
-                url=url,
-                config=crawl_config,
+        # Dictionnaire conservé tel quel: il peut être rempli au fil de la lecture du sitemap
+        if lastmods is None:
+            lastmods = {}
+        async for url in iterate_urls(urls):
+            # Mode incrémental: ignore les pages dont le lastmod du sitemap n'a pas changé
+            if manifest and manifest.is_unchanged_in_sitemap(url, lastmods.get(url)):
+                print(f"Inchangée depuis la dernière extraction: {url}")
+                continue
+            result = await crawler.fetch(
+                url,
                 session_id=session_id
             )
+            telemetry.counter("crawl_pages_total", outcome="success" if result.success else "failure")
             if result.success:
                 print(f"Extraction réussie: {url}")
                 print(f"Longueur du Markdown: {len(result.markdown.raw_markdown)}")
+                if manifest:
+                    manifest.update(url, lastmod=lastmods.get(url), headers=result.response_headers,
+                                    markdown=result.markdown.raw_markdown)
                 
                 # Sauvegarde optionnelle du contenu dans un fichier
                 # with open(f"output_{url.split('/')[-1]}.md", "w", encoding="utf-8") as f:
@@ -63,15 +56,20 @@ async def crawl_sequential(urls: List[str]):
                 print(f"Échec: {url} - Erreur: {result.error_message}")
     finally:
         # Après avoir traité toutes les URLs, ferme le crawler (et le navigateur)
+        crawler.print_summary()
+        telemetry.print_summary()
         await crawler.close()
+        if manifest:
+            manifest.save()
 
 async def main():
-    urls = get_pydantic_ai_docs_urls()
-    if urls:
-        print(f"Trouvé {len(urls)} URLs à extraire")
-        await crawl_sequential(urls)
-    else:
-        print("Aucune URL trouvée à extraire")
+    # Lecture du sitemap en flux (sans bloquer la boucle d'événements): l'extraction démarre
+    # dès les premières URLs, et 'lastmods' est rempli au fil de la lecture
+    lastmods: Dict[str, Optional[str]] = {}
+    urls = stream_sitemap_urls("https://ai.pydantic.dev/sitemap.xml", lastmods=lastmods)
+    # Mode incrémental: les pages dont le lastmod du sitemap n'a pas changé ne sont pas ré-extraites
+    manifest = CrawlManifest("manifest_sequential.json")
+    await crawl_sequential(urls, manifest=manifest, lastmods=lastmods, tiered_fetch=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
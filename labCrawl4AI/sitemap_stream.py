@@ -0,0 +1,133 @@
+import asyncio
+import zlib
+from typing import AsyncIterator, Dict, Optional, Tuple
+from xml.etree import ElementTree
+
+import aiohttp
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _local_name(tag: str) -> str:
+    """Nom de balise sans espace de noms ('{ns}loc' -> 'loc')"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem: ElementTree.Element, name: str) -> Optional[str]:
+    for child in elem:
+        if _local_name(child.tag) == name and child.text:
+            return child.text.strip()
+    return None
+
+
+async def _decoded_chunks(response: aiohttp.ClientResponse, chunk_size: int) -> AsyncIterator[bytes]:
+    """Lit la réponse par blocs et décompresse à la volée les sitemaps .xml.gz"""
+    decompressor = None
+    first = True
+    async for chunk in response.content.iter_chunked(chunk_size):
+        if first:
+            first = False
+            if chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+async def stream_sitemap_entries(
+    sitemap_url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    max_concurrent: int = 4,
+    chunk_size: int = 64 * 1024,
+    queue_size: int = 1000,
+) -> AsyncIterator[Tuple[str, Optional[str]]]:
+    """
+    Lit un sitemap en flux et produit les couples (URL, lastmod) au fur et à mesure du téléchargement.
+    Suit les <sitemapindex> (sitemaps enfants lus en parallèle) et gère les fichiers .xml.gz.
+    """
+    own_session = session is None
+    if own_session:
+        session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_read=60))
+
+    # File bornée: le téléchargement attend si l'extraction ne suit pas
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    done_marker = object()
+    seen_sitemaps = set()
+    tasks = set()
+    pending = 0
+
+    def schedule(url: str):
+        nonlocal pending
+        if url in seen_sitemaps:
+            return
+        seen_sitemaps.add(url)
+        pending += 1
+        task = asyncio.create_task(read_sitemap(url))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    async def read_sitemap(url: str):
+        nonlocal pending
+        try:
+            async with semaphore:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    # Analyse incrémentale: seuls les éléments en cours restent en mémoire
+                    parser = ElementTree.XMLPullParser(events=("start", "end"))
+                    root = None
+                    async for data in _decoded_chunks(response, chunk_size):
+                        parser.feed(data)
+                        for event, elem in parser.read_events():
+                            if event == "start":
+                                if root is None:
+                                    root = elem
+                                continue
+                            name = _local_name(elem.tag)
+                            if name == "url":
+                                loc = _child_text(elem, "loc")
+                                if loc:
+                                    await queue.put((loc, _child_text(elem, "lastmod")))
+                            elif name == "sitemap":
+                                loc = _child_text(elem, "loc")
+                                if loc:
+                                    schedule(loc)
+                            else:
+                                continue
+                            # Les éléments traités sont détachés de la racine (sinon elle les garde tous)
+                            elem.clear()
+                            del root[:]
+                    parser.close()
+        except Exception as e:
+            print(f"Erreur lors de la lecture du sitemap {url}: {e}")
+        finally:
+            pending -= 1
+            if pending == 0:
+                await queue.put(done_marker)
+
+    schedule(sitemap_url)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done_marker:
+                break
+            yield item
+    finally:
+        for task in list(tasks):
+            task.cancel()
+        if own_session:
+            await session.close()
+
+
+async def stream_sitemap_urls(sitemap_url: str, lastmods: Optional[Dict[str, Optional[str]]] = None,
+                              **kwargs) -> AsyncIterator[str]:
+    """
+    Produit uniquement les URLs d'un sitemap (utilisable directement par crawl_parallel).
+    Si 'lastmods' est fourni, il est rempli au fil de l'eau avec le lastmod de chaque URL.
+    """
+    async for url, lastmod in stream_sitemap_entries(sitemap_url, **kwargs):
+        if lastmods is not None:
+            lastmods[url] = lastmod
+        yield url
@@ -0,0 +1,272 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Bornes (secondes) des histogrammes de durée, de 1 ms à 1 min
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGES = ("queue_wait", "politeness", "fetch_http", "markdown", "render", "link_extraction", "write")
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    """Histogramme cumulatif à la Prometheus (bornes fixes, somme et nombre d'observations)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Estimation (borne supérieure du seau) du quantile q"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+class Telemetry:
+    """
+    Télémétrie d'une extraction: spans par URL et par étape (attente, politesse, récupération HTTP,
+    Markdown, rendu navigateur, extraction des liens, écriture), compteurs, jauges et histogrammes.
+    Les spans sont ajoutés par lots à un fichier JSONL; les métriques s'exportent au format texte
+    Prometheus (fichier ou endpoint /metrics). Avec enabled=False, tous les appels sont sans effet.
+    """
+
+    def __init__(self, jsonl_path: Optional[str] = None, enabled: bool = True, flush_every: int = 200):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.flush_every = flush_every
+        self.counters: Dict[LabelKey, float] = defaultdict(float)
+        self.gauges: Dict[LabelKey, float] = {}
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self._events: List[str] = []
+        # Les spans peuvent venir de threads (écrivain, conversion Markdown)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._file = open(jsonl_path, "a", encoding="utf-8") if (enabled and jsonl_path) else None
+
+    def counter(self, name: str, value: float = 1, **labels: Any):
+        if self.enabled:
+            with self._lock:
+                self.counters[_key(name, labels)] += value
+
+    def gauge(self, name: str, value: float, **labels: Any):
+        if self.enabled:
+            with self._lock:
+                self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any):
+        if not self.enabled:
+            return
+        with self._lock:
+            key = _key(name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def record_span(self, url: str, stage: str, duration: float, **attributes: Any):
+        """Enregistre une étape déjà mesurée (histogramme 'crawl_stage_seconds' + évènement JSONL)"""
+        if not self.enabled:
+            return
+        self.observe("crawl_stage_seconds", duration, stage=stage)
+        if self._file is None:
+            return
+        event = {"ts": time.time(), "url": url, "stage": stage, "duration": round(duration, 6), **attributes}
+        with self._lock:
+            self._events.append(json.dumps(event, ensure_ascii=False, default=str))
+            full = len(self._events) >= self.flush_every
+        if full:
+            self.flush()
+
+    @contextmanager
+    def span(self, url: str, stage: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Mesure une étape (utilisable autour d'un 'await'); le dictionnaire fourni reçoit
+        des attributs supplémentaires, et 'error' est renseigné si l'étape lève une exception.
+        """
+        if not self.enabled:
+            yield attributes
+            return
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.record_span(url, stage, time.perf_counter() - start, **attributes)
+
+    def flush(self):
+        """Écrit les évènements en attente dans le fichier JSONL"""
+        with self._lock:
+            events, self._events = self._events, []
+        if events and self._file is not None:
+            self._file.write("\n".join(events) + "\n")
+            self._file.flush()
+
+    def prometheus_text(self) -> str:
+        """Métriques au format d'exposition texte de Prometheus"""
+        lines = []
+        declared = set()
+
+        def declare(name: str, kind: str):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+            for (name, labels), value in counters:
+                declare(name, "counter")
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), value in gauges:
+                declare(name, "gauge")
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                declare(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Écrit les métriques dans un fichier texte (collecteur 'textfile' de node_exporter)"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def serve_prometheus(self, port: int = 9108, host: str = "127.0.0.1") -> str:
+        """Expose les métriques sur http://host:port/metrics (thread en arrière-plan)"""
+        telemetry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = telemetry.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/metrics"
+
+    def print_summary(self):
+        """Temps passé par étape (nombre, total, moyenne, p95 estimé)"""
+        if not self.enabled:
+            return
+        stages = {dict(labels).get("stage"): histogram for (name, labels), histogram in self.histograms.items()
+                  if name == "crawl_stage_seconds"}
+        if not stages:
+            return
+        print("  - Temps par étape:")
+        for stage in sorted(stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            h = stages[stage]
+            print(f"      {stage:<16} {h.count:>6} spans, total {h.sum:8.2f}s, "
+                  f"moyenne {h.sum / h.count * 1000:8.1f} ms, p95 <= {h.quantile(0.95) * 1000:g} ms")
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# Télémétrie inactive utilisée par défaut par les composants
+NULL_TELEMETRY = Telemetry(enabled=False)
+
+
+async def profile_crawl(crawl: Awaitable[Any], profiler: str = "cprofile", output_path: Optional[str] = None,
+                        top: int = 30) -> Any:
+    """
+    Exécute une extraction sous profilage: "cprofile" (statistiques triées par temps cumulé,
+    fichier .prof si 'output_path') ou "pyinstrument" (profil échantillonné, rapport HTML si 'output_path').
+    """
+    if profiler == "pyinstrument" and pyinstrument is None:
+        print("pyinstrument n'est pas installé, cProfile utilisé à la place")
+        profiler = "cprofile"
+
+    if profiler == "pyinstrument":
+        # Mode asynchrone: le temps passé en 'await' est attribué à la coroutine qui attend
+        session = pyinstrument.Profiler(async_mode="enabled")
+        session.start()
+        try:
+            return await crawl
+        finally:
+            session.stop()
+            if output_path:
+                with open(output_path, "w", encoding="utf-8") as f:
+                    f.write(session.output_html())
+                print(f"Profil pyinstrument enregistré dans {output_path}")
+            else:
+                print(session.output_text(unicode=True))
+
+    session = cProfile.Profile()
+    session.enable()
+    try:
+        return await crawl
+    finally:
+        session.disable()
+        if output_path:
+            session.dump_stats(output_path)
+            print(f"Profil cProfile enregistré dans {output_path}")
+        stream = io.StringIO()
+        pstats.Stats(session, stream=stream).sort_stats("cumulative").print_stats(top)
+        print(stream.getvalue())
@@ -1,6 +1,7 @@
 from langchain_groq import ChatGroq
 from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
+from summary_memory import SummaryBufferMemory
+from session_store import SessionStore, SqliteSessionBackend
 from langchain.prompts import PromptTemplate
 
 # Add your Groq API key here
@@ -37,29 +38,50 @@ prompt = PromptTemplate(
     template=template
 )
 
-# Initialisation de la mémoire (stocke l'historique des messages)
-memory = ConversationBufferMemory(
-    return_messages=True,
-    memory_key="chat_history"
+# Mémoire par session (un utilisateur = une session), enregistrée dans SQLite et chargée à la demande:
+# un processus sert de nombreuses conversations, seules les plus récentes restent en mémoire.
+# Chaque mémoire garde les derniers échanges tels quels (budget de jetons) et résume les plus anciens
+# en arrière-plan après chaque réponse: la taille du prompt reste constante
+sessions = SessionStore(
+    SqliteSessionBackend("sessions/conversations.db"),
+    memory_factory=lambda: SummaryBufferMemory(
+        llm=llm,
+        return_messages=False,  # le template est un texte: historique sous forme de lignes
+        memory_key="chat_history",
+        max_token_limit=1000,
+    ),
+    max_active=1000,
 )
 
-# Création de la chaîne de conversation
-conversation = ConversationChain(
-    llm=llm,
-    memory=memory,
-    prompt=prompt,
-    verbose=True
-)
 
-# Simulation d'une conversation
+def chat(session_id: str, question: str) -> str:
+    """Répond dans la conversation 'session_id' (reprise après un redémarrage)"""
+    memory = sessions.get(session_id)
+    # Chaîne de conversation liée à la mémoire de la session
+    conversation = ConversationChain(
+        llm=llm,
+        memory=memory,
+        prompt=prompt,
+        verbose=True
+    )
+    response = conversation.predict(input=question)
+    # La mémoire utilisée pour l'échange (la session a pu être évincée pendant l'appel au LLM)
+    sessions.save(session_id, memory)
+    print(f"(historique envoyé: ~{memory.last_history_tokens} jetons)")
+    return response
+
+
+# Simulation de deux conversations entrelacées
 questions = [
-    "Bonjour! Comment vous appelez-vous?",
-    "Quels sont vos hobbies?",
-    "Vous souvenez-vous de mon premier message?",
-    "Pouvez-vous résumer notre conversation?"
+    ("utilisateur-1", "Bonjour! Je m'appelle Camille. Comment vous appelez-vous?"),
+    ("utilisateur-2", "Bonjour! Quels sont vos hobbies?"),
+    ("utilisateur-1", "Vous souvenez-vous de mon prénom?"),
+    ("utilisateur-2", "Pouvez-vous résumer notre conversation?"),
 ]
 
-for question in questions:
-    print(f"\nHumain: {question}")
-    response = conversation.predict(input=question)
-    print(f"Assistant: {response}")
\ No newline at end of file
+for session_id, question in questions:
+    print(f"\n[{session_id}] Humain: {question}")
+    response = chat(session_id, question)
+    print(f"Assistant: {response}")
+
+sessions.close()
@@ -2,8 +2,15 @@ from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
+from langchain.globals import set_llm_cache
+from llm_cache import SemanticLLMCache
 import os
 
+# Cache des réponses (SQLite), exact seulement: les instructions de format dominent le prompt,
+# deux requêtes différentes seraient jugées similaires
+llm_cache = SemanticLLMCache("llm_cache/responses.db")
+set_llm_cache(llm_cache)
+
 # Option 1: Set the API key as an environment variable
 # os.environ["GROQ_API_KEY"] = "your-api-key-here"
 
@@ -58,4 +65,6 @@ response = chain.invoke({"query": "Un film d'action récent"})
 print("Résultat avec LCEL:")
 print(f"Titre: {response.titre}")
 print(f"Genre: {', '.join(response.genre)}")
-print(f"Année: {response.annee}")
\ No newline at end of file
+print(f"Année: {response.annee}")
+
+llm_cache.print_summary()
\ No newline at end of file
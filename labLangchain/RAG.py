@@ -1,9 +1,11 @@
 from langchain_groq import ChatGroq
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+from summary_memory import SummaryBufferMemory
+from vector_store import PersistentFaissStore
+from hybrid_search import HybridRetriever, LexicalIndex
+from embedding_cache import BatchedEmbeddings, CachedEmbeddings, EmbeddingCache
+from llm_cache import SemanticLLMCache
 
 # 1. Préparation du document (exemple)
 documents = ["""
@@ -23,50 +25,104 @@ LangChain est disponible en Python et JavaScript, ce qui permet une intégration
 facile dans différents environnements de développement.
 """]
 
+# Type d'index FAISS: "flat" (exact) ou approché pour un gros corpus, ex: "ivf-sq8", "hnsw-sq8", "ivf-pq"
+# (compromis recall/latence/mémoire mesuré par: python ann_index.py --index-dir faiss_index)
+INDEX_SPEC = "flat"
+
 # 2. Fractionnement du texte en morceaux plus petits
 text_splitter = RecursiveCharacterTextSplitter(
     chunk_size=500,
     chunk_overlap=50
 )
-chunks = text_splitter.split_text(documents[0])
 
-# 3. Création d'embeddings avec un modèle HuggingFace gratuit
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
 
-# 4. Création d'une base de vecteurs avec FAISS
-vector_store = FAISS.from_texts(chunks, embeddings)
+def main():
+    # Le calcul des embeddings utilise des processus ('spawn'): le script est protégé par __main__
+    # 3. Création d'embeddings avec un modèle HuggingFace gratuit
+    # Calcul par lots sur plusieurs processus (un modèle par cœur), avec un cache par empreinte
+    # du contenu (LRU en mémoire + SQLite en float16): un morceau déjà vu n'est jamais recalculé
+    embeddings = CachedEmbeddings(
+        BatchedEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2", batch_size=64),
+        EmbeddingCache("embedding_cache/embeddings.db"),
+    )
 
-# 5. Initialisation du modèle de chat
-chat_model = ChatGroq(
-    model="llama3-70b-8192",
-    temperature=0.3,
-    max_tokens=500,
-)
+    # 4. Base de vecteurs FAISS persistante (index mmap + manifeste des morceaux):
+    # seuls les morceaux nouveaux ou modifiés sont calculés. La base est partagée avec ingest.py
+    # (pages extraites, identifiées par leur URL): les documents d'exemple ont leur propre préfixe
+    # et sont seulement ajoutés ou mis à jour (sync() retirerait toutes les pages ingérées)
+    store = PersistentFaissStore("faiss_index", embeddings, text_splitter)
+    # Index lexical BM25 (SQLite FTS5) tenu à jour avec le manifeste des morceaux
+    lexical = LexicalIndex(store)
+    stats = store.upsert_documents({f"demo/doc-{i}": document for i, document in enumerate(documents)})
+    store.save()
+    print(f"Base de vecteurs: {len(store)} morceaux ({stats['added']} ajoutés, {stats['removed']} retirés)")
+    if INDEX_SPEC != "flat" and stats["added"]:
+        # Index approché réentraîné sur le corpus à jour (embeddings relus dans le cache)
+        print(f"Index reconstruit: {store.rebuild_index(INDEX_SPEC)}")
 
-# 6. Configuration de la mémoire pour la conversation
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True
-)
+    # Recherche hybride: BM25 (noms d'API, messages d'erreur exacts) et FAISS en parallèle, fusion RRF
+    retriever = HybridRetriever(store=store, lexical=lexical, k=4, fetch_k=20)
+
+    # 5. Initialisation des modèles de chat, chacun derrière son cache de réponses (pas de cache global)
+    # - réponse aux questions: exact, puis sémantique (même contexte récupéré et question
+    #   de similarité >= 0.95)
+    # - reformulation de la question et résumé de la mémoire: exact seulement (un seul message
+    #   dominé par le template, donc proche de tous les autres: un succès sémantique renverrait
+    #   la reformulation ou le résumé d'un autre échange)
+    llm_cache = SemanticLLMCache("llm_cache/responses.db", embeddings=embeddings, threshold=0.95)
+    exact_cache = SemanticLLMCache("llm_cache/responses.db")
+    answer_model = ChatGroq(
+        model="llama3-70b-8192",
+        temperature=0.3,
+        max_tokens=500,
+        cache=llm_cache,
+    )
+    chat_model = ChatGroq(
+        model="llama3-70b-8192",
+        temperature=0.3,
+        max_tokens=500,
+        cache=exact_cache,
+    )
+
+    # 6. Configuration de la mémoire pour la conversation: fenêtre récente + résumé calculé
+    # en arrière-plan + rappel des anciens échanges proches de la question
+    memory = SummaryBufferMemory(
+        llm=chat_model,
+        memory_key="chat_history",
+        output_key="answer",
+        return_messages=True,
+        max_token_limit=1000,
+        embeddings=embeddings,
+    )
+
+    # 7. Création de la chaîne de récupération conversationnelle
+    retrieval_chain = ConversationalRetrievalChain.from_llm(
+        llm=answer_model,
+        condense_question_llm=chat_model,
+        retriever=retriever,
+        memory=memory,
+        verbose=True
+    )
+
+    # 8. Exemple d'utilisation
+    questions = [
+        "Qu'est-ce que LangChain?",
+        "Quelles sont ses fonctionnalités principales?",
+        "Est-il disponible en JavaScript?"
+    ]
+
+    for question in questions:
+        # Pages enregistrées entre-temps par ingest.py (suivi du crawler en continu)
+        if store.refresh():
+            print(f"Index rechargé: {len(store)} morceaux")
+        print(f"\nQuestion: {question}")
+        result = retrieval_chain.invoke({"question": question})
+        print(f"Réponse: {result['answer']}")
+
+    memory.close()
+    llm_cache.print_summary()
+    exact_cache.print_summary()
 
-# 7. Création de la chaîne de récupération conversationnelle
-retrieval_chain = ConversationalRetrievalChain.from_llm(
-    llm=chat_model,
-    retriever=vector_store.as_retriever(),
-    memory=memory,
-    verbose=True
-)
 
-# 8. Exemple d'utilisation
-questions = [
-    "Qu'est-ce que LangChain?",
-    "Quelles sont ses fonctionnalités principales?",
-    "Est-il disponible en JavaScript?"
-]
-
-for question in questions:
-    print(f"\nQuestion: {question}")
-    result = retrieval_chain.invoke({"question": question})
-    print(f"Réponse: {result['answer']}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
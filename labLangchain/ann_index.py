@@ -0,0 +1,222 @@
+import argparse
+import json
+import math
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+# Index prédéfinis (chaînes de faiss.index_factory); {nlist} et {m} sont calculés selon le corpus
+INDEX_PRESETS = {
+    "flat": "Flat",                   # exact, 4*d octets par vecteur
+    "sq8": "SQ8",                     # exact sur vecteurs quantifiés int8 (d octets par vecteur)
+    "hnsw": "HNSW32",                 # graphe: très rapide, mémoire > flat, pas de suppression
+    "hnsw-sq8": "HNSW32,SQ8",
+    "ivf-flat": "IVF{nlist},Flat",    # partitionnement: 'nprobe' listes visitées par requête
+    "ivf-sq8": "IVF{nlist},SQ8",
+    "ivf-pq": "IVF{nlist},PQ{m}",     # quantification produit: m octets par vecteur (entraînement le plus long)
+}
+
+# Paramètres de recherche par défaut selon le type d'index
+DEFAULT_SEARCH_PARAMS = {"IVF": {"nprobe": 16}, "HNSW": {"efSearch": 64}}
+SEARCH_PARAM_KINDS = {"nprobe": "IVF", "efSearch": "HNSW"}
+
+# Quantifieur produit 'PQ{m}x{nbits}' (nbits = 8 par défaut): 2^nbits centroïdes par sous-vecteur,
+# à entraîner sur au moins 39 vecteurs chacun
+PQ_PATTERN = re.compile(r"\bPQ(\d+)(?:x(\d+))?\b")
+MIN_POINTS_PER_CENTROID = 39
+
+
+def resolve_spec(spec: str, n: int, dimension: int) -> str:
+    """Chaîne index_factory d'un preset (ou d'une chaîne faiss fournie telle quelle)"""
+    spec = INDEX_PRESETS.get(spec, spec)
+    # ~4*sqrt(n) listes, avec au moins 39 vecteurs d'entraînement par liste
+    nlist = max(1, min(int(4 * math.sqrt(max(n, 1))), n // 39 or 1))
+    # Plus grand diviseur de la dimension <= d/8 (sous-vecteurs de 8 composantes au moins,
+    # ex: 48 octets par vecteur en dimension 384 au lieu de 1536 en float32)
+    m = max(m for m in range(1, max(1, dimension // 8) + 1) if dimension % m == 0)
+    factory = spec.format(nlist=nlist, m=m)
+    # Corpus trop petit pour entraîner le quantifieur produit: quantification int8 (sans entraînement coûteux)
+    match = PQ_PATTERN.search(factory)
+    if match and n < MIN_POINTS_PER_CENTROID * 2 ** int(match.group(2) or 8):
+        factory = PQ_PATTERN.sub("SQ8", factory)
+    return factory
+
+
+def _kind(index: faiss.Index) -> Optional[str]:
+    name = type(faiss.downcast_index(index.index if isinstance(index, faiss.IndexIDMap) else index)).__name__
+    return "IVF" if "IVF" in name else "HNSW" if "HNSW" in name else None
+
+
+def set_search_params(index: faiss.Index, params: Optional[Dict[str, Any]] = None):
+    """
+    Applique nprobe (IVF) / efSearch (HNSW), enregistrés avec l'index, en complément des valeurs
+    par défaut du type. Les paramètres sans objet pour ce type d'index sont ignorés.
+    """
+    kind = _kind(index)
+    params = {**DEFAULT_SEARCH_PARAMS.get(kind, {}), **(params or {})}
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        if SEARCH_PARAM_KINDS.get(name, kind) == kind:
+            space.set_index_parameter(index, name, value)
+
+
+def build_index(vectors: np.ndarray, ids: Sequence[int], spec: str = "flat", train_size: int = 100_000,
+                search_params: Optional[Dict[str, Any]] = None, batch_size: int = 65_536) -> faiss.Index:
+    """
+    Construit un IndexIDMap2 du type 'spec' (preset ou chaîne index_factory): entraînement sur un
+    échantillon aléatoire de 'train_size' vecteurs si le type l'exige, puis ajout par lots.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dimension = vectors.shape
+    factory = resolve_spec(spec, n, dimension)
+    if re.search(r"\bPQ", INDEX_PRESETS.get(spec, spec)) and not PQ_PATTERN.search(factory):
+        print(f"{spec}: {n} vecteurs ne suffisent pas à entraîner la quantification produit, index {factory} utilisé")
+    index = faiss.IndexIDMap2(faiss.index_factory(dimension, factory))
+    if not index.is_trained:
+        sample = vectors
+        if n > train_size:
+            sample = vectors[np.random.default_rng(0).choice(n, train_size, replace=False)]
+        index.train(sample)
+    ids = np.asarray(ids, dtype="int64")
+    for start in range(0, n, batch_size):
+        index.add_with_ids(vectors[start:start + batch_size], ids[start:start + batch_size])
+    set_search_params(index, search_params)
+    return index
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Percentile p (rang le plus proche) d'une liste déjà triée"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered) / 100) - 1))]
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Taille sérialisée de l'index (≈ mémoire occupée une fois chargé)"""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _describe(index: faiss.Index) -> str:
+    inner = faiss.downcast_index(index.index if isinstance(index, faiss.IndexIDMap) else index)
+    return type(inner).__name__
+
+
+def benchmark(vectors: np.ndarray, queries: np.ndarray, specs: List[str], k: int = 10,
+              train_size: int = 100_000, search_params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Compare chaque type d'index à la recherche exacte (IndexFlatL2): temps de construction, mémoire,
+    recall@k (part des k vrais voisins retrouvés), latence par requête (p50/p95) et débit par lot.
+    """
+    ids = np.arange(len(vectors), dtype="int64")
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    results = []
+    for spec in specs:
+        try:
+            start = time.perf_counter()
+            index = build_index(vectors, ids, spec, train_size, search_params)
+            build_seconds = time.perf_counter() - start
+        except RuntimeError as e:
+            print(f"{spec}: construction impossible ({str(e).splitlines()[0][:120]})")
+            continue
+
+        # Latence d'une requête isolée (cas d'un retriever), puis débit d'un lot
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query.reshape(1, -1), k)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        batch_seconds = time.perf_counter() - start
+
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        latencies.sort()
+        results.append({
+            "spec": spec,
+            "factory": resolve_spec(spec, len(vectors), vectors.shape[1]),
+            "type": _describe(index),
+            "build_s": round(build_seconds, 3),
+            "memory_mb": round(index_bytes(index) / 1e6, 2),
+            f"recall@{k}": round(float(recall), 4),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "qps": round(len(queries) / batch_seconds, 1),
+        })
+    return results
+
+
+def print_report(results: List[Dict[str, Any]], k: int):
+    print(f"\n{'index':<10} {'type':<26} {'construction':>12} {'mémoire':>10} {f'recall@{k}':>10} "
+          f"{'p50':>9} {'p95':>9} {'req/s':>10}")
+    for r in results:
+        print(f"{r['spec']:<10} {r['type']:<26} {r['build_s']:>11.2f}s {r['memory_mb']:>8.1f}Mo "
+              f"{r[f'recall@{k}']:>10.3f} {r['p50_ms']:>7.3f}ms {r['p95_ms']:>7.3f}ms {r['qps']:>10.0f}")
+
+
+def synthetic_vectors(n: int, dimension: int, clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """Vecteurs regroupés en amas (plus proches de vrais embeddings que des vecteurs uniformes)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension)).astype("float32")
+    vectors = centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dimension)).astype("float32")
+    return vectors.astype("float32")
+
+
+def _store_vectors(index_dir: str) -> np.ndarray:
+    """Vecteurs d'un index FAISS enregistré (index exact: lecture directe, sinon reconstruction)"""
+    index = faiss.read_index(f"{index_dir}/index.faiss")
+    inner = faiss.downcast_index(index.index if isinstance(index, faiss.IndexIDMap) else index)
+    if isinstance(inner, faiss.IndexFlat):
+        return faiss.rev_swig_ptr(inner.get_xb(), inner.ntotal * inner.d).reshape(inner.ntotal, inner.d).copy()
+    ids = faiss.vector_to_array(index.id_map)
+    return np.vstack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des index ANN de FAISS (recall@k, latence, mémoire)")
+    parser.add_argument("--index-dir", help="Dossier d'un PersistentFaissStore (vecteurs du corpus extrait)")
+    parser.add_argument("--synthetic", type=int, default=100_000, help="Nombre de vecteurs synthétiques")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--specs", default="flat,sq8,hnsw,hnsw-sq8,ivf-flat,ivf-sq8,ivf-pq",
+                        help="Presets ou chaînes index_factory, séparés par des virgules")
+    parser.add_argument("--nprobe", type=int, help="Listes visitées par requête (index IVF)")
+    parser.add_argument("--ef-search", type=int, help="Largeur de la recherche (index HNSW)")
+    parser.add_argument("--output", help="Rapport JSON")
+    args = parser.parse_args()
+
+    if args.index_dir:
+        vectors = _store_vectors(args.index_dir)
+        print(f"{len(vectors)} vecteurs chargés depuis {args.index_dir}")
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dimension)
+        print(f"{len(vectors)} vecteurs synthétiques de dimension {args.dimension}")
+
+    # Requêtes tirées du corpus puis bruitées (une requête n'est jamais identique à un morceau)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = (queries + 0.05 * queries.std() * rng.normal(size=queries.shape)).astype("float32")
+
+    specs = [s.strip() for s in args.specs.split(",") if s.strip()]
+    params: Dict[str, Any] = {}
+    if args.nprobe:
+        params["nprobe"] = args.nprobe
+    if args.ef_search:
+        params["efSearch"] = args.ef_search
+    results = benchmark(vectors, queries, specs, args.k, search_params=params)
+    print_report(results, args.k)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "dimension": int(vectors.shape[1]), "queries": len(queries),
+                       "k": args.k, "results": results}, f, indent=2)
+        print(f"\nRapport enregistré dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+
+def cache_key(identity: str, text: str) -> str:
+    """Clé du cache: empreinte du contenu, propre à la configuration qui a calculé le vecteur"""
+    return hashlib.sha256(f"{identity}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache d'embeddings à deux niveaux, indexé par empreinte du contenu:
+    - mémoire: LRU de 'memory_items' vecteurs
+    - disque: SQLite, vecteurs stockés en float16 (moitié de la taille en float32)
+    """
+
+    def __init__(self, path: str, memory_items: int = 50_000, dtype: str = "float16"):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self.hits = self.misses = 0
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Vecteurs (float32) trouvés en mémoire puis sur disque"""
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    missing.append(key)
+            # Lecture disque par paquets (limite de paramètres SQLite)
+            for start in range(0, len(missing), 500):
+                part = missing[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' for _ in part)})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=self.dtype).astype(np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, vectors: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Stocke les vecteurs; retourne leur valeur telle que relue du cache (arrondie à 'dtype')"""
+        stored_vectors = {}
+        with self._lock:
+            rows = []
+            for key, vector in vectors.items():
+                stored = np.asarray(vector, dtype=self.dtype)
+                stored_vectors[key] = stored.astype(np.float32)
+                self._remember(key, stored_vectors[key])
+                rows.append((key, stored.tobytes()))
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", rows)
+            self.conn.commit()
+        return stored_vectors
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                "memory_items": len(self._memory)}
+
+    def close(self):
+        self.conn.close()
+
+
+# Modèle chargé une seule fois par processus du pool
+_worker_model = None
+
+
+def _load_model(model_name: str, backend: str, model_file: Optional[str], threads: Optional[int]):
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+    kwargs: Dict[str, Any] = {}
+    if backend != "torch":
+        kwargs["backend"] = backend
+    if model_file:
+        kwargs["model_kwargs"] = {"file_name": model_file}
+    return SentenceTransformer(model_name, **kwargs)
+
+
+def _init_worker(model_name: str, backend: str, model_file: Optional[str], threads: Optional[int]):
+    global _worker_model
+    _worker_model = _load_model(model_name, backend, model_file, threads)
+
+
+def _encode_batch(texts: List[str], normalize: bool) -> np.ndarray:
+    return _worker_model.encode(texts, batch_size=len(texts), normalize_embeddings=normalize,
+                                convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Calcul des embeddings sentence-transformers par lots de 'batch_size' textes, répartis sur
+    'workers' processus (un modèle par processus, 'threads' threads torch chacun).
+    backend: "torch" ou "onnx"; 'model_file' choisit un fichier ONNX du modèle,
+    ex: "onnx/model_qint8_avx512.onnx" (quantifié int8).
+    """
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", batch_size: int = 64,
+                 workers: Optional[int] = None, backend: str = "torch", model_file: Optional[str] = None,
+                 normalize: bool = False):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.model_file = model_file
+        self.normalize = normalize
+        # Les cœurs sont partagés entre les processus (pas de sursouscription des threads torch)
+        self.threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._model = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def identity(self) -> str:
+        """Tout ce qui change les vecteurs produits (le fichier ONNX quantifié et la normalisation aussi)"""
+        return f"{self.model_name}|{self.backend}|{self.model_file or ''}|normalize={self.normalize}"
+
+    def _local_model(self):
+        if self._model is None:
+            self._model = _load_model(self.model_name, self.backend, self.model_file, None)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.workers == 1 or len(batches) == 1:
+            return self._local_model().encode(texts, batch_size=self.batch_size, normalize_embeddings=self.normalize,
+                                              convert_to_numpy=True, show_progress_bar=False).astype(np.float32)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # 'spawn': torch n'est pas sûr après un fork (le script appelant doit être protégé
+                # par if __name__ == "__main__")
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend, self.model_file, self.threads),
+            )
+        return np.vstack(list(self._pool.map(_encode_batch, batches, [self.normalize] * len(batches))))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        # Une requête isolée est calculée dans le processus principal (pas d'aller-retour avec le pool)
+        return self._local_model().encode([text], normalize_embeddings=self.normalize,
+                                          convert_to_numpy=True, show_progress_bar=False)[0].astype(np.float32).tolist()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings avec cache par empreinte du contenu: un texte déjà calculé (ex: texte de navigation
+    répété sur toutes les pages extraites) n'est jamais recalculé, et un lot ne calcule
+    qu'une fois chaque texte distinct. Seuls les documents sont mis en cache, pas les requêtes.
+    'identity' décrit la configuration du modèle; elle est lue sur 'embeddings' (BatchedEmbeddings)
+    ou doit être fournie, sinon deux configurations différentes partageraient leurs vecteurs.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, identity: Optional[str] = None):
+        self.embeddings = embeddings
+        self.cache = cache
+        identity = identity or getattr(embeddings, "identity", None)
+        if not identity:
+            raise ValueError(f"Identité du modèle requise pour mettre en cache les embeddings de "
+                             f"{type(embeddings).__name__} (paramètre 'identity')")
+        self.identity = identity
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.identity, text) for text in texts]
+        found = self.cache.get_many(keys)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            # Mêmes valeurs (arrondies) que lors d'une lecture ultérieure du cache
+            found.update(self.cache.put_many(dict(zip(missing.keys(), vectors))))
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Requêtes non mises en cache (chaque question serait conservée indéfiniment), et calculées
+        # par embed_query du modèle (un modèle asymétrique encode requêtes et documents différemment)
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,159 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.schema import BaseRetriever, Document
+
+from vector_store import PersistentFaissStore
+
+TOKEN = re.compile(r"\w+")
+MIN_PRUNED_DF = 1000
+
+# Tables de l'index lexical, tenues à jour par des triggers sur la table 'chunks' du store
+FTS_SCHEMA = [
+    # Index inversé FTS5 à contenu externe (les textes ne sont pas dupliqués); '_' fait partie des mots
+    # pour que les identifiants (ex: 'max_tokens') soient des termes entiers
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5("
+    " text, content='chunks', content_rowid='id',"
+    " tokenize=\"unicode61 remove_diacritics 2 tokenchars '_'\")",
+    "CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN"
+    " INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN"
+    " INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    # Fréquence documentaire de chaque terme, et termes trop fréquents (calculés hors des recherches)
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts_vocab USING fts5vocab(chunks_fts, 'row')",
+    "CREATE TABLE IF NOT EXISTS chunks_fts_frequent (term TEXT PRIMARY KEY)",
+]
+
+
+class LexicalIndex:
+    """
+    Index BM25 sur disque (SQLite FTS5) des morceaux d'un PersistentFaissStore.
+    L'index est mis à jour dans la même transaction que le manifeste (triggers): aucun recalcul complet.
+    Les termes présents dans plus de 'max_df' (proportion) des morceaux sont ignorés à la recherche:
+    leur IDF est quasi nulle et leurs listes de postings sont les plus longues à parcourir.
+    Cette liste est calculée à la création et par optimize() (après une grosse ingestion).
+    """
+
+    def __init__(self, store: PersistentFaissStore, max_df: float = 0.1):
+        self.store = store
+        self.max_df = max_df
+        self.path = os.path.join(store.index_dir, "chunks.db")
+        with store.lock:
+            created = store.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'"
+            ).fetchone() is None
+            for statement in FTS_SCHEMA:
+                store.conn.execute(statement)
+            if created:
+                # Base existante: indexation des morceaux déjà présents
+                store.conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+                self._refresh_frequent_terms()
+            store.conn.commit()
+            self.frequent = {term for (term,) in store.conn.execute("SELECT term FROM chunks_fts_frequent")}
+        # Une connexion de lecture par thread (WAL: lectures concurrentes avec les écritures du store)
+        self._local = threading.local()
+
+    def _refresh_frequent_terms(self):
+        # Parcourt tout le vocabulaire: à ne pas faire à chaque recherche. Un terme présent dans moins
+        # de MIN_PRUNED_DF morceaux n'est jamais ignoré (petits corpus: ses postings sont vite lus)
+        total = self.store.conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        self.store.conn.execute("DELETE FROM chunks_fts_frequent")
+        self.store.conn.execute(
+            "INSERT INTO chunks_fts_frequent SELECT term FROM chunks_fts_vocab WHERE doc > ?",
+            (max(self.max_df * total, MIN_PRUNED_DF),),
+        )
+        self.frequent = {term for (term,) in self.store.conn.execute("SELECT term FROM chunks_fts_frequent")}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return conn
+
+    def _query_terms(self, query: str) -> List[str]:
+        # Même normalisation que le tokenizer (minuscules, sans accents)
+        normalized = "".join(c for c in unicodedata.normalize("NFKD", query.lower()) if not unicodedata.combining(c))
+        # Une requête faite seulement de termes fréquents n'a pas de résultat lexical (la recherche dense suffit)
+        return [term for term in dict.fromkeys(TOKEN.findall(normalized)) if term not in self.frequent]
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[int, float]]:
+        """(identifiant de morceau, score BM25) des k meilleurs morceaux (score FTS5: plus bas = meilleur)"""
+        terms = self._query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        rows = self._conn().execute(
+            "SELECT rowid, rank FROM chunks_fts WHERE chunks_fts MATCH ? ORDER BY rank LIMIT ?", (match, k)
+        ).fetchall()
+        return [(int(rowid), float(rank)) for rowid, rank in rows]
+
+    def optimize(self):
+        """Fusionne les segments de l'index et recalcule les termes fréquents (après une grosse ingestion)"""
+        with self.store.lock:
+            self.store.conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('optimize')")
+            self._refresh_frequent_terms()
+            self.store.conn.commit()
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60,
+                           weights: Optional[List[float]] = None) -> List[Tuple[int, float]]:
+    """Fusion RRF: score(d) = somme des poids / (k + rang de d), rangs à partir de 1"""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[int, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever hybride: recherche lexicale (BM25) et dense (FAISS) lancées en parallèle,
+    puis fusion par rangs réciproques (RRF). Chaque recherche retourne 'fetch_k' candidats,
+    seuls les 'k' meilleurs morceaux fusionnés sont lus et envoyés au modèle.
+    """
+
+    store: Any
+    lexical: Any
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    weights: Tuple[float, float] = (1.0, 1.0)
+    executor: Any = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _dense(self, query: str) -> List[int]:
+        vector = self.store.embeddings.embed_query(query)
+        return [i for i, _ in self.store.search_ids(vector, self.fetch_k)]
+
+    def _lexical(self, query: str) -> List[int]:
+        return [i for i, _ in self.lexical.search(query, self.fetch_k)]
+
+    def _fuse(self, dense: List[int], lexical: List[int]) -> List[Document]:
+        fused = reciprocal_rank_fusion([dense, lexical], self.rrf_k, list(self.weights))[:self.k]
+        scores = dict(fused)
+        documents = self.store.get_documents(list(scores))
+        for document in documents:
+            document.metadata["rrf_score"] = scores[document.metadata["chunk_id"]]
+        return documents
+
+    def _get_relevant_documents(self, query: str, *, run_manager: Any = None) -> List[Document]:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=2)
+        dense = self.executor.submit(self._dense, query)
+        lexical = self.executor.submit(self._lexical, query)
+        return self._fuse(dense.result(), lexical.result())
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: Any = None) -> List[Document]:
+        dense, lexical = await asyncio.gather(
+            asyncio.to_thread(self._dense, query), asyncio.to_thread(self._lexical, query)
+        )
+        return self._fuse(dense, lexical)
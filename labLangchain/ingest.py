@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import glob
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
+
+from ann_index import percentile
+from embedding_cache import BatchedEmbeddings, CachedEmbeddings, EmbeddingCache
+from vector_store import PersistentFaissStore
+
+
+def markdown_splitter(chunk_size: int = 500, chunk_overlap: int = 50) -> RecursiveCharacterTextSplitter:
+    """Découpage qui suit la structure Markdown (titres, blocs de code, listes) avant les paragraphes"""
+    return RecursiveCharacterTextSplitter.from_language(
+        Language.MARKDOWN, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+
+
+class IndexTailer:
+    """
+    Lecture en continu de l'index JSONL (index.jsonl) d'un dossier de sortie du crawler.
+    Seules les lignes complètes sont lues (une ligne en cours d'écriture est relue au passage suivant);
+    une URL dont l'empreinte n'a pas changé depuis la dernière lecture est ignorée.
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, "index.jsonl")
+        self.offset = 0
+        self._seen: Dict[str, str] = {}
+        self._archive_warned = False
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Nouvelles entrées de pages (fichiers Markdown) depuis le dernier appel"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        entries = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if self._seen.get(entry["url"]) == entry["sha256"]:
+                continue
+            if entry.get("member") is not None:
+                # Les archives (jsonl/tar) en cours d'écriture ne sont pas lisibles: mode "files" uniquement
+                if not self._archive_warned:
+                    print(f"{self.output_dir}: pages archivées ignorées (utilisez le mode de sortie 'files')")
+                    self._archive_warned = True
+                continue
+            self._seen[entry["url"]] = entry["sha256"]
+            entries.append(entry)
+        return entries
+
+    def load(self, entry: Dict[str, Any]) -> Optional[Tuple[str, float]]:
+        """Markdown de la page et date d'écriture du fichier, ou None s'il n'existe plus"""
+        path = os.path.join(self.output_dir, entry["path"])
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read(), os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+
+
+class StreamingIngestor:
+    """
+    Étage d'ingestion en continu: pages extraites -> découpage -> embeddings -> base de vecteurs.
+    Les pages passent par une file bornée (l'étage amont attend quand elle est pleine) et sont
+    ajoutées par micro-lots de 'micro_batch' pages ou toutes les 'max_latency' secondes.
+    Les embeddings sont calculés hors de la boucle d'événements, et une page est interrogeable
+    (dans ce processus) dès la fin de son lot; l'index est enregistré toutes les 'save_interval'
+    secondes pour les autres processus (après un arrêt entre deux enregistrements, le store
+    recalcule au chargement les morceaux absents de l'index).
+    """
+
+    def __init__(self, store: PersistentFaissStore, queue_size: int = 256, micro_batch: int = 32,
+                 max_latency: float = 1.0, save_interval: float = 10.0):
+        self.store = store
+        self.micro_batch = micro_batch
+        self.max_latency = max_latency
+        self.save_interval = save_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.pages = self.unchanged = self.chunks_added = self.chunks_removed = self.errors = 0
+        self.save_errors = 0
+        # Délai entre l'écriture de la page par le crawler et son ajout à la base
+        self.latencies: List[float] = []
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, url: str, markdown: str, written_at: Optional[float] = None, **metadata: Any):
+        """Ajoute une page (attend si la file est pleine); 'written_at' vaut l'instant présent par défaut"""
+        await self.queue.put((url, markdown, written_at or time.time(), metadata))
+
+    async def close(self):
+        """Ajoute les pages en attente et enregistre l'index"""
+        if self._closed:
+            return
+        self._closed = True
+        await self.queue.put(None)
+        if self._task:
+            await self._task
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_save = loop.time()
+        closing = False
+        try:
+            while not closing:
+                item = await self.queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = loop.time() + self.max_latency
+                while len(batch) < self.micro_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    batch.append(item)
+
+                await self._ingest(batch)
+                if loop.time() - last_save >= self.save_interval:
+                    await self._save()
+                    last_save = loop.time()
+        finally:
+            await self._save()
+
+    async def _save(self):
+        # Une erreur d'enregistrement ne doit pas arrêter l'étage (submit() attendrait indéfiniment):
+        # l'index reste modifié en mémoire et sera de nouveau enregistré à la prochaine échéance
+        try:
+            await asyncio.to_thread(self.store.save)
+        except Exception as e:
+            self.save_errors += 1
+            print(f"Erreur d'enregistrement de l'index: {e}")
+
+    async def _ingest(self, batch: List[tuple]):
+        # La dernière version d'une URL dans le lot fait foi
+        documents, metadatas, written = {}, {}, {}
+        for url, markdown, written_at, metadata in batch:
+            documents[url] = markdown
+            metadatas[url] = {"url": url, **metadata}
+            written[url] = written_at
+        try:
+            stats = await asyncio.to_thread(self.store.upsert_documents, documents, metadatas)
+        except Exception as e:
+            self.errors += len(documents)
+            print(f"Erreur d'ingestion ({len(documents)} pages): {e}")
+            return
+        now = time.time()
+        self.pages += stats["documents"]
+        self.unchanged += len(documents) - stats["documents"]
+        self.chunks_added += stats["added"]
+        self.chunks_removed += stats["removed"]
+        self.latencies.extend(now - written_at for written_at in written.values())
+
+    def print_summary(self):
+        print(f"  - Pages ingérées: {self.pages} ({self.unchanged} inchangées, {self.errors} erreurs)")
+        print(f"  - Morceaux: {self.chunks_added} ajoutés, {self.chunks_removed} retirés, {len(self.store)} au total")
+        if self.save_errors:
+            print(f"  - Échecs d'enregistrement de l'index: {self.save_errors}")
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            print(f"  - Délai écriture -> interrogeable: médiane {percentile(latencies, 50):.2f}s, "
+                  f"p95 {percentile(latencies, 95):.2f}s")
+
+
+def _index_dirs(output_dir: str) -> List[str]:
+    """Dossiers de sortie à suivre: le dossier lui-même et ceux des workers (extraction répartie)"""
+    candidates = [output_dir] + sorted(glob.glob(os.path.join(output_dir, "worker-*")))
+    return [d for d in candidates if os.path.isdir(d)]
+
+
+async def ingest_crawl_output(output_dir: str, store: PersistentFaissStore, follow: bool = True,
+                              poll_interval: float = 1.0, **ingestor_options: Any) -> StreamingIngestor:
+    """
+    Ingère les pages écrites par le crawler dans 'output_dir' (et ses dossiers worker-*).
+    Avec 'follow', l'index est suivi jusqu'à interruption; sinon, seules les pages déjà écrites sont ingérées.
+    """
+    tailers: Dict[str, IndexTailer] = {}
+    async with StreamingIngestor(store, **ingestor_options) as ingestor:
+        while True:
+            for directory in _index_dirs(output_dir):
+                if directory not in tailers:
+                    tailers[directory] = IndexTailer(directory)
+            found = 0
+            for tailer in tailers.values():
+                for entry in await asyncio.to_thread(tailer.read_new):
+                    loaded = await asyncio.to_thread(tailer.load, entry)
+                    if loaded is None:
+                        continue
+                    markdown, written_at = loaded
+                    await ingestor.submit(entry["url"], markdown, written_at, sha256=entry["sha256"])
+                    found += 1
+            if not follow:
+                break
+            if not found:
+                await asyncio.sleep(poll_interval)
+    return ingestor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion en continu des pages extraites dans la base de vecteurs")
+    parser.add_argument("output_dir", help="Dossier de sortie du crawler (mode 'files')")
+    parser.add_argument("--index-dir", default="faiss_index")
+    parser.add_argument("--follow", action="store_true", help="Suit l'index du crawler jusqu'à Ctrl+C")
+    parser.add_argument("--micro-batch", type=int, default=32)
+    parser.add_argument("--max-latency", type=float, default=1.0)
+    parser.add_argument("--save-interval", type=float, default=10.0)
+    args = parser.parse_args()
+
+    embeddings = CachedEmbeddings(
+        BatchedEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2", batch_size=64),
+        EmbeddingCache("embedding_cache/embeddings.db"),
+    )
+    store = PersistentFaissStore(args.index_dir, embeddings, markdown_splitter())
+    started = time.perf_counter()
+    try:
+        ingestor = asyncio.run(ingest_crawl_output(
+            args.output_dir, store, follow=args.follow, micro_batch=args.micro_batch,
+            max_latency=args.max_latency, save_interval=args.save_interval,
+        ))
+        print(f"\nIngestion terminée en {time.perf_counter() - started:.1f}s:")
+        ingestor.print_summary()
+    except KeyboardInterrupt:
+        print("\nIngestion interrompue")
+    finally:
+        store.close()
+        embeddings.embeddings.close()
+
+
+if __name__ == "__main__":
+    main()
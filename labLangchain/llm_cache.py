@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.load import dumps, loads
+from langchain.schema import BaseCache, Generation
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Forme canonique d'un texte: Unicode NFKC, minuscules, espaces réduits"""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).lower()).strip()
+
+
+def prompt_parts(prompt: str) -> Tuple[str, str]:
+    """
+    (contexte, dernier message) normalisés d'un prompt. Pour un modèle de chat, LangChain passe
+    la liste des messages sérialisée en JSON: le contexte regroupe les messages précédents (système,
+    historique), seul le dernier message est comparé par similarité.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return "", normalize_text(prompt)
+    if not isinstance(messages, list) or not messages:
+        return "", normalize_text(prompt)
+    texts = []
+    for message in messages:
+        if isinstance(message, dict) and "kwargs" in message:
+            role = message.get("id", ["message"])[-1]
+            content = message["kwargs"].get("content", "")
+            texts.append(f"{role}: {normalize_text(content if isinstance(content, str) else json.dumps(content))}")
+        else:
+            texts.append(normalize_text(json.dumps(message, ensure_ascii=False)))
+    return "\n".join(texts[:-1]), texts[-1]
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def _usage_tokens(generations: Sequence[Generation]) -> int:
+    total = 0
+    for generation in generations:
+        message = getattr(generation, "message", None)
+        usage = getattr(message, "usage_metadata", None) or {}
+        total += usage.get("total_tokens", 0) if isinstance(usage, dict) else 0
+    return total
+
+
+class SemanticLLMCache(BaseCache):
+    """
+    Cache des réponses d'un LLM à deux niveaux, à installer avec set_llm_cache() ou ChatGroq(cache=...):
+    - exact: prompt normalisé + configuration du modèle (nom, température, max_tokens...);
+    - sémantique (si 'embeddings' est fourni): même configuration, même contexte (messages précédents)
+      et dernier message de similarité cosinus >= 'threshold' avec une question déjà posée.
+    Les entrées expirent après 'ttl' secondes et les moins récemment utilisées sont évincées au-delà
+    de 'max_entries'. Stockage SQLite; latence et jetons économisés comptabilisés à chaque succès.
+    Attention: un prompt issu d'un long template (instructions fixes + courte variable) est proche
+    de tous les autres; pour ces chaînes, préférer le cache exact seul (embeddings=None).
+    """
+
+    def __init__(self, path: str = "llm_cache/responses.db", embeddings: Any = None, threshold: float = 0.95,
+                 ttl: Optional[float] = 24 * 3600, max_entries: int = 10_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, llm_hash TEXT NOT NULL, context_hash TEXT NOT NULL,"
+            " vector BLOB, generations TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL,"
+            " latency REAL NOT NULL DEFAULT 0, tokens INTEGER NOT NULL DEFAULT 0, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_group ON responses (llm_hash, context_hash)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        # Vecteurs en mémoire par (configuration, contexte), chargés au premier accès
+        self._groups: Dict[Tuple[str, str], Tuple[List[str], np.ndarray]] = {}
+        # Début des appels manqués et vecteur de la question (la latence du LLM est mesurée
+        # entre lookup() et update())
+        self._pending: Dict[str, Tuple[float, Optional[np.ndarray]]] = {}
+        self.exact_hits = self.semantic_hits = self.misses = 0
+        self.saved_seconds = 0.0
+        self.saved_tokens = 0
+
+    # --- Interface BaseCache ------------------------------------------------------------------
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[List[Generation]]:
+        context, last = prompt_parts(prompt)
+        llm_hash = _digest(llm_string)
+        key = _digest(llm_hash, context, last)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            row = self.conn.execute("SELECT generations FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.exact_hits += 1
+                return self._hit(key, row[0], now)
+
+        vector = None
+        if self.embeddings is not None:
+            vector = self._embed(last)
+            with self._lock:
+                match = self._nearest(llm_hash, _digest(context), vector)
+                if match is not None:
+                    row = self.conn.execute("SELECT generations FROM responses WHERE key = ?", (match,)).fetchone()
+                    if row is not None:
+                        self.semantic_hits += 1
+                        return self._hit(match, row[0], now)
+
+        with self._lock:
+            self.misses += 1
+            self._pending[key] = (time.perf_counter(), vector)
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        context, last = prompt_parts(prompt)
+        llm_hash = _digest(llm_string)
+        context_hash = _digest(context)
+        key = _digest(llm_hash, context, last)
+        now = time.time()
+        with self._lock:
+            started, vector = self._pending.pop(key, (None, None))
+        latency = time.perf_counter() - started if started is not None else 0.0
+        if vector is None and self.embeddings is not None:
+            vector = self._embed(last)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, llm_hash, context_hash, vector, generations, created_at,"
+                " last_used, latency, tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, llm_hash, context_hash, vector.tobytes() if vector is not None else None,
+                 json.dumps([dumps(generation) for generation in return_val]), now, now, latency,
+                 _usage_tokens(return_val)),
+            )
+            self._evict()
+            self.conn.commit()
+            self._groups.pop((llm_hash, context_hash), None)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+            self._groups.clear()
+
+    # --- Interne ------------------------------------------------------------------------------
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hit(self, key: str, payload: str, now: float) -> List[Generation]:
+        latency, tokens = self.conn.execute("SELECT latency, tokens FROM responses WHERE key = ?", (key,)).fetchone()
+        self.saved_seconds += latency
+        self.saved_tokens += tokens
+        self.conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        self.conn.commit()
+        return [loads(item) for item in json.loads(payload)]
+
+    def _nearest(self, llm_hash: str, context_hash: str, vector: np.ndarray) -> Optional[str]:
+        group = self._groups.get((llm_hash, context_hash))
+        if group is None:
+            rows = self.conn.execute(
+                "SELECT key, vector FROM responses WHERE llm_hash = ? AND context_hash = ? AND vector IS NOT NULL",
+                (llm_hash, context_hash),
+            ).fetchall()
+            keys = [row[0] for row in rows]
+            matrix = (np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows
+                      else np.zeros((0, len(vector)), dtype=np.float32))
+            group = self._groups[(llm_hash, context_hash)] = (keys, matrix)
+        keys, matrix = group
+        if not keys or matrix.shape[1] != len(vector):
+            return None
+        similarities = matrix @ vector
+        best = int(np.argmax(similarities))
+        return keys[best] if similarities[best] >= self.threshold else None
+
+    def _expire(self, now: float):
+        if self.ttl is None:
+            return
+        expired = self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        if expired:
+            self.conn.commit()
+            self._groups.clear()
+
+    def _evict(self):
+        overflow = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self._groups.clear()
+
+    # --- Statistiques -------------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "lookups": lookups, "exact_hits": self.exact_hits, "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3), "saved_tokens": self.saved_tokens, "entries": entries,
+        }
+
+    def print_summary(self):
+        stats = self.stats()
+        print(f"Cache LLM: {stats['lookups']} requêtes, {stats['exact_hits']} succès exacts, "
+              f"{stats['semantic_hits']} succès sémantiques ({stats['hit_rate']:.0%}), "
+              f"{stats['saved_seconds']:.1f}s et {stats['saved_tokens']} jetons économisés, "
+              f"{stats['entries']} entrées")
+
+    def close(self):
+        self.conn.close()
+
+
+class _DemoEmbeddings:
+    """Embeddings « sac de mots » hachés (démonstration sans modèle à télécharger)"""
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(256, dtype=np.float32)
+        for word in re.findall(r"\w+", normalize_text(text)):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % 256] += 1.0
+        return vector.tolist()
+
+
+def main():
+    # Démonstration avec un faux modèle de chat local (1 s par réponse): aucune clé d'API nécessaire
+    import tempfile
+
+    from langchain.chat_models.fake import FakeListChatModel
+    from langchain.globals import set_llm_cache
+
+    path = os.path.join(tempfile.mkdtemp(), "responses.db")
+    cache = SemanticLLMCache(path, embeddings=_DemoEmbeddings(), threshold=0.9)
+    set_llm_cache(cache)
+    llm = FakeListChatModel(responses=[f"Réponse n°{i}" for i in range(10)], sleep=1.0)
+
+    questions = [
+        "Qu'est-ce que LangChain ?",
+        "qu'est-ce   que LANGCHAIN ?",        # identique une fois normalisée: succès exact
+        "Qu'est-ce que LangChain exactement ?",  # proche: succès sémantique
+        "Quelles sont les 7 merveilles du monde ?",
+        "Qu'est-ce que LangChain ?",
+    ]
+    for question in questions:
+        start = time.perf_counter()
+        answer = llm.invoke(question).content
+        print(f"{time.perf_counter() - start:6.3f}s  {question!r} -> {answer}")
+    cache.print_summary()
+    set_llm_cache(None)
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
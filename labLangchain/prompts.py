@@ -1,7 +1,15 @@
 from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
+from langchain.globals import set_llm_cache
+from llm_cache import SemanticLLMCache
 import os
 
+# Cache des réponses (SQLite): un prompt déjà envoyé avec la même configuration n'est pas renvoyé au LLM.
+# Cache exact seulement: deux prompts du même template ne diffèrent que par leurs variables
+# ("italienne"/"française") et seraient jugés similaires
+llm_cache = SemanticLLMCache("llm_cache/responses.db")
+set_llm_cache(llm_cache)
+
 # Option 1: Set the API key as an environment variable
 # os.environ["GROQ_API_KEY"] = "your-api-key-here"
 
@@ -36,4 +44,6 @@ response = chain.invoke({
 
 print("Méthode 2 - Prompt: Listez 5 idées de plats pour la cuisine française")
 print("Réponse:")
-print(response.content)
\ No newline at end of file
+print(response.content)
+
+llm_cache.print_summary()
\ No newline at end of file
@@ -1,7 +1,19 @@
 from langchain_groq import ChatGroq
 from langchain.schema import HumanMessage, SystemMessage
+from langchain.globals import set_llm_cache
+from llm_cache import SemanticLLMCache
+from embedding_cache import BatchedEmbeddings
 import os
 
+# Cache des réponses à deux niveaux: prompt identique (une fois normalisé), puis question
+# de sens très proche (similarité cosinus des embeddings >= 0.95) avec le même message système
+llm_cache = SemanticLLMCache(
+    "llm_cache/responses.db",
+    embeddings=BatchedEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2", workers=1),
+    threshold=0.95,
+)
+set_llm_cache(llm_cache)
+
 # Option 1: Set the API key as an environment variable
 # os.environ["GROQ_API_KEY"] = "your-api-key-here"
 
@@ -33,4 +45,6 @@ response = chat_model.invoke(messages)
 
 print("\nQuestion:", question)
 print("\nRéponse détaillée:")
-print(response.content)
\ No newline at end of file
+print(response.content)
+
+llm_cache.print_summary()
\ No newline at end of file
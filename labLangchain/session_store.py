@@ -0,0 +1,260 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import lmdb
+except ImportError:
+    lmdb = None
+
+from summary_memory import SummaryBufferMemory
+
+FORMAT_VERSION = 1
+
+
+def encode_state(state: Dict[str, Any]) -> bytes:
+    """État d'une conversation -> octets: JSON compact (octets en base64) compressé par zlib"""
+    def default(value: Any) -> Any:
+        if isinstance(value, bytes):
+            return {"$b": base64.b64encode(value).decode("ascii")}
+        raise TypeError(f"Type non sérialisable: {type(value).__name__}")
+
+    payload = json.dumps(state, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+    return bytes([FORMAT_VERSION]) + zlib.compress(payload, 6)
+
+
+def decode_state(data: bytes) -> Dict[str, Any]:
+    if data[0] != FORMAT_VERSION:
+        raise ValueError(f"Format de session inconnu: {data[0]}")
+
+    def hook(value: Dict[str, Any]) -> Any:
+        return base64.b64decode(value["$b"]) if len(value) == 1 and "$b" in value else value
+
+    return json.loads(zlib.decompress(data[1:]).decode("utf-8"), object_hook=hook)
+
+
+class SessionBackend:
+    """Stockage des sessions (identifiant -> octets); à implémenter pour un autre support"""
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, data: bytes):
+        raise NotImplementedError
+
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+    def session_ids(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteSessionBackend(SessionBackend):
+    """Sessions dans une table SQLite (WAL: lectures concurrentes pendant les écritures)"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self.conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id: str, data: bytes):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, data, time.time()))
+            self.conn.commit()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self.conn.commit()
+
+    def session_ids(self) -> Iterator[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT id FROM sessions").fetchall()
+        return iter([row[0] for row in rows])
+
+    def close(self):
+        self.conn.close()
+
+
+class LmdbSessionBackend(SessionBackend):
+    """Sessions dans une base LMDB (clé-valeur en mmap, lectures sans verrou); nécessite 'lmdb'"""
+
+    def __init__(self, path: str, map_size: int = 1 << 30):
+        if lmdb is None:
+            raise ImportError("lmdb n'est pas installé (pip install lmdb): utilisez SqliteSessionBackend")
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(path, map_size=map_size)
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self.env.begin() as txn:
+            data = txn.get(session_id.encode("utf-8"))
+        return bytes(data) if data is not None else None
+
+    def save(self, session_id: str, data: bytes):
+        with self.env.begin(write=True) as txn:
+            txn.put(session_id.encode("utf-8"), data)
+
+    def delete(self, session_id: str):
+        with self.env.begin(write=True) as txn:
+            txn.delete(session_id.encode("utf-8"))
+
+    def session_ids(self) -> Iterator[str]:
+        with self.env.begin() as txn:
+            keys = [key.decode("utf-8") for key in txn.cursor().iternext(values=False)]
+        return iter(keys)
+
+    def close(self):
+        self.env.close()
+
+
+class SessionStore:
+    """
+    Mémoires de conversation par session, chargées à la demande depuis 'backend'.
+    Au plus 'max_active' sessions restent en mémoire: la moins récemment utilisée est évincée et
+    enregistrée en arrière-plan (après la fin de son résumé en cours, sans bloquer l'appelant).
+    Les résumés de toutes les sessions passent par un exécuteur partagé de 'summary_workers' threads
+    (au plus un résumé en cours par session).
+    """
+
+    def __init__(self, backend: SessionBackend, memory_factory: Callable[[], SummaryBufferMemory],
+                 max_active: int = 1000, summary_workers: int = 4):
+        self.backend = backend
+        self.memory_factory = memory_factory
+        self.max_active = max_active
+        self.executor = ThreadPoolExecutor(max_workers=summary_workers)
+        # Enregistrement des sessions évincées: exécuteur distinct (il attend la fin des résumés)
+        self._persist_executor = ThreadPoolExecutor(max_workers=summary_workers)
+        self._active: "OrderedDict[str, SummaryBufferMemory]" = OrderedDict()
+        # Sessions évincées en cours d'enregistrement, avec le numéro de leur éviction
+        # (retirées si redemandées: la prochaine éviction les enregistrera de nouveau)
+        self._evicting: Dict[str, Tuple[SummaryBufferMemory, int]] = {}
+        # Version des sessions supprimées (tombstones): les mémoires d'une version antérieure
+        # (ex: tenues par un échange en cours pendant delete()) ne sont plus enregistrées
+        self._epochs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # Sérialise instantané + écriture: le dernier état enregistré d'une session est toujours le plus récent
+        self._save_lock = threading.Lock()
+        self.loads = self.evictions = 0
+
+    def get(self, session_id: str) -> SummaryBufferMemory:
+        """Mémoire de la session (créée vide si elle n'existe pas encore)"""
+        while True:
+            with self._lock:
+                memory = self._active.get(session_id)
+                if memory is not None:
+                    self._active.move_to_end(session_id)
+                    return memory
+                if session_id in self._evicting:
+                    # Reprise pendant son enregistrement
+                    memory, _ = self._evicting.pop(session_id)
+                    self._active[session_id] = memory
+                    evicted = self._pop_overflow()
+                    break
+                epoch = self._epochs.get(session_id, 0)
+            data = self.backend.load(session_id)
+            memory = self.memory_factory()
+            memory.executor = self.executor
+            memory.session_epoch = epoch
+            if data is not None:
+                memory.load_state(decode_state(data))
+                self.loads += 1
+            with self._lock:
+                # Une autre requête a pu charger la même session entre-temps
+                existing = self._active.get(session_id)
+                if existing is not None:
+                    self._active.move_to_end(session_id)
+                    return existing
+                # Session supprimée pendant le chargement: l'état lu est peut-être obsolète
+                if self._epochs.get(session_id, 0) != epoch:
+                    continue
+                self._active[session_id] = memory
+                evicted = self._pop_overflow()
+                break
+        for evicted_id, evicted_memory, eviction in evicted:
+            self._persist_executor.submit(self._persist, evicted_id, evicted_memory, eviction)
+        return memory
+
+    def _pop_overflow(self) -> List[tuple]:
+        evicted = []
+        while len(self._active) > self.max_active:
+            session_id, memory = self._active.popitem(last=False)
+            self.evictions += 1
+            self._evicting[session_id] = (memory, self.evictions)
+            evicted.append((session_id, memory, self.evictions))
+        return evicted
+
+    def _write(self, session_id: str, memory: SummaryBufferMemory):
+        with self._save_lock:
+            # Vérifié sous le verrou d'écriture: delete() ne peut pas passer entre le test et l'écriture
+            if memory.session_epoch != self._epochs.get(session_id, 0):
+                return
+            self.backend.save(session_id, encode_state(memory.to_state()))
+
+    def _persist(self, session_id: str, memory: SummaryBufferMemory, eviction: Optional[int] = None):
+        # Le résumé en cours doit être terminé pour être enregistré avec la session
+        try:
+            memory.wait()
+            with self._lock:
+                # Session reprise ou supprimée pendant l'éviction: rien à enregistrer pour celle-ci
+                if eviction is not None and self._evicting.get(session_id, (None, None))[1] != eviction:
+                    return
+            self._write(session_id, memory)
+        except Exception as e:
+            print(f"Erreur d'enregistrement de la session {session_id}: {e}")
+        finally:
+            with self._lock:
+                if eviction is not None and self._evicting.get(session_id, (None, None))[1] == eviction:
+                    del self._evicting[session_id]
+
+    def save(self, session_id: str, memory: Optional[SummaryBufferMemory] = None):
+        """
+        Enregistre la session (après chaque échange); le résumé en cours sera repris à l'éviction.
+        Passer la mémoire utilisée pour l'échange: elle a pu être évincée pendant l'appel au LLM.
+        """
+        if memory is None:
+            with self._lock:
+                memory = self._active.get(session_id) or self._evicting.get(session_id, (None, None))[0]
+        if memory is not None:
+            self._write(session_id, memory)
+
+    def delete(self, session_id: str):
+        """Supprime la session; un enregistrement en cours ou ultérieur de son ancienne mémoire est ignoré"""
+        with self._save_lock:
+            with self._lock:
+                self._active.pop(session_id, None)
+                self._evicting.pop(session_id, None)
+                self._epochs[session_id] = self._epochs.get(session_id, 0) + 1
+            self.backend.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": len(self._active), "loads": self.loads, "evictions": self.evictions}
+
+    def close(self):
+        """Enregistre toutes les sessions actives et ferme le stockage"""
+        with self._lock:
+            active, self._active = list(self._active.items()), OrderedDict()
+        for session_id, memory in active:
+            self._persist(session_id, memory)
+        self._persist_executor.shutdown(wait=True)
+        self.executor.shutdown(wait=True)
+        self.backend.close()
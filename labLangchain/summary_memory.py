@@ -0,0 +1,241 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import AIMessage, BaseMemory, HumanMessage, SystemMessage
+
+SUMMARY_PROMPT = """Résumez progressivement la conversation: complétez le résumé existant avec les nouveaux
+échanges, en {max_words} mots au plus. Gardez les faits utiles pour la suite (noms, préférences,
+décisions, questions en suspens).
+
+Résumé existant:
+{summary}
+
+Nouveaux échanges:
+{new_lines}
+
+Nouveau résumé:"""
+
+
+def approximate_tokens(text: str) -> int:
+    """Estimation sans tokenizer: ~4 caractères par jeton"""
+    return len(text) // 4 + 1
+
+
+class SummaryBufferMemory(BaseMemory):
+    """
+    Mémoire de conversation à budget de jetons, à taille de prompt constante:
+    - les derniers échanges sont gardés tels quels tant qu'ils tiennent dans 'max_token_limit' jetons;
+    - les échanges plus anciens sont repliés dans un résumé, calculé par 'llm' dans un thread
+      après save_context() (hors du chemin critique: la réponse est déjà retournée);
+    - avec 'embeddings', les 'k_retrieved' anciens échanges les plus proches de la question
+      sont rappelés tels quels (tronqués à 'recall_token_limit' jetons chacun).
+    Les échanges en attente de résumé restent dans le prompt tels quels jusqu'à la fin du résumé.
+    """
+
+    llm: Any
+    memory_key: str = "chat_history"
+    input_key: Optional[str] = None
+    output_key: Optional[str] = None
+    return_messages: bool = True
+    human_prefix: str = "Humain"
+    ai_prefix: str = "Assistant"
+    max_token_limit: int = 1000
+    summary_max_words: int = 150
+    embeddings: Any = None
+    k_retrieved: int = 2
+    recall_token_limit: int = 200
+    token_counter: Callable[[str], int] = approximate_tokens
+
+    # État (fenêtre, résumé, échanges archivés et leurs vecteurs)
+    window: List[Tuple[str, str]] = []
+    summary: str = ""
+    archived: List[Tuple[str, str]] = []
+    archived_vectors: Any = None
+    last_history_tokens: int = 0
+    pending: List[Tuple[str, str]] = []
+    lock: Any = None
+    # Exécuteur des résumés: propre à la mémoire, ou partagé entre sessions (voir session_store)
+    executor: Any = None
+    future: Any = None
+    folding: bool = False
+    # Version de la session propriétaire (voir session_store): une mémoire d'une session supprimée
+    # depuis n'est plus enregistrée
+    session_epoch: int = 0
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    def _lock(self) -> threading.RLock:
+        if self.lock is None:
+            self.lock = threading.RLock()
+        return self.lock
+
+    def _input(self, inputs: Dict[str, Any]) -> str:
+        if self.input_key:
+            return str(inputs[self.input_key])
+        keys = [key for key in inputs if key not in (self.memory_key, "stop")]
+        if len(keys) != 1:
+            raise ValueError(f"Une seule entrée attendue (précisez input_key), reçu: {keys}")
+        return str(inputs[keys[0]])
+
+    def _output(self, outputs: Dict[str, Any]) -> str:
+        if self.output_key:
+            return str(outputs[self.output_key])
+        if len(outputs) == 1:
+            return str(next(iter(outputs.values())))
+        if "answer" in outputs:
+            return str(outputs["answer"])
+        raise ValueError(f"Une seule sortie attendue (précisez output_key), reçu: {list(outputs)}")
+
+    def _turn_text(self, turn: Tuple[str, str]) -> str:
+        return f"{self.human_prefix}: {turn[0]}\n{self.ai_prefix}: {turn[1]}"
+
+    # --- Lecture ------------------------------------------------------------------------------
+
+    def _recall(self, question: str) -> List[Tuple[str, str]]:
+        """Anciens échanges (hors fenêtre) les plus proches de la question"""
+        if self.embeddings is None or self.archived_vectors is None or not question:
+            return []
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        vector /= np.linalg.norm(vector) or 1.0
+        with self._lock():
+            similarities = self.archived_vectors @ vector
+            best = np.argsort(-similarities)[:self.k_retrieved]
+            return [self.archived[i] for i in sorted(best)]
+
+    def _truncate(self, text: str) -> str:
+        if self.token_counter(text) <= self.recall_token_limit:
+            return text
+        return text[: self.recall_token_limit * 4] + "…"
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        question = self._input(inputs) if inputs else ""
+        recalled = self._recall(question)
+        with self._lock():
+            # Échanges sortis de la fenêtre mais pas encore résumés: gardés tels quels
+            summary, window = self.summary, self.pending + self.window
+
+        messages = []
+        if summary:
+            messages.append(SystemMessage(content=f"Résumé de la conversation: {summary}"))
+        if recalled:
+            lines = "\n".join(self._truncate(self._turn_text(turn)) for turn in recalled)
+            messages.append(SystemMessage(content=f"Échanges antérieurs pertinents:\n{lines}"))
+        for human, ai in window:
+            messages.append(HumanMessage(content=human))
+            messages.append(AIMessage(content=ai))
+
+        self.last_history_tokens = sum(self.token_counter(message.content) for message in messages)
+        if self.return_messages:
+            return {self.memory_key: messages}
+        prefixes = {"system": "Système", "human": self.human_prefix, "ai": self.ai_prefix}
+        return {self.memory_key: "\n".join(f"{prefixes[m.type]}: {m.content}" for m in messages)}
+
+    # --- Écriture -----------------------------------------------------------------------------
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        turn = (self._input(inputs), self._output(outputs))
+        with self._lock():
+            self.window.append(turn)
+            # Les échanges les plus anciens sortent de la fenêtre (le dernier y reste toujours)
+            while len(self.window) > 1 and sum(self.token_counter(self._turn_text(t)) for t in self.window) \
+                    > self.max_token_limit:
+                self.pending.append(self.window.pop(0))
+            # Un seul résumé en cours par conversation: il reprend les échanges arrivés entre-temps
+            if not self.pending or self.folding:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+            self.folding = True
+            self.future = self.executor.submit(self._fold_loop)
+
+    def _fold_loop(self):
+        while True:
+            with self._lock():
+                if not self.pending:
+                    self.folding = False
+                    return
+            if not self._fold_pending():
+                with self._lock():
+                    self.folding = False
+                return
+
+    def _fold_pending(self) -> bool:
+        # Les échanges restent dans 'pending' (et dans le prompt) jusqu'à ce que le résumé les contienne
+        with self._lock():
+            turns = list(self.pending)
+            summary = self.summary
+        new_lines = "\n".join(self._turn_text(turn) for turn in turns)
+        try:
+            response = self.llm.invoke(SUMMARY_PROMPT.format(
+                max_words=self.summary_max_words, summary=summary or "(aucun)", new_lines=new_lines
+            ))
+            new_summary = getattr(response, "content", response).strip()
+            vectors = None
+            if self.embeddings is not None:
+                vectors = np.asarray(self.embeddings.embed_documents([self._turn_text(t) for t in turns]),
+                                     dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        except Exception as e:
+            # Nouvel essai au prochain échange
+            print(f"Erreur de résumé de la conversation: {e}")
+            return False
+        with self._lock():
+            del self.pending[:len(turns)]
+            self.summary = new_summary
+            if vectors is not None:
+                self.archived.extend(turns)
+                self.archived_vectors = vectors if self.archived_vectors is None \
+                    else np.vstack([self.archived_vectors, vectors])
+        return True
+
+    def wait(self):
+        """Attend la fin du résumé en cours"""
+        future: Optional[Future] = self.future
+        if future is not None:
+            future.result()
+
+    def clear(self) -> None:
+        self.wait()
+        with self._lock():
+            self.window, self.pending, self.archived = [], [], []
+            self.summary = ""
+            self.archived_vectors = None
+
+    # --- Persistance --------------------------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        """État de la conversation (sérialisable en JSON; vecteurs en float16)"""
+        with self._lock():
+            vectors = self.archived_vectors
+            return {
+                "window": [list(turn) for turn in self.window],
+                "pending": [list(turn) for turn in self.pending],
+                "summary": self.summary,
+                "archived": [list(turn) for turn in self.archived],
+                "vectors": None if vectors is None else {
+                    "shape": list(vectors.shape), "data": vectors.astype(np.float16).tobytes(),
+                },
+            }
+
+    def load_state(self, state: Dict[str, Any]):
+        with self._lock():
+            self.window = [tuple(turn) for turn in state.get("window", [])]
+            self.pending = [tuple(turn) for turn in state.get("pending", [])]
+            self.summary = state.get("summary", "")
+            self.archived = [tuple(turn) for turn in state.get("archived", [])]
+            vectors = state.get("vectors")
+            self.archived_vectors = None if vectors is None else \
+                np.frombuffer(vectors["data"], dtype=np.float16).astype(np.float32).reshape(vectors["shape"])
+
+    def close(self):
+        """Arrête l'exécuteur des résumés (mémoire utilisée seule, pas avec un exécuteur partagé)"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
@@ -0,0 +1,458 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain.docstore.base import Docstore
+from langchain.schema import Document
+from langchain.vectorstores import FAISS
+
+from ann_index import build_index, set_search_params
+
+# Lecture en mémoire projetée (mmap) si la version de faiss le permet
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP", 0) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+
+
+def text_hash(text: str) -> str:
+    """Empreinte du contenu d'un morceau (clé de réutilisation des embeddings)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(doc_id: str, text: str, occurrence: int = 0) -> int:
+    """Identifiant 63 bits stable d'un morceau (document, contenu, rang parmi les morceaux identiques)"""
+    digest = hashlib.blake2b(f"{doc_id}\0{occurrence}\0{text}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class SqliteDocstore(Docstore):
+    """Docstore LangChain lu à la demande dans SQLite (aucun chargement complet au démarrage)"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def search(self, search: Any):
+        row = self.conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (int(search),)).fetchone()
+        if row is None:
+            # Vecteur encore présent dans un index sans suppression (HNSW): écarté par _StoreFAISS
+            return Document(page_content="", metadata={"_stale": True})
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+
+class _IdMapping:
+    """
+    Correspondance position -> identifiant attendue par le FAISS de LangChain.
+    L'index (IndexIDMap2) retourne déjà les identifiants des morceaux: la correspondance est l'identité.
+    """
+
+    def __init__(self, store: "PersistentFaissStore"):
+        self.store = store
+
+    def __getitem__(self, i: int) -> int:
+        return int(i)
+
+    def __contains__(self, i: Any) -> bool:
+        return self.store.conn.execute("SELECT 1 FROM chunks WHERE id = ?", (int(i),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.store.index.ntotal if self.store.index is not None else 0
+
+
+class _StoreFAISS(FAISS):
+    """FAISS de LangChain qui lit toujours l'index courant du store (rechargé après une modification)"""
+
+    def __init__(self, store: "PersistentFaissStore"):
+        self._store = store
+        super().__init__(store.embeddings, store.index, SqliteDocstore(store.conn), _IdMapping(store))
+
+    @property
+    def index(self):
+        return self._store.index
+
+    @index.setter
+    def index(self, value):
+        pass
+
+    # Les recherches sont sérialisées avec les mises à jour (ingestion en continu dans un autre thread)
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, filter=None, fetch_k: int = 20,
+                                               **kwargs):
+        if self._store.stale:
+            # Des vecteurs retirés peuvent sortir parmi les plus proches: on en demande plus et on les écarte
+            user_filter = self._create_filter_func(filter) if filter is not None else None
+            filter = lambda metadata: not metadata.get("_stale") and (user_filter is None or user_filter(metadata))
+            fetch_k = max(fetch_k, k + min(self._store.stale, 100))
+        with self._store.lock:
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+
+    def max_marginal_relevance_search_with_score_by_vector(self, *args, **kwargs):
+        with self._store.lock:
+            return super().max_marginal_relevance_search_with_score_by_vector(*args, **kwargs)
+
+
+class PersistentFaissStore:
+    """
+    Base de vecteurs FAISS persistante avec mises à jour incrémentales.
+    - index.faiss: IndexIDMap2 (identifiants = empreintes des morceaux), chargé en mmap; exact (Flat)
+      par défaut, ou approché (IVF/HNSW, quantifié PQ/SQ8) après rebuild_index()
+    - chunks.db: manifeste (document -> empreinte, morceau -> empreinte) et textes des morceaux
+    Au démarrage, seuls les documents dont l'empreinte a changé sont redécoupés; seuls leurs morceaux
+    nouveaux ou modifiés sont calculés et ajoutés, et les morceaux disparus sont retirés de l'index.
+    Le manifeste est validé à chaque mise à jour, l'index seulement par save(): un numéro de version
+    (table 'meta') indique si l'index enregistré est à jour; sinon (arrêt entre les deux), il est
+    réaligné sur le manifeste au chargement.
+    Plusieurs processus peuvent partager le dossier (ex: ingest.py en continu et RAG.py): le manifeste
+    fait foi, save() réaligne l'index sur les modifications des autres avant de l'écrire, et refresh()
+    recharge l'index enregistré par un autre processus.
+    """
+
+    def __init__(self, index_dir: str, embeddings, text_splitter, batch_size: int = 4096,
+                 search_params: Optional[Dict[str, Any]] = None):
+        self.index_dir = index_dir
+        self.embeddings = embeddings
+        self.text_splitter = text_splitter
+        self.batch_size = batch_size
+        os.makedirs(index_dir, exist_ok=True)
+        self.index_path = os.path.join(index_dir, "index.faiss")
+
+        # Attente longue: un autre processus peut tenir le verrou d'écriture pendant qu'il enregistre l'index
+        self.conn = sqlite3.connect(os.path.join(index_dir, "chunks.db"), check_same_thread=False, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE déclenche aussi les triggers de suppression (index lexical, voir hybrid_search)
+        self.conn.execute("PRAGMA recursive_triggers=ON")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (doc_id TEXT PRIMARY KEY, hash TEXT NOT NULL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY, doc_id TEXT NOT NULL, hash TEXT NOT NULL,"
+            " text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+        self.index: Optional[faiss.Index] = None
+        # nprobe (IVF) / efSearch (HNSW) appliqués à l'index chargé
+        self.search_params = search_params
+        # Protège l'index et la base pendant une mise à jour (l'index faiss n'est pas thread-safe en écriture)
+        self.lock = threading.RLock()
+        self._read_only = False
+        self._dirty = False
+        # Vecteurs retirés de la base mais pas de l'index (index sans suppression), enregistrés avec l'index
+        self.stale = 0
+        # Version du manifeste reflétée par l'index en mémoire, et modifications faites depuis par ce processus
+        self._index_generation = 0
+        self._own_changes = 0
+        self._load_index()
+        self._reconcile()
+
+    def _load_index(self):
+        """Charge l'index enregistré; les modifications non enregistrées de l'index en mémoire sont perdues"""
+        # Version lue avant le fichier: si un autre processus enregistre entre les deux, l'index chargé
+        # est au moins aussi récent que la version retenue (save() réalignera au pire pour rien)
+        self._index_generation = int(self._meta("saved_generation") or 0)
+        self.stale = int(self._meta("stale") or 0)
+        self._own_changes = 0
+        self._dirty = False
+        self._read_only = False
+        self.index = None
+        if os.path.exists(self.index_path):
+            # Démarrage à coût quasi nul: l'index est projeté en mémoire, pas lu
+            try:
+                self.index = faiss.read_index(self.index_path, MMAP_FLAGS)
+                self._read_only = bool(MMAP_FLAGS)
+            except RuntimeError:
+                # Type d'index ou version de faiss sans support du mmap: lecture complète
+                self.index = faiss.read_index(self.index_path)
+            if self.search_params:
+                set_search_params(self.index, self.search_params)
+
+    # --- Cohérence index / manifeste ----------------------------------------------------------
+
+    def _meta(self, key: str) -> Any:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _bump_generation(self):
+        # Dans la transaction de la modification du manifeste
+        self.conn.execute(
+            "INSERT INTO meta VALUES ('generation', 1) ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+        self._own_changes += 1
+
+    def _reconcile(self):
+        """Réaligne l'index sur le manifeste s'il n'a pas été enregistré après la dernière modification"""
+        with self.lock:
+            saved = self._meta("saved_generation")
+            if saved is not None and saved == (self._meta("generation") or 0):
+                return
+            if saved is None and self.index is None and \
+                    self.conn.execute("SELECT 1 FROM chunks LIMIT 1").fetchone() is None:
+                return
+            missing, extra = self._align()
+            if missing or extra:
+                print(f"Index réaligné sur le manifeste: {missing} morceaux ajoutés, {extra} retirés")
+                self.save()
+            else:
+                self._mark_saved()
+
+    def _align(self) -> Tuple[int, int]:
+        """Ajoute à l'index les morceaux du manifeste absents et retire les autres; retourne leur nombre"""
+        with self.lock:
+            generation = self._meta("generation") or 0
+            chunk_ids = {row[0] for row in self.conn.execute("SELECT id FROM chunks")}
+            index_ids = set()
+            if self.index is not None:
+                index_ids = set(faiss.vector_to_array(self.index.id_map).tolist())
+            missing = sorted(chunk_ids - index_ids)
+            extra = sorted(index_ids - chunk_ids)
+            if missing:
+                rows = []
+                for start in range(0, len(missing), 500):
+                    part = missing[start:start + 500]
+                    rows.extend(self.conn.execute(
+                        f"SELECT id, text FROM chunks WHERE id IN ({','.join('?' for _ in part)})", part
+                    ))
+                vectors = self._embed([text for _, text in rows])
+                self._writable_index(vectors.shape[1]).add_with_ids(
+                    vectors, np.asarray([i for i, _ in rows], dtype="int64")
+                )
+                self._dirty = True
+            # Index sans suppression: le compte des vecteurs retirés est recalculé
+            self.stale = 0
+            self._remove_ids(extra)
+            self._index_generation = generation
+            self._own_changes = 0
+            return len(missing), len(extra)
+
+    def _mark_saved(self):
+        # L'index enregistré correspond à cette version du manifeste (et contient 'stale' vecteurs retirés)
+        generation = self._meta("generation") or 0
+        self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+            ("saved_generation", generation), ("stale", self.stale),
+        ])
+        self.conn.commit()
+        self._index_generation = generation
+        self._own_changes = 0
+
+    # --- Écriture -----------------------------------------------------------------------------
+
+    def _writable_index(self, dimension: int) -> faiss.Index:
+        if self.index is None:
+            self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        elif self._read_only:
+            # Un index projeté en lecture seule est rechargé en mémoire avant la première modification
+            self.index = faiss.read_index(self.index_path)
+            self._read_only = False
+            if self.search_params:
+                set_search_params(self.index, self.search_params)
+        return self.index
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        # Lots larges: l'objet embeddings les redécoupe (et les répartit sur ses processus)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + self.batch_size]))
+        return np.asarray(vectors, dtype="float32")
+
+    def _split(self, doc_id: str, text: str) -> List[Tuple[int, str]]:
+        """Morceaux (identifiant, texte) d'un document"""
+        seen: Counter = Counter()
+        chunks = []
+        for chunk in self.text_splitter.split_text(text):
+            chunks.append((chunk_id(doc_id, chunk, seen[chunk]), chunk))
+            seen[chunk] += 1
+        return chunks
+
+    def _remove_ids(self, ids: List[int]):
+        if ids and self.index is not None:
+            index = self._writable_index(self.index.d)
+            try:
+                index.remove_ids(np.asarray(ids, dtype="int64"))
+            except RuntimeError:
+                # Index HNSW: pas de suppression; les vecteurs restent jusqu'à la prochaine reconstruction
+                # (leurs morceaux n'existent plus dans la base et sont ignorés à la lecture)
+                self.stale += len(ids)
+            self._dirty = True
+
+    def upsert_documents(self, documents: Dict[str, str],
+                         metadatas: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+        """Ajoute ou met à jour des documents; retourne le nombre de morceaux ajoutés, retirés et conservés"""
+        metadatas = metadatas or {}
+        stats = {"documents": 0, "added": 0, "removed": 0, "kept": 0}
+        new_rows, new_texts, removed_ids, doc_rows = [], [], [], []
+        with self.lock:
+            if len(documents) > 1000:
+                known = dict(self.conn.execute("SELECT doc_id, hash FROM documents"))
+            else:
+                known = {}
+                for doc_id in documents:
+                    row = self.conn.execute("SELECT hash FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+                    if row:
+                        known[doc_id] = row[0]
+            for doc_id, text in documents.items():
+                digest = text_hash(text)
+                if known.get(doc_id) == digest:
+                    continue
+                stats["documents"] += 1
+                doc_rows.append((doc_id, digest))
+                existing = {row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,))}
+                chunks = self._split(doc_id, text)
+                current = {cid for cid, _ in chunks}
+                removed_ids.extend(existing - current)
+                metadata = json.dumps({"source": doc_id, **metadatas.get(doc_id, {})}, ensure_ascii=False)
+                for cid, chunk in chunks:
+                    if cid in existing:
+                        stats["kept"] += 1
+                    else:
+                        new_rows.append((cid, doc_id, text_hash(chunk), chunk, metadata))
+                        new_texts.append(chunk)
+
+        # Calcul des embeddings hors du verrou: les recherches continuent pendant ce temps
+        vectors = self._embed(new_texts) if new_texts else None
+
+        with self.lock:
+            if removed_ids:
+                self._remove_ids(removed_ids)
+                self.conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in removed_ids])
+                stats["removed"] = len(removed_ids)
+            if vectors is not None:
+                index = self._writable_index(vectors.shape[1])
+                index.add_with_ids(vectors, np.asarray([row[0] for row in new_rows], dtype="int64"))
+                self.conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?)", new_rows)
+                stats["added"] = len(new_rows)
+                self._dirty = True
+            if removed_ids or vectors is not None:
+                self._bump_generation()
+            self.conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?)", doc_rows)
+            self.conn.commit()
+        return stats
+
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        """Retire les documents et tous leurs morceaux; retourne le nombre de morceaux retirés"""
+        removed = []
+        with self.lock:
+            for doc_id in doc_ids:
+                removed.extend(row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,)))
+                self.conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                self.conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            self._remove_ids(removed)
+            if removed:
+                self._bump_generation()
+            self.conn.commit()
+        return len(removed)
+
+    def sync(self, documents: Dict[str, str], metadatas: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+        """Aligne la base sur le corpus complet: ajouts, modifications et documents supprimés"""
+        stats = self.upsert_documents(documents, metadatas)
+        with self.lock:
+            missing = [doc_id for (doc_id,) in self.conn.execute("SELECT doc_id FROM documents")
+                       if doc_id not in documents]
+        stats["removed"] += self.delete_documents(missing)
+        stats["deleted_documents"] = len(missing)
+        self.save()
+        return stats
+
+    def rebuild_index(self, spec: str = "flat", train_size: int = 100_000,
+                      search_params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Reconstruit l'index avec le type 'spec' (preset de ann_index, ex: "ivf-pq", "hnsw-sq8",
+        ou chaîne index_factory) entraîné sur les morceaux actuels, puis l'enregistre.
+        Les embeddings sont recalculés (lus dans le cache s'il y en a un). Les ajouts suivants
+        utilisent le même type d'index. Bloque les recherches et mises à jour pendant la reconstruction.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT id, text FROM chunks ORDER BY id").fetchall()
+            if not rows:
+                raise ValueError("La base de vecteurs est vide: rien à reconstruire")
+            start = time.perf_counter()
+            vectors = self._embed([text for _, text in rows])
+            self.index = build_index(vectors, [i for i, _ in rows], spec, train_size,
+                                     search_params or self.search_params)
+            self._read_only = False
+            self._dirty = True
+            self.stale = 0
+            self.save()
+            return {"spec": spec, "vectors": len(rows), "seconds": round(time.perf_counter() - start, 2),
+                    "bytes": os.path.getsize(self.index_path)}
+
+    def save(self):
+        """
+        Écrit l'index (fichier temporaire puis remplacement atomique) s'il a changé.
+        Le verrou d'écriture de chunks.db est tenu jusqu'à la fin: si un autre processus a modifié
+        le manifeste entre-temps, ses morceaux sont d'abord ajoutés ou retirés de cet index
+        (embeddings lus dans le cache), sinon l'écriture effacerait les siens.
+        """
+        with self.lock:
+            if not self._dirty or self.index is None:
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if (self._meta("generation") or 0) != self._index_generation + self._own_changes:
+                    self._align()
+                tmp_path = self.index_path + ".tmp"
+                faiss.write_index(self.index, tmp_path)
+                os.replace(tmp_path, self.index_path)
+                self._mark_saved()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self._dirty = False
+
+    def refresh(self) -> bool:
+        """Recharge l'index si un autre processus (ex: ingest.py) en a enregistré un plus récent"""
+        with self.lock:
+            if self._dirty or int(self._meta("saved_generation") or 0) == self._index_generation:
+                return False
+            self._load_index()
+            return True
+
+    # --- Lecture ------------------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def search_ids(self, query_vector: List[float], k: int = 4) -> List[Tuple[int, float]]:
+        """(identifiant de morceau, distance L2) des k plus proches voisins du vecteur, parmi les morceaux existants"""
+        with self.lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            # Les vecteurs retirés (index sans suppression, ou morceaux supprimés par un autre processus)
+            # peuvent occuper des places: on en demande 'stale' de plus, puis on écarte les identifiants
+            # absents du manifeste (sinon ils prendraient des rangs de la fusion RRF)
+            distances, ids = self.index.search(np.asarray([query_vector], dtype="float32"), k + self.stale)
+            found = [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i != -1]
+            known = set()
+            for start in range(0, len(found), 500):
+                part = [i for i, _ in found[start:start + 500]]
+                known.update(row[0] for row in self.conn.execute(
+                    f"SELECT id FROM chunks WHERE id IN ({','.join('?' for _ in part)})", part
+                ))
+        return [(i, d) for i, d in found if i in known][:k]
+
+    def get_documents(self, ids: List[int]) -> List[Document]:
+        """Morceaux (Document, avec leur 'chunk_id') des identifiants, dans le même ordre; les inconnus sont ignorés"""
+        rows = {}
+        with self.lock:
+            for start in range(0, len(ids), 500):
+                part = ids[start:start + 500]
+                rows.update((row[0], row[1:]) for row in self.conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({','.join('?' for _ in part)})", part
+                ))
+        return [Document(page_content=rows[i][0], metadata={**json.loads(rows[i][1]), "chunk_id": i})
+                for i in ids if i in rows]
+
+    def as_langchain(self) -> FAISS:
+        """Vue LangChain (FAISS) de la base, utilisable avec as_retriever()"""
+        if self.index is None:
+            raise ValueError("La base de vecteurs est vide: appelez sync() ou upsert_documents() d'abord")
+        return _StoreFAISS(self)
+
+    def close(self):
+        self.save()
+        self.conn.close()